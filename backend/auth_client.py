@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from metrics import OUTBOUND_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidSessionError(Exception):
+    """Raised when the auth service rejects a session ID"""
+
+
+class AuthServiceError(Exception):
+    """Raised when the auth service is unreachable after all retries"""
+
+
+class EmergentAuthClient:
+    """Shared, pooled async client for the Emergent session-data exchange.
+
+    Concurrent exchanges for the same session ID share one upstream call.
+    Transport errors and 5xx responses are retried with exponential backoff;
+    any other non-200 response is treated as an invalid session.
+    """
+
+    SESSION_DATA_PATH = "/auth/v1/env/oauth/session-data"
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 10.0,
+        connect_timeout: float = 3.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self._timeout, limits=self._limits
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_session_data(self, session_id: str) -> dict:
+        """Exchange a session ID for user/session data, merging duplicate calls"""
+        future = self._inflight.get(session_id)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(session_id))
+            self._inflight[session_id] = future
+            future.add_done_callback(lambda _: self._inflight.pop(session_id, None))
+        # Shield so one cancelled caller does not cancel the shared exchange
+        return await asyncio.shield(future)
+
+    async def _fetch(self, session_id: str) -> dict:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await self.client.get(
+                    self.SESSION_DATA_PATH, headers={"X-Session-ID": session_id}
+                )
+            except httpx.TransportError as e:
+                OUTBOUND_LATENCY.observe(time.perf_counter() - started, "emergent_auth", "error")
+                error = f"{type(e).__name__}: {e}"
+            else:
+                OUTBOUND_LATENCY.observe(
+                    time.perf_counter() - started, "emergent_auth", str(response.status_code)
+                )
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code < 500:
+                    raise InvalidSessionError(f"Auth service returned {response.status_code}")
+                error = f"Auth service returned {response.status_code}"
+
+            if attempt >= self.retries:
+                raise AuthServiceError(error)
+            delay = self.backoff * (2 ** attempt)
+            attempt += 1
+            logger.warning(f"Session exchange failed ({error}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
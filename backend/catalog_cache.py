@@ -0,0 +1,163 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional
+
+from pymongo import ReturnDocument
+
+VERSION_DOC_ID = "catalog_version"
+PRICING_VERSION_DOC_ID = "pricing_version"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Optional[Dict[str, str]] = None
+    # Compressed copies of body by Content-Encoding, filled on first use
+    encoded: Optional[Dict[str, bytes]] = None
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the exact response bytes"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class CatalogCache:
+    """Per-worker cache of serialized catalog responses.
+
+    Every catalog write bumps a version counter stored in MongoDB
+    (``meta.catalog_version``). Each worker re-reads that counter at most once
+    per ``check_interval`` seconds and drops its entries when it changes, so
+    all uvicorn workers converge within that interval of a write.
+
+    Seat availability changes on every booking without bumping the version,
+    so entries also expire after ``max_age`` seconds to bound how stale the
+    displayed availability can get.
+    """
+
+    def __init__(self, maxsize: int = 512, check_interval: float = 1.0, max_age: float = 10.0):
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _apply_version(self, version: int) -> None:
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            self._checked_at = time.monotonic()
+
+    async def sync(self, db) -> None:
+        """Refresh the catalog version from MongoDB if the check interval elapsed"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        doc = await db.meta.find_one({"_id": VERSION_DOC_ID})
+        self._apply_version(doc["version"] if doc else 0)
+
+    async def bump(self, db) -> int:
+        """Record a catalog write so every worker invalidates its cache"""
+        doc = await db.meta.find_one_and_update(
+            {"_id": VERSION_DOC_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._apply_version(doc["version"])
+        return doc["version"]
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or time.monotonic() - item[1] > self.max_age:
+                self.misses += 1
+                return None
+            entry = item[0]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(
+        self,
+        key: Hashable,
+        body: bytes,
+        version: Optional[int],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> CachedResponse:
+        """Store a response built from catalog ``version``; stale builds are not kept"""
+        entry = CachedResponse(body, make_etag(body), headers, {})
+        with self._lock:
+            if version != self.version:
+                return entry
+            self._entries[key] = (entry, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.version = None
+            self._checked_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self.version,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "max_age_seconds": self.max_age,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class SharedVersion:
+    """A counter in ``meta`` that workers bump on writes and re-read at most once per ``check_interval``.
+
+    For derived state that, unlike the catalog pages, only some writes
+    invalidate (e.g. compiled pricing rules and promo codes).
+    """
+
+    def __init__(self, doc_id: str, check_interval: float = 1.0):
+        self.doc_id = doc_id
+        self.check_interval = check_interval
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+
+    async def sync(self, db) -> Optional[int]:
+        """Refresh the version from MongoDB if the check interval elapsed"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            doc = await db.meta.find_one({"_id": self.doc_id})
+            self.version = doc["version"] if doc else 0
+            self._checked_at = time.monotonic()
+        return self.version
+
+    async def bump(self, db) -> int:
+        doc = await db.meta.find_one_and_update(
+            {"_id": self.doc_id},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.version = doc["version"]
+        self._checked_at = time.monotonic()
+        return self.version
+
+    def clear(self) -> None:
+        self.version = None
+        self._checked_at = 0.0
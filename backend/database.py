@@ -0,0 +1,139 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+logger = logging.getLogger(__name__)
+
+# Wire compressors and the module each one needs; zlib ships with Python
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+ReadPreferenceMode = Union[Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest]
+
+# Modes that may read from a secondary, and so take a max staleness
+SECONDARY_MODES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+class MongoSettings(NamedTuple):
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: int = 30000
+    connect_timeout_ms: int = 20000
+    compressors: Tuple[str, ...] = ()
+    catalog_read_preference: str = "primary"
+    catalog_max_staleness: int = -1
+    warm_connections: int = 0
+    app_name: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "MongoSettings":
+        # 0 means "driver default" for the optional timeouts
+        min_pool_size = int(environ.get('MONGO_MIN_POOL_SIZE', '10'))
+        return cls(
+            max_pool_size=int(environ.get('MONGO_MAX_POOL_SIZE', '100')),
+            min_pool_size=min_pool_size,
+            max_idle_time_ms=int(environ.get('MONGO_MAX_IDLE_TIME_MS', '0')) or None,
+            wait_queue_timeout_ms=int(environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000')) or None,
+            server_selection_timeout_ms=int(environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+            connect_timeout_ms=int(environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+            compressors=tuple(
+                name.strip() for name in environ.get('MONGO_COMPRESSORS', 'zstd,snappy,zlib').split(",")
+                if name.strip()
+            ),
+            catalog_read_preference=environ.get('MONGO_CATALOG_READ_PREFERENCE', 'secondaryPreferred'),
+            catalog_max_staleness=int(environ.get('MONGO_CATALOG_MAX_STALENESS', '90')),
+            warm_connections=int(environ.get('MONGO_WARM_CONNECTIONS', str(min_pool_size))),
+            app_name=environ.get('MONGO_APP_NAME', 'umroh-hemat-api'),
+        )
+
+
+def available_compressors(names: Sequence[str]) -> Tuple[str, ...]:
+    """The requested wire compressors whose Python module is installed"""
+    usable = []
+    for name in names:
+        module = COMPRESSOR_MODULES.get(name)
+        if module is None:
+            logger.warning(f"Unknown Mongo wire compressor {name!r} ignored")
+        elif importlib.util.find_spec(module) is None:
+            logger.info(f"Mongo wire compressor {name!r} unavailable ({module} not installed)")
+        else:
+            usable.append(name)
+    return tuple(usable)
+
+
+def client_options(settings: MongoSettings) -> Dict[str, Any]:
+    options: Dict[str, Any] = {
+        "maxPoolSize": settings.max_pool_size,
+        "minPoolSize": settings.min_pool_size,
+        "serverSelectionTimeoutMS": settings.server_selection_timeout_ms,
+        "connectTimeoutMS": settings.connect_timeout_ms,
+    }
+    if settings.max_idle_time_ms:
+        options["maxIdleTimeMS"] = settings.max_idle_time_ms
+    if settings.wait_queue_timeout_ms:
+        options["waitQueueTimeoutMS"] = settings.wait_queue_timeout_ms
+    compressors = available_compressors(settings.compressors)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    if settings.app_name:
+        options["appname"] = settings.app_name
+    return options
+
+
+def create_client(url: str, settings: MongoSettings, event_listeners: Sequence[Any] = ()) -> AsyncIOMotorClient:
+    """Motor client sized and tuned from ``settings``; connects lazily on first use"""
+    return AsyncIOMotorClient(url, event_listeners=list(event_listeners), **client_options(settings))
+
+
+def read_preference(mode: str, max_staleness: int = -1) -> ReadPreferenceMode:
+    if mode == "primary":
+        return Primary()
+    if mode not in SECONDARY_MODES:
+        raise ValueError(f"Unknown read preference {mode!r}")
+    return SECONDARY_MODES[mode](max_staleness=max_staleness)
+
+
+_derived: Dict[Tuple[int, str], Tuple[Any, Any]] = {}
+
+
+def with_read_preference(db, preference: ReadPreferenceMode):
+    """``db`` with another read preference, built once per database handle"""
+    if isinstance(preference, Primary):
+        return db
+    key = (id(db), repr(preference))
+    cached = _derived.get(key)
+    if cached is None or cached[0] is not db:
+        cached = _derived[key] = (db, db.client.get_database(db.name, read_preference=preference))
+    return cached[1]
+
+
+async def warm_pool(db, connections: int) -> Dict[str, Any]:
+    """Open ``connections`` pooled connections up front with concurrent pings"""
+    started = time.perf_counter()
+    if connections > 0:
+        await asyncio.gather(*[db.command("ping") for _ in range(connections)])
+    return {"connections": connections, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def pool_stats(settings: MongoSettings, pool: Dict[str, int]) -> Dict[str, Any]:
+    """Connection pool usage against its configured size (counts are summed over all servers)"""
+    return {
+        **pool,
+        "max_pool_size": settings.max_pool_size,
+        "min_pool_size": settings.min_pool_size,
+        "utilization": round(pool.get("in_use", 0) / settings.max_pool_size, 3) if settings.max_pool_size else None,
+        "wait_queue_timeout_ms": settings.wait_queue_timeout_ms,
+        "catalog_read_preference": settings.catalog_read_preference,
+    }
@@ -0,0 +1,157 @@
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {
+    "januari": 1, "jan": 1, "january": 1,
+    "februari": 2, "feb": 2, "pebruari": 2, "february": 2,
+    "maret": 3, "mar": 3, "march": 3,
+    "april": 4, "apr": 4,
+    "mei": 5, "may": 5,
+    "juni": 6, "jun": 6, "june": 6,
+    "juli": 7, "jul": 7, "july": 7,
+    "agustus": 8, "agu": 8, "agt": 8, "aug": 8, "august": 8,
+    "september": 9, "sep": 9, "sept": 9,
+    "oktober": 10, "okt": 10, "oct": 10, "october": 10,
+    "november": 11, "nov": 11, "nop": 11,
+    "desember": 12, "des": 12, "dec": 12, "december": 12,
+}
+
+# "Setiap ..." schedules. "Minggu" is read as "week" rather than "Sunday".
+RECURRENCES = {
+    "hari": "daily",
+    "harian": "daily",
+    "minggu": "weekly",
+    "pekan": "weekly",
+    "weekend": "weekend",
+    "akhir pekan": "weekend",
+    "bulan": "monthly",
+}
+
+# Recurring packages depart from the day they are parsed, with no last date
+OPEN_END = datetime(9999, 12, 31, tzinfo=timezone.utc)
+
+_RECURRING = re.compile(r"^setiap\s+(.+)$")
+_SINGLE = re.compile(r"^(?:(\d{1,2})\s+)?([a-z]+)\.?(?:\s+(\d{4}))?$")
+_DAY_SPAN = re.compile(r"^(\d{1,2})\s*-\s*(\d{1,2})\s+([a-z]+)\.?(?:\s+(\d{4}))?$")
+
+Window = Tuple[datetime, datetime]
+
+
+def _month_start(year: int, month: int) -> datetime:
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(moment: datetime) -> datetime:
+    return _month_start(moment.year + moment.month // 12, moment.month % 12 + 1)
+
+
+def _resolve_year(month: int, year: Optional[str], today: datetime) -> int:
+    """Year-less months mean the next such month, counting the current one"""
+    if year:
+        return int(year)
+    return today.year if month >= today.month else today.year + 1
+
+
+def _parse_single(text: str, today: datetime) -> Optional[Window]:
+    """"Desember 2025", "Maret", "15 Des 2025" -> [start, end)"""
+    match = _DAY_SPAN.match(text)
+    if match:
+        first, last, month_name, year = match.groups()
+        month = MONTHS.get(month_name)
+        if month is None:
+            return None
+        month_start = _month_start(_resolve_year(month, year, today), month)
+        try:
+            start = month_start.replace(day=int(first))
+            end = month_start.replace(day=int(last)) + timedelta(days=1)
+        except ValueError:
+            return None
+        return (start, end) if start < end else None
+
+    match = _SINGLE.match(text)
+    if not match:
+        return None
+    day, month_name, year = match.groups()
+    month = MONTHS.get(month_name)
+    if month is None:
+        return None
+    month_start = _month_start(_resolve_year(month, year, today), month)
+    if day is None:
+        return month_start, _next_month(month_start)
+    try:
+        start = month_start.replace(day=int(day))
+    except ValueError:
+        return None
+    return start, start + timedelta(days=1)
+
+
+def parse_departure(text: Optional[str], today: Optional[datetime] = None) -> Dict[str, Any]:
+    """Normalize a free-text departure date into queryable fields.
+
+    Returns ``departure_start`` (inclusive), ``departure_end`` (exclusive) and
+    ``departure_recurrence`` ("daily", "weekly", ... or None for a fixed
+    window). All three are None when the text is not understood.
+    """
+    today = (today or datetime.now(timezone.utc)).replace(hour=0, minute=0, second=0, microsecond=0)
+    unknown = {"departure_start": None, "departure_end": None, "departure_recurrence": None}
+    normalized = " ".join((text or "").lower().replace(",", " ").split())
+    if not normalized:
+        return unknown
+
+    match = _RECURRING.match(normalized)
+    if match:
+        recurrence = RECURRENCES.get(match.group(1))
+        if recurrence is None:
+            logger.warning(f"Unrecognized departure schedule: {text!r}")
+            return unknown
+        return {"departure_start": today, "departure_end": OPEN_END, "departure_recurrence": recurrence}
+
+    # A day span such as "10 - 20 Jan" also contains " - ", so try the whole text first
+    window = _parse_single(normalized, today)
+    # "Desember 2025 - Januari 2026": the window spans both ends
+    parts = [part.strip() for part in re.split(r"\s+(?:-|s/d|sampai|hingga)\s+", normalized)]
+    if window is None and len(parts) == 2:
+        first, last = _parse_single(parts[0], today), _parse_single(parts[1], today)
+        window = (first[0], last[1]) if first and last and first[0] < last[1] else None
+
+    if window is None:
+        logger.warning(f"Unrecognized departure date: {text!r}")
+        return unknown
+    return {"departure_start": window[0], "departure_end": window[1], "departure_recurrence": None}
+
+
+def departure_filter(departure_from: Optional[datetime], departure_to: Optional[datetime]) -> Dict[str, Any]:
+    """Query for packages whose departure window overlaps [from, to)"""
+    query: Dict[str, Any] = {}
+    if departure_to is not None:
+        query["departure_start"] = {"$lt": departure_to}
+    if departure_from is not None:
+        query["departure_end"] = {"$gt": departure_from}
+    return query
+
+
+async def backfill_departure_dates(db, only_missing: bool = True, batch_size: int = 500) -> Dict[str, int]:
+    """Parse ``departure_date`` for existing packages and store the normalized fields"""
+    query = {"departure_start": {"$exists": False}} if only_missing else {}
+    cursor = db.packages.find(query, {"_id": 0, "id": 1, "departure_date": 1})
+    counts = {"updated": 0, "unparsed": 0}
+    operations = []
+    async for doc in cursor:
+        fields = parse_departure(doc.get("departure_date"))
+        if fields["departure_start"] is None:
+            counts["unparsed"] += 1
+        operations.append(UpdateOne({"id": doc["id"]}, {"$set": fields}))
+        if len(operations) >= batch_size:
+            await db.packages.bulk_write(operations, ordered=False)
+            counts["updated"] += len(operations)
+            operations = []
+    if operations:
+        await db.packages.bulk_write(operations, ordered=False)
+        counts["updated"] += len(operations)
+    return counts
@@ -0,0 +1,48 @@
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Type
+
+import orjson
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+
+class RowEncoder:
+    """Serializes trusted Mongo documents for a response model without building it.
+
+    The model's field list and matching Mongo projection are computed once;
+    encoding is then a dict comprehension per row plus a single orjson call,
+    instead of model construction, response_model re-validation and
+    jsonable_encoder.
+
+    ``fields`` narrows the output (and projection) to a subset of the model's
+    fields, kept in model order; such rows cannot be built as the model.
+    Fields missing from a document take the model's static default (e.g.
+    ``saved_count`` on packages written before it existed), as the model
+    path would; fields without one come out as null.
+    """
+
+    def __init__(self, model: Type[BaseModel], fields: Optional[Sequence[str]] = None):
+        self.model = model
+        wanted = set(fields) if fields is not None else None
+        self.fields: Tuple[str, ...] = tuple(
+            name for name in model.model_fields if wanted is None or name in wanted
+        )
+        self.partial = len(self.fields) < len(model.model_fields)
+        self.projection: Dict[str, Any] = {"_id": 0, **{name: 1 for name in self.fields}}
+        self._columns: Tuple[Tuple[str, Any], ...] = tuple(
+            (name, self._default(model.model_fields[name])) for name in self.fields
+        )
+
+    @staticmethod
+    def _default(field) -> Any:
+        # Factories (ids, timestamps) would invent a value the document never had
+        return None if field.default is PydanticUndefined else field.default
+
+    def row(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: doc.get(name, default) for name, default in self._columns}
+
+    def encode_one(self, doc: Dict[str, Any]) -> bytes:
+        return orjson.dumps(self.row(doc))
+
+    def encode_many(self, docs: Iterable[Dict[str, Any]]) -> bytes:
+        columns = self._columns
+        return orjson.dumps([{name: doc.get(name, default) for name, default in columns} for doc in docs])
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Raised when a key is replayed with a different request payload"""
+
+
+class IdempotencyKeyInProgressError(Exception):
+    """Raised when the original request did not finish within the wait timeout"""
+
+
+def fingerprint(payload: Any) -> str:
+    raw = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Stores the outcome of requests made with an ``Idempotency-Key``.
+
+    The first request with a key inserts an in-progress record (the key is the
+    document ``_id``, so the insert is the lock), runs the handler and saves
+    its JSON result. Later requests with the same key return the saved result;
+    requests that arrive while the first is still running wait for it. Records
+    expire through a TTL index on ``expires_at``. If the handler raises, the
+    record is removed so the client can retry.
+
+    An in-progress record holds a lease of ``lease_seconds``, renewed while
+    the handler runs. If the worker running it dies, a retry takes the key
+    over once the lease lapses instead of waiting out the TTL.
+    """
+
+    def __init__(
+        self,
+        collection: str = "idempotency_keys",
+        ttl: float = 24 * 3600,
+        wait_timeout: float = 30.0,
+        poll_interval: float = 0.05,
+        lease_seconds: float = 30.0,
+    ):
+        self.collection = collection
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._events: Dict[str, asyncio.Event] = {}
+
+    async def run(
+        self,
+        db,
+        scope: str,
+        owner: str,
+        key: str,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        """Run ``handler`` once per key; returns (json result, replayed)"""
+        record_id = f"{scope}:{owner}:{key}"
+        digest = fingerprint(payload)
+        collection = db[self.collection]
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            now = datetime.now(timezone.utc)
+            lease = str(uuid.uuid4())
+            try:
+                await collection.insert_one({
+                    "_id": record_id,
+                    "state": IN_PROGRESS,
+                    "fingerprint": digest,
+                    "lease": lease,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                })
+            except DuplicateKeyError:
+                record = await collection.find_one({"_id": record_id})
+                if record is None:
+                    # The original attempt failed and released the key
+                    continue
+                if record["fingerprint"] != digest:
+                    raise IdempotencyKeyReusedError(key)
+                if record["state"] == COMPLETED:
+                    return record["response"], True
+                # The worker running the original stopped renewing its lease: take the key over
+                taken = await collection.update_one(
+                    {"_id": record_id, "state": IN_PROGRESS, "lease_expires_at": {"$lte": now}},
+                    {"$set": {"lease": lease, "lease_expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                )
+                if taken.modified_count:
+                    return await self._execute(collection, record_id, lease, handler), False
+                if time.monotonic() >= deadline:
+                    raise IdempotencyKeyInProgressError(key)
+                await self._wait(record_id)
+                continue
+            return await self._execute(collection, record_id, lease, handler), False
+
+    async def _execute(self, collection, record_id: str, lease: str, handler) -> Any:
+        event = self._events.setdefault(record_id, asyncio.Event())
+        renewer = asyncio.create_task(self._renew(collection, record_id, lease))
+        try:
+            result = jsonable_encoder(await handler())
+        except BaseException:
+            renewer.cancel()
+            await collection.delete_one({"_id": record_id, "lease": lease})
+            raise
+        else:
+            renewer.cancel()
+            await collection.update_one(
+                {"_id": record_id, "lease": lease},
+                {"$set": {"state": COMPLETED, "response": result}, "$unset": {"lease": "", "lease_expires_at": ""}},
+            )
+            return result
+        finally:
+            event.set()
+            self._events.pop(record_id, None)
+
+    async def _renew(self, collection, record_id: str, lease: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await collection.update_one(
+                    {"_id": record_id, "lease": lease},
+                    {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}},
+                )
+            except PyMongoError:
+                # A missed renewal only risks an early takeover; the next one may succeed
+                pass
+
+    async def _wait(self, record_id: str) -> None:
+        # Wake immediately when the original runs in this worker; otherwise
+        # the timeout turns this into a poll of the shared record.
+        event = self._events.get(record_id)
+        if event is None:
+            await asyncio.sleep(self.poll_interval)
+            return
+        try:
+            await asyncio.wait_for(event.wait(), self.poll_interval * 20)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,174 @@
+import logging
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Every index the API relies on, keyed by collection. Applied idempotently on
+# startup: create_indexes is a no-op for indexes that already exist.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "packages": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("package_type", ASCENDING), ("price", ASCENDING)], name="type_price"),
+        IndexModel([("departure_city", ASCENDING), ("price", ASCENDING)], name="city_price"),
+        IndexModel([("price", ASCENDING)], name="price"),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_id"),
+        IndexModel([("departure_start", ASCENDING), ("departure_end", ASCENDING)], name="departure_window"),
+        # ?sort=popular: most-saved first, keyset-paginated on id
+        IndexModel([("saved_count", DESCENDING), ("id", ASCENDING)], name="saved_id"),
+    ],
+    "user_sessions": [
+        IndexModel([("session_token", ASCENDING)], name="session_token_unique", unique=True),
+        # TTL: MongoDB purges sessions once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "bookings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="user_created_id",
+        ),
+        # Hold sweeper: lapsed holds, then the rows claimed by one sweep
+        IndexModel([("booking_status", ASCENDING), ("hold_expires_at", ASCENDING)], name="status_hold_expiry"),
+        IndexModel([("sweep_id", ASCENDING)], name="sweep_id", sparse=True),
+        # Expired bookings whose seats a sweep has not returned yet
+        IndexModel(
+            [("seats_returned", ASCENDING)], name="seats_pending",
+            partialFilterExpression={"seats_returned": False},
+        ),
+        # Raw booking export, in creation order
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_id"),
+    ],
+    "payments": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user"),
+    ],
+    "wishlist": [
+        IndexModel([("user_id", ASCENDING), ("package_id", ASCENDING)], name="user_package_unique", unique=True),
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="user_created_id",
+        ),
+    ],
+    "promo_codes": [IndexModel([("code", ASCENDING)], name="code_unique", unique=True)],
+    # Report rollups are keyed "<day>:<package or payment method>" and read by day range
+    "package_daily_stats": [IndexModel([("day", ASCENDING)], name="day")],
+    "revenue_daily_stats": [IndexModel([("day", ASCENDING)], name="day")],
+    # Shared rate-limit buckets (RATE_LIMIT_BACKEND=mongo), dropped once refilled
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    # Background jobs: workers claim the oldest due job; finished ones expire after retention
+    "jobs": [
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="status_run_at"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    # Keys are the document _id; records expire at their own expires_at
+    "idempotency_keys": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Representative filter for each query the handlers issue, used by the
+# diagnostic report to check that every query shape is served by an index.
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"name": "get_package", "collection": "packages", "filter": {"id": ""}},
+    {"name": "get_packages_by_type", "collection": "packages",
+     "filter": {"package_type": "", "price": {"$gte": 0, "$lte": 0}}},
+    {"name": "get_packages_by_city", "collection": "packages",
+     "filter": {"departure_city": "", "price": {"$gte": 0}}},
+    {"name": "get_packages_by_price", "collection": "packages", "filter": {"price": {"$lte": 0}}},
+    {"name": "get_packages_by_departure", "collection": "packages",
+     "filter": {"departure_start": {"$lt": 0}, "departure_end": {"$gt": 0}}},
+    {"name": "get_current_user", "collection": "user_sessions",
+     "filter": {"session_token": "", "expires_at": {"$gt": 0}}},
+    {"name": "get_booking", "collection": "bookings", "filter": {"id": "", "user_id": ""}},
+    {"name": "restock_expired_holds", "collection": "bookings",
+     "filter": {"booking_status": "", "seats_returned": False}},
+    {"name": "get_user_bookings", "collection": "bookings", "filter": {"user_id": ""}},
+    {"name": "get_payment", "collection": "payments", "filter": {"id": "", "user_id": ""}},
+    {"name": "wishlist_item", "collection": "wishlist", "filter": {"user_id": "", "package_id": ""}},
+    {"name": "get_wishlist", "collection": "wishlist", "filter": {"user_id": ""}},
+    {"name": "upsert_promo_code", "collection": "promo_codes", "filter": {"code": ""}},
+    {"name": "claim_job", "collection": "jobs", "filter": {"status": "", "run_at": {"$lte": 0}}},
+]
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create all registered indexes, logging (not raising) per-collection failures"""
+    created = {}
+    for collection, models in INDEXES.items():
+        try:
+            created[collection] = await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            logger.error(f"Index provisioning failed for {collection}: {str(e)}")
+    return created
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The plan's stages, root first; index scans carry the index name and key pattern"""
+    stage = {"stage": plan.get("stage", "")}
+    if "keyPattern" in plan:
+        stage["index"] = plan.get("indexName")
+        stage["key_pattern"] = dict(plan["keyPattern"])
+    stages = [stage]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def index_report(db, profile_limit: int = 50) -> Dict[str, Any]:
+    """Report query shapes and recent queries that were answered by a collection scan.
+
+    Only namespaces, plan summaries and index key patterns are returned:
+    profiled commands carry filter values such as session tokens and
+    emails. Parts that need privileges the connection lacks (the profiler,
+    serverStatus) are reported as None.
+    """
+    shapes = []
+    for shape in QUERY_SHAPES:
+        explain = await db.command(
+            "explain",
+            {"find": shape["collection"], "filter": shape["filter"]},
+            verbosity="queryPlanner",
+        )
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        shapes.append({
+            "name": shape["name"],
+            "collection": shape["collection"],
+            "stages": [stage["stage"] for stage in stages],
+            "key_patterns": [stage["key_pattern"] for stage in stages if "key_pattern" in stage],
+            "collection_scan": any(stage["stage"] == "COLLSCAN" for stage in stages),
+        })
+
+    # Queries recorded by the profiler (when enabled) that scanned a collection
+    profiled = []
+    try:
+        async for entry in db["system.profile"].find(
+            {"planSummary": "COLLSCAN", "ns": {"$not": {"$regex": r"\.system\."}}},
+            {"_id": 0, "ns": 1, "op": 1, "planSummary": 1, "millis": 1, "docsExamined": 1, "ts": 1},
+        ).sort("ts", DESCENDING).limit(profile_limit):
+            profiled.append(entry)
+    except OperationFailure as e:
+        logger.warning(f"Profiler entries unavailable: {str(e)}")
+        profiled = None
+
+    try:
+        server_status = await db.command("serverStatus")
+        scans = server_status.get("metrics", {}).get("queryExecutor", {}).get("collectionScans", {})
+    except OperationFailure as e:
+        # Needs the clusterMonitor role
+        logger.warning(f"serverStatus unavailable: {str(e)}")
+        scans = {}
+
+    return {
+        "query_shapes": shapes,
+        "unindexed_shapes": [s["name"] for s in shapes if s["collection_scan"]],
+        "profiled_collection_scans": profiled,
+        "collection_scans_total": scans.get("total"),
+    }
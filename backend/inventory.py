@@ -0,0 +1,124 @@
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+import reports
+
+logger = logging.getLogger(__name__)
+
+# Booking lifecycle: seats are taken when the booking is created ("held"),
+# kept when it is paid ("confirmed") and returned when the hold lapses ("expired").
+HELD = "held"
+CONFIRMED = "confirmed"
+EXPIRED = "expired"
+
+
+async def reserve_seats(db, package_id: str, seats: int, projection: Optional[Dict[str, Any]] = None):
+    """Atomically take ``seats`` from a package.
+
+    Returns the package as it was before the reservation, or None if it does
+    not exist or has fewer than ``seats`` left.
+    """
+    return await db.packages.find_one_and_update(
+        {"id": package_id, "availability": {"$gte": seats}},
+        {"$inc": {"availability": -seats}},
+        projection=projection,
+        return_document=ReturnDocument.BEFORE,
+    )
+
+
+async def release_seats(db, package_id: str, seats: int) -> None:
+    await db.packages.update_one({"id": package_id}, {"$inc": {"availability": seats}})
+
+
+# Sweep ids each package remembers having restocked, so a resumed sweep never returns seats twice
+RESTOCK_LOG_SIZE = 100
+
+# Another sweep's unreturned holds are only taken over once it has had this long to finish
+RECOVERY_GRACE_SECONDS = 300
+
+
+async def release_expired_holds(
+    db,
+    now: Optional[datetime] = None,
+    on_released: Optional[Callable[[Dict[str, int]], None]] = None,
+    recovery_grace: float = RECOVERY_GRACE_SECONDS,
+) -> Dict[str, int]:
+    """Expire lapsed holds and return their seats to stock in bulk.
+
+    Holds are claimed with one update_many tagged by a sweep id and marked
+    ``seats_returned: false``, so a hold confirmed concurrently is never
+    released. The sweep then restocks what it claimed with a single
+    bulk_write. Holds another sweep claimed but never returned, because it
+    crashed, are restocked too once they are ``recovery_grace`` seconds
+    old: a younger claim may still be half-applied, and restocking part of
+    it would mark the whole sweep as done. Each package records the sweep
+    ids it was restocked for, so a resumed or concurrent sweep cannot
+    return the same seats twice. ``on_released`` is called with the seats
+    returned per package.
+    """
+    now = now or datetime.now(timezone.utc)
+    sweep_id = str(uuid.uuid4())
+    await db.bookings.update_many(
+        {"booking_status": HELD, "hold_expires_at": {"$lte": now}},
+        {"$set": {
+            "booking_status": EXPIRED,
+            "payment_status": "failed",
+            "sweep_id": sweep_id,
+            "expired_at": now,
+            "seats_returned": False,
+        }},
+    )
+
+    pending = await db.bookings.aggregate([
+        {"$match": {
+            "booking_status": EXPIRED,
+            "seats_returned": False,
+            "$or": [
+                {"sweep_id": sweep_id},
+                {"expired_at": {"$lte": now - timedelta(seconds=recovery_grace)}},
+            ],
+        }},
+        {"$group": {
+            "_id": {"sweep_id": "$sweep_id", "package_id": "$package_id"},
+            "seats": {"$sum": "$num_passengers"},
+        }},
+    ]).to_list(None)
+    if not pending:
+        return {"bookings": 0, "seats": 0}
+
+    await db.packages.bulk_write(
+        [
+            UpdateOne(
+                {"id": row["_id"]["package_id"], "restocked_sweeps": {"$ne": row["_id"]["sweep_id"]}},
+                {
+                    "$inc": {"availability": row["seats"]},
+                    "$push": {"restocked_sweeps": {"$each": [row["_id"]["sweep_id"]], "$slice": -RESTOCK_LOG_SIZE}},
+                },
+            )
+            for row in pending
+        ],
+        ordered=False,
+    )
+    # Whichever sweep flips a group's flag reports it, so concurrent sweeps count each seat once
+    seats_by_package = defaultdict(int)
+    bookings = 0
+    for row in pending:
+        flipped = await db.bookings.update_many(
+            {**row["_id"], "booking_status": EXPIRED, "seats_returned": False},
+            {"$set": {"seats_returned": True}},
+        )
+        if flipped.modified_count:
+            seats_by_package[row["_id"]["package_id"]] += row["seats"]
+            bookings += flipped.modified_count
+    if seats_by_package:
+        await reports.record_released(db, seats_by_package, now)
+        if on_released:
+            on_released(seats_by_package)
+    released = {"bookings": bookings, "seats": sum(seats_by_package.values())}
+    logger.info(f"Released {released['seats']} seats from {released['bookings']} expired holds")
+    return released
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from metrics import JOB_LATENCY, JOBS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class JobWorker:
+    """Mongo-backed job queue drained by a fixed pool of asyncio workers.
+
+    Jobs are documents in ``collection``. A worker claims the oldest due job
+    with one ``find_one_and_update`` that marks it running and pushes its
+    ``run_at`` out by ``lease_seconds``; if the worker dies, the job becomes
+    due again once the lease lapses and another worker picks it up. Failed
+    jobs are retried with exponential backoff up to ``max_attempts``, so
+    handlers run at least once and must tolerate a repeat.
+
+    Finished jobs expire after ``retention_seconds``; jobs that gave up are
+    kept for ``failed_retention_seconds`` so there is time to investigate.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Handler],
+        concurrency: int = 4,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 60.0,
+        job_timeout: float = 30.0,
+        max_attempts: int = 5,
+        backoff: float = 5.0,
+        max_backoff: float = 600.0,
+        retention_seconds: float = 7 * 24 * 3600,
+        failed_retention_seconds: float = 30 * 24 * 3600,
+        collection: str = "jobs",
+    ):
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retention_seconds = retention_seconds
+        self.failed_retention_seconds = failed_retention_seconds
+        self.collection_name = collection
+        self._collection = None
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def enqueue(self, db, jobs: Sequence[Tuple[str, Dict[str, Any]]], delay: float = 0.0) -> List[str]:
+        """Persist ``(kind, payload)`` jobs in one write and wake this process's idle workers"""
+        if not jobs:
+            return []
+        now = datetime.now(timezone.utc)
+        docs = [
+            {
+                "_id": str(uuid.uuid4()),
+                "kind": kind,
+                "payload": payload,
+                "status": QUEUED,
+                "attempts": 0,
+                "max_attempts": self.max_attempts,
+                "run_at": now + timedelta(seconds=delay),
+                "created_at": now,
+            }
+            for kind, payload in jobs
+        ]
+        await db[self.collection_name].insert_many(docs, ordered=False)
+        self._wake.set()
+        return [doc["_id"] for doc in docs]
+
+    async def start(self, db) -> None:
+        if self._tasks:
+            return
+        self._collection = db[self.collection_name]
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Stop claiming jobs and give running ones ``timeout`` seconds to finish.
+
+        Jobs still running after that are cancelled and handed back to the
+        queue, so they run again on the next start (or on another worker).
+        """
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wake.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            # Cleared before claiming, so a job enqueued during the claim still wakes us
+            self._wake.clear()
+            try:
+                job = await self._claim()
+            except PyMongoError as e:
+                logger.error(f"Job claim error: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest due job: queued, or running with a lapsed lease"""
+        now = datetime.now(timezone.utc)
+        lease = str(uuid.uuid4())
+        job = await self._collection.find_one_and_update(
+            {"status": {"$in": [QUEUED, RUNNING]}, "run_at": {"$lte": now}},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "lease": lease,
+                    "run_at": now + timedelta(seconds=self.lease_seconds),
+                    "started_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.BEFORE,
+        )
+        if job is not None:
+            job.update(lease=lease, attempts=job["attempts"] + 1)
+        return job
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        kind = job["kind"]
+        handler = self.handlers.get(kind)
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for job kind {kind!r}")
+            await asyncio.wait_for(handler(job["payload"]), self.job_timeout)
+        except asyncio.CancelledError:
+            # Shutting down mid-job: hand it straight back rather than waiting out the lease
+            await self._finish(job, {"status": QUEUED, "run_at": datetime.now(timezone.utc)})
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if handler is not None and job["attempts"] < job.get("max_attempts", self.max_attempts):
+                delay = min(self.max_backoff, self.backoff * (2 ** (job["attempts"] - 1)))
+                logger.warning(f"Job {job['_id']} ({kind}) failed ({error}), retry in {delay:.1f}s")
+                outcome = "retry"
+                update = {"status": QUEUED, "run_at": datetime.now(timezone.utc) + timedelta(seconds=delay)}
+            else:
+                logger.error(f"Job {job['_id']} ({kind}) failed permanently: {error}")
+                outcome = FAILED
+                now = datetime.now(timezone.utc)
+                update = {
+                    "status": FAILED,
+                    "finished_at": now,
+                    "expires_at": now + timedelta(seconds=self.failed_retention_seconds),
+                }
+            await self._finish(job, {**update, "last_error": error})
+        else:
+            now = datetime.now(timezone.utc)
+            outcome = DONE
+            await self._finish(job, {
+                "status": DONE,
+                "finished_at": now,
+                "expires_at": now + timedelta(seconds=self.retention_seconds),
+            })
+        JOBS.inc(kind, outcome)
+        JOB_LATENCY.observe(time.perf_counter() - started, kind)
+
+    async def _finish(self, job: Dict[str, Any], update: Dict[str, Any]) -> None:
+        # The lease guard keeps a worker whose lease lapsed from overwriting the new owner's result
+        try:
+            await self._collection.update_one({"_id": job["_id"], "lease": job["lease"]}, {"$set": update})
+        except PyMongoError as e:
+            logger.error(f"Job {job['_id']} status update error: {str(e)}")
+
+
+async def job_stats(db, collection: str = "jobs") -> Dict[str, Dict[str, int]]:
+    """Job counts per kind and status"""
+    stats: Dict[str, Dict[str, int]] = {}
+    async for row in db[collection].aggregate([
+        {"$group": {"_id": {"kind": "$kind", "status": "$status"}, "count": {"$sum": 1}}},
+    ]):
+        stats.setdefault(row["_id"]["kind"], {})[row["_id"]["status"]] = row["count"]
+    return stats
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set
+
+from pymongo.errors import OperationFailure, PyMongoError
+from starlette.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# Package fields pushed to live subscribers
+LIVE_FIELDS = ("availability", "price")
+
+# Sources of change: a change stream sees every worker's writes, hooks only this worker's
+CHANGE_STREAM = "change_stream"
+HOOKS = "hooks"
+
+# OperationFailure code when $changeStream runs on a standalone server
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+_CLOSED: Dict[str, Any] = {}
+
+
+class HubFullError(Exception):
+    """Raised when this worker already serves its maximum number of live streams"""
+
+
+class Subscription:
+    """One stream's view of one package.
+
+    Only the latest state is kept: a client that reads slower than the
+    package changes skips intermediate states instead of buffering them.
+    """
+
+    def __init__(self, package_id: str):
+        self.package_id = package_id
+        self._latest: Optional[Dict[str, Any]] = None
+        self._changed = asyncio.Event()
+
+    def offer(self, state: Dict[str, Any]) -> None:
+        self._latest = state
+        self._changed.set()
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """The latest state once it changes; None if nothing changed within ``timeout``"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._changed.clear()
+        return self._latest
+
+
+class AvailabilityHub:
+    """Fans package availability and price changes out to live subscribers.
+
+    Changes arrive either from one change stream on ``packages`` per worker
+    or, where change streams are unavailable, from ``touch`` calls made by
+    this worker's own writes; touched packages are re-read in one batched
+    query per ``coalesce_seconds``. Only packages with subscribers are
+    tracked, and a state equal to the last one published wakes nobody.
+    """
+
+    def __init__(self, max_subscribers: int = 5000, coalesce_seconds: float = 0.5):
+        self.max_subscribers = max_subscribers
+        self.coalesce_seconds = coalesce_seconds
+        self.source: Optional[str] = None
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._document_ids: Dict[Any, str] = {}  # packages _id -> id, for change events
+        self._dirty: Set[str] = set()
+        self._dirty_event = asyncio.Event()
+        self._tasks = []
+        self._count = 0
+        self.published = 0
+
+    def subscribe(self, package_id: str) -> Subscription:
+        if self._count >= self.max_subscribers:
+            raise HubFullError(package_id)
+        subscription = Subscription(package_id)
+        self._subscribers.setdefault(package_id, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.package_id)
+        if not subscribers or subscription not in subscribers:
+            return
+        subscribers.discard(subscription)
+        self._count -= 1
+        if not subscribers:
+            del self._subscribers[subscription.package_id]
+            self._state.pop(subscription.package_id, None)
+            self._document_ids = {k: v for k, v in self._document_ids.items() if v != subscription.package_id}
+
+    def prime(self, package: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a watched package's current state (read by the caller) and return it"""
+        state = {"package_id": package["id"], **{field: package.get(field) for field in LIVE_FIELDS}}
+        self._document_ids[package["_id"]] = package["id"]
+        if package["id"] in self._state:
+            # Already watched: a fresher read is news for the other subscribers too
+            self.publish(package["id"], state)
+        else:
+            self._state[package["id"]] = state
+        return state
+
+    def publish(self, package_id: str, fields: Dict[str, Any]) -> None:
+        subscribers = self._subscribers.get(package_id)
+        if not subscribers:
+            return
+        previous = self._state.get(package_id, {"package_id": package_id})
+        state = {**previous, **{field: fields[field] for field in LIVE_FIELDS if field in fields}}
+        if state == previous:
+            return
+        self._state[package_id] = state
+        self.published += 1
+        for subscription in subscribers:
+            subscription.offer(state)
+
+    def touch(self, package_ids: Iterable[str]) -> None:
+        """Note that this worker changed these packages; a change stream makes this unnecessary"""
+        if self.source == CHANGE_STREAM:
+            return
+        watched = [package_id for package_id in package_ids if package_id in self._subscribers]
+        if watched:
+            self._dirty.update(watched)
+            self._dirty_event.set()
+
+    def touch_all(self) -> None:
+        """For bulk writes that do not report which packages they changed"""
+        self.touch(list(self._subscribers))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "subscribers": self._count,
+            "packages": len(self._subscribers),
+            "published": self.published,
+        }
+
+    async def start(self, db, source: str = CHANGE_STREAM) -> None:
+        if self._tasks:
+            return
+        self.source = source
+        self._dirty_event = asyncio.Event()  # bound to the loop serving the app
+        self._tasks = [asyncio.create_task(self._refresh(db))]
+        if source == CHANGE_STREAM:
+            self._tasks.append(asyncio.create_task(self._watch(db)))
+
+    async def stop(self) -> None:
+        """End every open stream and stop listening for changes"""
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.offer(_CLOSED)
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _refresh(self, db) -> None:
+        while True:
+            await self._dirty_event.wait()
+            # Let a burst of writes settle, then re-read everything it touched at once
+            await asyncio.sleep(self.coalesce_seconds)
+            self._dirty_event.clear()
+            package_ids = [package_id for package_id in self._dirty if package_id in self._subscribers]
+            self._dirty = set()
+            if not package_ids:
+                continue
+            projection = {"_id": 0, "id": 1, **{field: 1 for field in LIVE_FIELDS}}
+            try:
+                async for package in db.packages.find({"id": {"$in": package_ids}}, projection):
+                    self.publish(package["id"], package)
+            except PyMongoError as e:
+                logger.error(f"Live availability refresh error: {str(e)}")
+
+    async def _watch(self, db) -> None:
+        updated = [{f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in LIVE_FIELDS]
+        pipeline = [
+            {"$match": {"$or": [{"operationType": "replace"}, {"operationType": "update", "$or": updated}]}},
+            {"$project": {
+                "operationType": 1,
+                "documentKey": 1,
+                **{f"fullDocument.{field}": 1 for field in LIVE_FIELDS},
+                **{f"updateDescription.updatedFields.{field}": 1 for field in LIVE_FIELDS},
+            }},
+        ]
+        resume_token = None
+        delay = 1.0
+        while True:
+            try:
+                async with db.packages.watch(pipeline, resume_after=resume_token) as stream:
+                    delay = 1.0
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        package_id = self._document_ids.get(change["documentKey"]["_id"])
+                        if package_id is None:
+                            continue
+                        if change["operationType"] == "replace":
+                            self.publish(package_id, change.get("fullDocument", {}))
+                        else:
+                            self.publish(package_id, change["updateDescription"]["updatedFields"])
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.error("Change streams need a replica set; live availability follows this worker's writes")
+                    self.source = HOOKS
+                    return
+                # e.g. the resume point fell off the oplog: start afresh
+                logger.error(f"Package change stream error, reconnecting in {delay:.0f}s: {str(e)}")
+                resume_token = None
+            except PyMongoError as e:
+                logger.error(f"Package change stream error, reconnecting in {delay:.0f}s: {str(e)}")
+            # Changes may have been missed while disconnected: re-read everything watched
+            self._dirty.update(self._subscribers)
+            self._dirty_event.set()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+def format_event(state: Dict[str, Any], event: str = "availability") -> bytes:
+    return f"event: {event}\ndata: {json.dumps(state, separators=(',', ':'))}\n\n".encode()
+
+
+async def event_stream(
+    hub: AvailabilityHub,
+    subscription: Subscription,
+    initial: Dict[str, Any],
+    heartbeat_seconds: float = 15.0,
+    retry_ms: int = 3000,
+) -> AsyncIterator[bytes]:
+    """SSE body: the current state, then each change, with comment heartbeats in between"""
+    try:
+        yield f"retry: {retry_ms}\n".encode() + format_event(initial)
+        last = initial
+        while True:
+            state = await subscription.next(heartbeat_seconds)
+            if state is _CLOSED:
+                return
+            if state is None:
+                yield b": keep-alive\n\n"
+                continue
+            if state != last:
+                last = state
+                yield format_event(state)
+            # At most one event per interval; changes meanwhile collapse into the next one
+            await asyncio.sleep(hub.coalesce_seconds)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+class EventStreamResponse(StreamingResponse):
+    """SSE response that releases its subscription however the response ends.
+
+    The generator's own cleanup only runs once it has started; a client
+    that disconnects before the first chunk would otherwise leak the slot.
+    """
+
+    def __init__(self, hub: AvailabilityHub, subscription: Subscription, content, **kwargs):
+        kwargs.setdefault("media_type", "text/event-stream")
+        super().__init__(content, **kwargs)
+        self.hub = hub
+        self.subscription = subscription
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.hub.unsubscribe(self.subscription)
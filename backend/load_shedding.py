@@ -0,0 +1,69 @@
+import json
+from typing import Callable, Optional, Sequence
+
+from metrics import SHED_REQUESTS
+
+
+class LoadSheddingMiddleware:
+    """ASGI middleware refusing work with 503 + Retry-After when the worker is saturated.
+
+    A request is shed when ``max_in_flight`` requests are already being
+    served, or when more than ``max_pool_waiters`` operations are queued for
+    a MongoDB connection. Failing those requests fast keeps latency bounded
+    for the ones already admitted instead of letting every request queue.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_in_flight: int = 0,
+        max_pool_waiters: int = 0,
+        pool_waiters: Optional[Callable[[], int]] = None,
+        retry_after: int = 1,
+        exempt_paths: Sequence[str] = ("/metrics",),
+        exempt_suffixes: Sequence[str] = (),
+    ):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.max_pool_waiters = max_pool_waiters
+        self.pool_waiters = pool_waiters
+        self.retry_after = retry_after
+        self.exempt_paths = tuple(exempt_paths)
+        # Long-lived streams would hold in-flight slots for their whole lifetime
+        self.exempt_suffixes = tuple(exempt_suffixes)
+        self.in_flight = 0
+
+    def overload_reason(self) -> Optional[str]:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.max_pool_waiters and self.pool_waiters is not None and self.pool_waiters() > self.max_pool_waiters:
+            return "mongo_pool"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths or (
+            self.exempt_suffixes and scope["path"].endswith(self.exempt_suffixes)
+        ):
+            return await self.app(scope, receive, send)
+
+        reason = self.overload_reason()
+        if reason is not None:
+            SHED_REQUESTS.inc(reason)
+            body = json.dumps({"detail": "Service is busy, please retry"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,342 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Mapping
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                items = list(self._callback().items())
+            except Exception as e:
+                logger.error(f"Metric callback {self.name} failed: {str(e)}")
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[labels] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"]))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"))
+MONGO_COMMANDS = REGISTRY.register(Counter(
+    "mongo_commands_total", "MongoDB commands by collection", ["collection", "command", "outcome"]))
+MONGO_LATENCY = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection", ["collection", "command"]))
+MONGO_PER_REQUEST = REGISTRY.register(Histogram(
+    "mongo_commands_per_request", "MongoDB commands issued per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 4, 5, 8, 12, 20, 50)))
+OUTBOUND_LATENCY = REGISTRY.register(Histogram(
+    "outbound_http_duration_seconds", "Outbound HTTP call latency", ["service", "outcome"]))
+RATE_LIMITED = REGISTRY.register(Counter(
+    "http_requests_rate_limited_total", "Requests refused with 429 by rate limit rule", ["rule"]))
+SHED_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_shed_total", "Requests refused with 503 by load shedding", ["reason"]))
+JOBS = REGISTRY.register(Counter(
+    "background_jobs_total", "Background job runs by kind and outcome", ["kind", "outcome"]))
+JOB_LATENCY = REGISTRY.register(Histogram(
+    "background_job_duration_seconds", "Background job run time by kind", ["kind"]))
+
+
+class RequestStats:
+    """Mongo commands issued while serving one request"""
+
+    def __init__(self, capture_queries: bool = False):
+        self.capture_queries = capture_queries
+        self.commands: List[Tuple[str, str, float, str]] = []
+
+
+def query_shape(spec):
+    """``spec`` with every leaf value replaced by its type, e.g. ``{"session_token": "<str>"}``
+
+    Slow-request logs show which fields a query touched without the values,
+    which can be session tokens or customer details.
+    """
+    if isinstance(spec, Mapping):
+        return {key: query_shape(value) for key, value in spec.items()}
+    if isinstance(spec, (list, tuple)):
+        return [query_shape(value) for value in spec]
+    return f"<{type(spec).__name__}>"
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every Motor/PyMongo command and attributes it to the current request.
+
+    Motor runs commands on its executor with a copy of the caller's context,
+    so ``current_request`` is visible here.
+    """
+
+    IGNORED = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+    def __init__(self):
+        self._started: Dict[Tuple, Tuple[str, str]] = {}
+
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "-"
+        stats = current_request.get()
+        query = ""
+        if stats is not None and stats.capture_queries:
+            spec = event.command.get("filter", event.command.get("pipeline", event.command.get("updates")))
+            query = str(query_shape(spec))[:300] if spec is not None else ""
+        self._started[(event.connection_id, event.request_id)] = (collection, query)
+
+    def _finish(self, event, outcome: str):
+        entry = self._started.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        collection, query = entry
+        duration = event.duration_micros / 1e6
+        MONGO_COMMANDS.inc(collection, event.command_name, outcome)
+        MONGO_LATENCY.observe(duration, collection, event.command_name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.commands.append((collection, event.command_name, duration, query))
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Tracks pooled connections in use and operations waiting to check one out"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_use = 0
+        self.open = 0
+
+    def _add(self, field: str, amount: int) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def connection_check_out_started(self, event):
+        self._add("waiting", 1)
+
+    def connection_check_out_failed(self, event):
+        self._add("waiting", -1)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+
+    def connection_checked_in(self, event):
+        self._add("in_use", -1)
+
+    def connection_created(self, event):
+        self._add("open", 1)
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"waiting": self.waiting, "in_use": self.in_use, "open": self.open}
+
+
+MONGO_POOL = MongoPoolListener()
+REGISTRY.register(Gauge(
+    "mongo_pool_connections", "MongoDB pool connections by state", ["state"],
+    callback=lambda: {(state,): value for state, value in MONGO_POOL.stats().items()}))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, in-flight requests and Mongo usage"""
+
+    def __init__(self, app, slow_request_seconds: float = 0.0):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500, "stream": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                status["stream"] = any(
+                    name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+            await send(message)
+
+        stats = RequestStats(capture_queries=self.slow_request_seconds > 0)
+        token = current_request.set(stats)
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, route_path, str(status["code"]))
+            HTTP_LATENCY.observe(duration, method, route_path)
+            MONGO_PER_REQUEST.observe(len(stats.commands), route_path)
+            # Event streams are long by design; their duration says nothing about slowness
+            if self.slow_request_seconds and duration >= self.slow_request_seconds and not status["stream"]:
+                queries = "; ".join(
+                    f"{command} {collection} {elapsed * 1000:.1f}ms {query}"
+                    for collection, command, elapsed, query in stats.commands
+                )
+                logger.warning(
+                    f"Slow request {method} {route_path} {duration * 1000:.1f}ms "
+                    f"status={status['code']} mongo_commands={len(stats.commands)} [{queries}]"
+                )
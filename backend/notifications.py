@@ -0,0 +1,92 @@
+import asyncio
+import smtplib
+import time
+from datetime import datetime, timezone
+from email.message import EmailMessage
+from typing import Any, Dict, Optional
+
+import httpx
+
+from metrics import OUTBOUND_LATENCY
+
+
+class NotificationError(Exception):
+    """Raised when a notification target refuses or cannot be reached; the job is retried"""
+
+
+class WebhookNotifier:
+    """Posts ``{"event", "data", "sent_at"}`` JSON to one configured URL"""
+
+    def __init__(self, url: str, timeout: float = 10.0, secret: Optional[str] = None):
+        self.url = url
+        self.secret = secret
+        self._timeout = httpx.Timeout(timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self._timeout)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def send(self, event: str, data: Dict[str, Any]) -> None:
+        headers = {"X-Webhook-Secret": self.secret} if self.secret else None
+        body = {"event": event, "data": data, "sent_at": datetime.now(timezone.utc).isoformat()}
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(self.url, json=body, headers=headers)
+        except httpx.TransportError as e:
+            OUTBOUND_LATENCY.observe(time.perf_counter() - started, "webhook", "error")
+            raise NotificationError(f"{type(e).__name__}: {e}")
+        OUTBOUND_LATENCY.observe(time.perf_counter() - started, "webhook", str(response.status_code))
+        if response.status_code >= 300:
+            raise NotificationError(f"Webhook returned {response.status_code}")
+
+
+class EmailSender:
+    """Plain-text mail over SMTP; each message uses its own connection in a worker thread"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        sender: str = "noreply@localhost",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def _send(self, message: EmailMessage) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            smtp.send_message(message)
+
+    async def send(self, to: str, subject: str, body: str) -> None:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = to
+        message["Subject"] = subject
+        message.set_content(body)
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._send, message)
+        except (OSError, smtplib.SMTPException) as e:
+            OUTBOUND_LATENCY.observe(time.perf_counter() - started, "smtp", "error")
+            raise NotificationError(f"{type(e).__name__}: {e}")
+        OUTBOUND_LATENCY.observe(time.perf_counter() - started, "smtp", "ok")
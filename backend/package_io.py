@@ -0,0 +1,227 @@
+import codecs
+import csv
+import io
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Type
+
+import orjson
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from departure_dates import parse_departure
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "ndjson"
+CSV = "csv"
+FORMATS = (NDJSON, CSV)
+MEDIA_TYPES = {NDJSON: "application/x-ndjson", CSV: "text/csv"}
+
+# List columns in CSV files hold their items separated by this character
+CSV_LIST_SEPARATOR = "|"
+
+# Per-row errors listed in an import report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+Row = Tuple[int, Any]
+
+
+class ImportFormatError(ValueError):
+    """Raised when an import stream cannot be read at all (e.g. no CSV header)"""
+
+
+async def _lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without holding more than one chunk"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_ndjson_rows(chunks: AsyncIterable[bytes]) -> AsyncIterator[Row]:
+    """(line number, parsed object or error message) for each non-blank line"""
+    number = 0
+    async for line in _lines(chunks):
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            yield number, orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield number, f"Invalid JSON: {e}"
+
+
+async def iter_csv_rows(chunks: AsyncIterable[bytes], list_fields: Sequence[str] = ()) -> AsyncIterator[Row]:
+    """(record number, dict or error message) for each CSV record after the header.
+
+    Records may span lines inside quoted fields; a record is complete once it
+    holds an even number of quote characters.
+    """
+    header: Optional[List[str]] = None
+    record = ""
+    number = 0
+    async for line in _lines(chunks):
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record]), [])
+        record = ""
+        if header is None:
+            header = [name.strip() for name in values]
+            if not any(header):
+                raise ImportFormatError("CSV header row is missing")
+            continue
+        if not any(value.strip() for value in values):
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        row: Dict[str, Any] = dict(zip(header, values))
+        for field in list_fields:
+            if field in row:
+                row[field] = [item.strip() for item in row[field].split(CSV_LIST_SEPARATOR) if item.strip()]
+        yield number, row
+    if record:
+        yield number + 1, "Unterminated quoted field"
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def error(self, row: int, message: Any) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+def _validation_errors(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()]
+
+
+async def _flush(db, batch: List[Tuple[int, UpdateOne]], report: ImportReport) -> None:
+    try:
+        result = await db.packages.bulk_write([operation for _, operation in batch], ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for write_error in details.get("writeErrors", []):
+            report.error(batch[write_error["index"]][0], write_error.get("errmsg", "Write failed"))
+    report.inserted += details.get("nUpserted", 0)
+    report.updated += details.get("nMatched", 0)
+
+
+async def import_packages(
+    db,
+    rows: AsyncIterable[Row],
+    model: Type[BaseModel],
+    batch_size: int = 500,
+) -> Dict[str, Any]:
+    """Validate rows against ``model`` and upsert them by ``id`` in unordered batches.
+
+    Rows without an ``id`` are inserted under a new one; rows with an ``id``
+    replace that package's fields, keeping its ``created_at``. ``availability``
+    only seeds new packages: an existing package's live stock already
+    accounts for held and confirmed seats, so a re-import never resets it.
+    """
+    report = ImportReport()
+    batch: List[Tuple[int, UpdateOne]] = []
+    async for number, raw in rows:
+        report.processed += 1
+        if isinstance(raw, str):
+            report.error(number, raw)
+            continue
+        if not isinstance(raw, dict):
+            report.error(number, "Expected an object")
+            continue
+        try:
+            fields = model(**raw).model_dump()
+        except ValidationError as e:
+            report.error(number, _validation_errors(e))
+            continue
+        package_id = str(raw.get("id") or "").strip() or str(uuid.uuid4())
+        fields.update(parse_departure(fields.get("departure_date")))
+        on_insert = {"id": package_id, "saved_count": 0, "created_at": datetime.now(timezone.utc)}
+        if "availability" in fields:
+            on_insert["availability"] = fields.pop("availability")
+        batch.append((number, UpdateOne(
+            {"id": package_id},
+            {"$set": fields, "$setOnInsert": on_insert},
+            upsert=True,
+        )))
+        if len(batch) >= batch_size:
+            await _flush(db, batch, report)
+            batch = []
+    if batch:
+        await _flush(db, batch, report)
+    return report.as_dict()
+
+
+async def csv_chunks(
+    docs: AsyncIterable[Dict[str, Any]],
+    fields: Sequence[str],
+    list_fields: Sequence[str] = (),
+    chunk_size: int = 64 * 1024,
+) -> AsyncIterator[bytes]:
+    """Encode documents as CSV records, yielding roughly ``chunk_size`` bytes at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(fields)
+    async for doc in docs:
+        row = []
+        for name in fields:
+            value = doc.get(name)
+            if name in list_fields and isinstance(value, list):
+                value = CSV_LIST_SEPARATOR.join(str(item) for item in value)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            row.append("" if value is None else value)
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+async def export_packages(
+    db,
+    query: Dict[str, Any],
+    fields: Sequence[str],
+    sort: Sequence[Tuple[str, int]],
+    fmt: str = NDJSON,
+    batch_size: int = 500,
+    list_fields: Sequence[str] = (),
+) -> AsyncIterator[bytes]:
+    """Stream matching packages as NDJSON lines or CSV records, one cursor batch at a time"""
+    projection = {"_id": 0, **{name: 1 for name in fields}}
+    cursor = db.packages.find(query, projection).sort(list(sort)).batch_size(batch_size)
+    if fmt == CSV:
+        async for chunk in csv_chunks(cursor, fields, list_fields):
+            yield chunk
+    else:
+        async for doc in cursor:
+            yield orjson.dumps({name: doc.get(name) for name in fields}) + b"\n"
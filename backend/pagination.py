@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+Sort = Sequence[Tuple[str, int]]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(doc: Dict[str, Any], sort: Sort) -> str:
+    """Opaque token holding the sort-key values of the last row on a page"""
+    values = []
+    for field, _ in sort:
+        value = doc.get(field)
+        if isinstance(value, datetime):
+            value = {"$date": value.isoformat()}
+        values.append(value)
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: Sort) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(str(e))
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursorError("Cursor does not match sort order")
+    decoded = []
+    for value in values:
+        if isinstance(value, dict) and "$date" in value:
+            try:
+                value = datetime.fromisoformat(value["$date"])
+            except (TypeError, ValueError) as e:
+                raise InvalidCursorError(str(e))
+        decoded.append(value)
+    return decoded
+
+
+def keyset_filter(sort: Sort, values: Sequence[Any]) -> Dict[str, Any]:
+    """Filter matching rows strictly after ``values`` in ``sort`` order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev: values[j] for j, (prev, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    sort: Sort,
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one keyset page; returns the rows and the cursor for the next page"""
+    if cursor:
+        after = keyset_filter(sort, decode_cursor(cursor, sort))
+        query = {"$and": [query, after]} if query else after
+    docs = await collection.find(query, projection).sort(list(sort)).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort)
+    return docs, next_cursor
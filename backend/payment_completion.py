@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo.errors import ConnectionFailure
+
+import inventory
+import reports
+
+logger = logging.getLogger(__name__)
+
+# Called after commit with the payments this call completed (see _completed)
+OnCompleted = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+COMPLETED = "completed"
+NOT_FOUND = "not_found"
+HOLD_EXPIRED = "hold_expired"
+
+
+def _payable(now: datetime) -> Dict[str, Any]:
+    """Bookings that may take a payment: an unexpired hold, or one already
+    confirmed (a retried completion, or a booking from before seat holds)"""
+    return {"$or": [
+        {"booking_status": inventory.HELD, "hold_expires_at": {"$gt": now}},
+        {"booking_status": inventory.CONFIRMED},
+    ]}
+
+
+_CONFIRM_BOOKING = {
+    "$set": {"booking_status": inventory.CONFIRMED, "payment_status": COMPLETED},
+    "$unset": {"hold_expires_at": ""},
+}
+
+
+class PaymentNotFoundError(Exception):
+    pass
+
+
+class HoldExpiredError(Exception):
+    pass
+
+
+_transaction_support: Dict[int, bool] = {}
+
+
+async def supports_transactions(client) -> bool:
+    """True when connected to a replica set or sharded cluster (cached per client)"""
+    key = id(client)
+    if key not in _transaction_support:
+        try:
+            hello = await client.admin.command("hello")
+            _transaction_support[key] = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception:
+            _transaction_support[key] = False
+    return _transaction_support[key]
+
+
+async def run_atomically(
+    db,
+    fn: Callable[[Optional[Any]], Awaitable[Any]],
+    mode: str = "auto",
+    retries: int = 3,
+    backoff: float = 0.05,
+):
+    """Run ``fn(session)`` in a multi-document transaction when available.
+
+    ``with_transaction`` retries TransientTransactionError and unknown commit
+    results. Without transactions (standalone servers) ``fn`` runs with no
+    session and is retried on connection failures; callers order their
+    writes so that a partial run is completed by a retry.
+    """
+    use_transaction = mode == "on" or (mode == "auto" and await supports_transactions(db.client))
+    if use_transaction:
+        async with await db.client.start_session() as session:
+            return await session.with_transaction(fn)
+
+    attempt = 0
+    while True:
+        try:
+            return await fn(None)
+        except ConnectionFailure as e:
+            if attempt >= retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            attempt += 1
+            logger.warning(f"Payment completion failed ({str(e)}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+_PAYMENT_FIELDS = {
+    "_id": 0, "id": 1, "booking_id": 1, "payment_status": 1, "amount": 1, "payment_method": 1, "claim_id": 1
+}
+_BOOKING_FIELDS = {"_id": 0, "id": 1, "package_id": 1, "num_passengers": 1}
+
+
+def _completed(payment: Dict[str, Any], booking: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "payment_id": payment["id"],
+        "booking_id": payment["booking_id"],
+        "package_id": booking["package_id"],
+        "seats": booking["num_passengers"],
+        "amount": payment["amount"],
+        "payment_method": payment["payment_method"],
+    }
+
+
+async def complete_payment(
+    db, user_id: str, payment_id: str, mode: str = "auto", on_completed: Optional[OnCompleted] = None
+) -> None:
+    """Confirm the booking hold and complete one payment atomically"""
+
+    async def txn(session):
+        now = datetime.now(timezone.utc)
+        payment = await db.payments.find_one(
+            {"id": payment_id, "user_id": user_id}, _PAYMENT_FIELDS, session=session
+        )
+        if not payment:
+            raise PaymentNotFoundError(payment_id)
+        if payment["payment_status"] == COMPLETED:
+            return None
+        # Booking first: if we stop after this write, a retry still sees a
+        # confirmed booking and completes the payment.
+        booking = await db.bookings.find_one_and_update(
+            {"id": payment["booking_id"], **_payable(now)},
+            _CONFIRM_BOOKING,
+            projection=_BOOKING_FIELDS,
+            session=session,
+        )
+        if booking is None:
+            raise HoldExpiredError(payment["booking_id"])
+        result = await db.payments.update_one(
+            {"id": payment_id, "payment_status": {"$ne": COMPLETED}},
+            {"$set": {"payment_status": COMPLETED, "completed_at": now}},
+            session=session,
+        )
+        # A concurrent completion won the race and already counted it
+        return _completed(payment, booking) if result.modified_count else None
+
+    completed = await run_atomically(db, txn, mode)
+    if completed:
+        await reports.record_payments(db, [completed])
+        if on_completed:
+            await on_completed([completed])
+
+
+async def complete_payments(
+    db, user_id: str, payment_ids: List[str], mode: str = "auto", on_completed: Optional[OnCompleted] = None
+) -> Dict[str, str]:
+    """Complete many payments with a fixed number of round trips.
+
+    Payments are tagged with a claim id as they are completed and only
+    those carrying this call's claim are reported, so one that a concurrent
+    completion finished first is not counted twice. The claim also finds
+    payments completed by an earlier attempt of this call that lost its
+    connection before it could report them.
+
+    Returns the outcome per payment id: completed, not_found or hold_expired.
+    """
+    payment_ids = list(dict.fromkeys(payment_ids))
+    claim_id = uuid.uuid4().hex
+
+    async def txn(session):
+        now = datetime.now(timezone.utc)
+        payments = await db.payments.find(
+            {"id": {"$in": payment_ids}, "user_id": user_id}, _PAYMENT_FIELDS, session=session
+        ).to_list(None)
+        outcome = {payment_id: NOT_FOUND for payment_id in payment_ids}
+        pending = {}
+        claimed = []
+        for payment in payments:
+            if payment["payment_status"] != COMPLETED:
+                pending[payment["id"]] = payment
+            elif payment.get("claim_id") == claim_id:
+                claimed.append(payment)
+            outcome[payment["id"]] = COMPLETED
+
+        confirmed = {}
+        if pending:
+            booking_ids = list({payment["booking_id"] for payment in pending.values()})
+            await db.bookings.update_many(
+                {"id": {"$in": booking_ids}, "user_id": user_id, **_payable(now)},
+                _CONFIRM_BOOKING,
+                session=session,
+            )
+            confirmed = {
+                booking["id"]: booking
+                async for booking in db.bookings.find(
+                    {"id": {"$in": booking_ids}, "booking_status": inventory.CONFIRMED},
+                    _BOOKING_FIELDS,
+                    session=session,
+                )
+            }
+            payable = [payment_id for payment_id, payment in pending.items() if payment["booking_id"] in confirmed]
+            if payable:
+                await db.payments.update_many(
+                    {"id": {"$in": payable}, "payment_status": {"$ne": COMPLETED}},
+                    {"$set": {"payment_status": COMPLETED, "completed_at": now, "claim_id": claim_id}},
+                    session=session,
+                )
+                # Only what this call's update_many flipped; a concurrent completion reports the rest
+                claimed += await db.payments.find(
+                    {"id": {"$in": payable}, "claim_id": claim_id}, _PAYMENT_FIELDS, session=session
+                ).to_list(None)
+            for payment_id, payment in pending.items():
+                if payment["booking_id"] not in confirmed:
+                    outcome[payment_id] = HOLD_EXPIRED
+
+        # Bookings of payments an earlier attempt of this call completed
+        missing = list({payment["booking_id"] for payment in claimed} - set(confirmed))
+        if missing:
+            async for booking in db.bookings.find({"id": {"$in": missing}}, _BOOKING_FIELDS, session=session):
+                confirmed[booking["id"]] = booking
+        return outcome, [_completed(payment, confirmed[payment["booking_id"]]) for payment in claimed]
+
+    outcome, completed = await run_atomically(db, txn, mode)
+    await reports.record_payments(db, completed)
+    if completed and on_completed:
+        await on_completed(completed)
+    return outcome
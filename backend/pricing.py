@@ -0,0 +1,299 @@
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+CURRENCY = "IDR"
+
+# Per-quote error codes
+PACKAGE_NOT_FOUND = "package_not_found"
+ROOM_TYPE_UNAVAILABLE = "room_type_unavailable"
+PROMO_CODE_INVALID = "promo_code_invalid"
+PROMO_CODE_NOT_APPLICABLE = "promo_code_not_applicable"
+INVALID_PASSENGERS = "invalid_passengers"
+DEPARTURE_UNAVAILABLE = "departure_date_unavailable"
+
+# Day ordinals bounding open-ended promo and departure windows
+_NO_START = date.min.toordinal()
+_NO_END = date.max.toordinal()
+
+
+class QuoteRequest(NamedTuple):
+    """One package and passenger mix to price; also the memo key together with the rule version"""
+    package_id: str
+    adults: int
+    children: int = 0
+    infants: int = 0
+    room_type: Optional[str] = None
+    promo_code: Optional[str] = None
+    departure_date: Optional[date] = None
+
+    def normalized(self) -> "QuoteRequest":
+        return self._replace(
+            room_type=normalize_room(self.room_type) if self.room_type else None,
+            promo_code=normalize_code(self.promo_code) if self.promo_code else None,
+        )
+
+
+def normalize_room(name: str) -> str:
+    return " ".join(str(name).lower().replace("room", "").split())
+
+
+def normalize_code(code: str) -> str:
+    return str(code).strip().upper()
+
+
+def _ordinal(value: Any, default: int) -> int:
+    """Day ordinal of an ISO date string, date or datetime (stored rule dates are ISO strings)"""
+    if not value:
+        return default
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class PricingEngine:
+    """Package pricing rules compiled into NumPy arrays and evaluated in batches.
+
+    Each package's ``pricing`` rules (room supplements, child and infant
+    rates, seasonal surcharges) become one row of per-package arrays, and
+    promo codes one row of per-code arrays, so a batch of quotes for any
+    mix of packages and passengers is priced with a handful of vectorized
+    operations. Packages without rules price every passenger at the base
+    price. Quotes are memoized by (request, rule version, pricing day).
+
+    Per passenger, in rupiah:
+      adult  = (price + room supplement) * (1 + season %) + season amount
+      child  = adult * child_rate
+      infant = price * infant_rate
+    """
+
+    def __init__(self, memo_size: int = 50_000):
+        self.memo_size = memo_size
+        self.version: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+        self._memo: "OrderedDict[Tuple[QuoteRequest, Optional[Hashable], int], Dict[str, Any]]" = OrderedDict()
+        self.build([], [])
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def build(
+        self,
+        packages: Iterable[Dict[str, Any]],
+        promos: Iterable[Dict[str, Any]],
+        version: Optional[Hashable] = None,
+    ) -> None:
+        packages = list(packages)
+        self._ids = [package["id"] for package in packages]
+        self._position = {package_id: i for i, package_id in enumerate(self._ids)}
+        rules = [package.get("pricing") or {} for package in packages]
+
+        room_names = sorted({normalize_room(name) for rule in rules for name in rule.get("room_types") or {}})
+        self._room_columns = {name: j for j, name in enumerate(room_names)}
+
+        # One spare row/column so empty catalogs and rule sets still index cleanly
+        size = len(packages) + 1
+        self._base = np.zeros(size)
+        self._child_rate = np.ones(size)
+        self._infant_rate = np.ones(size)
+        # Departure window [start, end) as day ordinals; unparsed windows leave any date open
+        self._departure = np.zeros(size, dtype=np.int64)
+        self._departure_end = np.full(size, _NO_END, dtype=np.int64)
+        self._room_supplement = np.full((size, len(room_names) + 1), np.nan)
+        self._default_supplement = np.zeros(size)
+        self._default_room: List[Optional[str]] = [None] * size
+        season_rows = []
+        for i, (package, rule) in enumerate(zip(packages, rules)):
+            self._base[i] = package.get("price") or 0
+            self._child_rate[i] = rule.get("child_rate", 1.0)
+            self._infant_rate[i] = rule.get("infant_rate", 1.0)
+            self._departure[i] = _ordinal(package.get("departure_start"), 0)
+            self._departure_end[i] = _ordinal(package.get("departure_end"), _NO_END)
+            rooms = {normalize_room(name): supplement for name, supplement in (rule.get("room_types") or {}).items()}
+            for name, supplement in rooms.items():
+                self._room_supplement[i, self._room_columns[name]] = supplement
+            if rooms:
+                # Cheapest room unless the booking asks for another
+                self._default_room[i] = min(rooms, key=lambda name: (rooms[name], name))
+                self._default_supplement[i] = rooms[self._default_room[i]]
+            for season in rule.get("seasons") or []:
+                season_rows.append((
+                    i,
+                    _ordinal(season.get("start"), _NO_START),
+                    _ordinal(season.get("end"), _NO_END),
+                    season.get("surcharge_percent", 0),
+                    season.get("surcharge_amount", 0),
+                ))
+        seasons = np.array(season_rows, dtype=np.float64).reshape(len(season_rows), 5)
+        self._season_package = seasons[:, 0].astype(np.int64)
+        self._season_start = seasons[:, 1].astype(np.int64)
+        self._season_end = seasons[:, 2].astype(np.int64)
+        self._season_percent = seasons[:, 3]
+        self._season_amount = seasons[:, 4]
+
+        promos = list(promos)
+        self._promo_index = {normalize_code(promo["code"]): k for k, promo in enumerate(promos)}
+        count = len(promos) + 1
+        self._promo_percent = np.zeros(count)
+        self._promo_amount = np.zeros(count)
+        self._promo_cap = np.full(count, np.inf)
+        self._promo_min_passengers = np.zeros(count, dtype=np.int64)
+        self._promo_from = np.full(count, _NO_START, dtype=np.int64)
+        self._promo_until = np.full(count, _NO_END, dtype=np.int64)
+        self._promo_restricted = np.zeros(count, dtype=bool)
+        allowed = []
+        for k, promo in enumerate(promos):
+            self._promo_percent[k] = promo.get("percent_off", 0)
+            self._promo_amount[k] = promo.get("amount_off", 0)
+            if promo.get("max_discount") is not None:
+                self._promo_cap[k] = promo["max_discount"]
+            self._promo_min_passengers[k] = promo.get("min_passengers", 1)
+            self._promo_from[k] = _ordinal(promo.get("valid_from"), _NO_START)
+            self._promo_until[k] = _ordinal(promo.get("valid_until"), _NO_END)
+            if promo.get("package_ids"):
+                self._promo_restricted[k] = True
+                allowed.extend(k * size + self._position[p] for p in promo["package_ids"] if p in self._position)
+        # (promo, package) pairs a restricted code applies to, as flat keys for np.isin
+        self._promo_allowed = np.array(sorted(allowed), dtype=np.int64)
+
+        self._memo.clear()
+        self.version = version
+
+    def quote(self, requests: Sequence[QuoteRequest], today: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Price every request; memoized results are reused and the rest evaluated together"""
+        day = (today or date.today()).toordinal()
+        requests = [request.normalized() for request in requests]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        missing = []
+        for i, request in enumerate(requests):
+            key = (request, self.version, day)
+            cached = self._memo.get(key)
+            if cached is not None:
+                self._memo.move_to_end(key)
+                self.hits += 1
+                results[i] = cached
+            else:
+                missing.append(i)
+        if missing:
+            self.misses += len(missing)
+            for i, result in zip(missing, self._evaluate([requests[i] for i in missing], day)):
+                results[i] = result
+                self._memo[(requests[i], self.version, day)] = result
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return results
+
+    def _evaluate(self, requests: List[QuoteRequest], today: int) -> List[Dict[str, Any]]:
+        spare = len(self._ids)
+        position = np.array([self._position.get(r.package_id, -1) for r in requests], dtype=np.int64)
+        known = position >= 0
+        row = np.where(known, position, spare)
+        adults = np.array([r.adults for r in requests], dtype=np.int64)
+        children = np.array([r.children for r in requests], dtype=np.int64)
+        infants = np.array([r.infants for r in requests], dtype=np.int64)
+        passengers = adults + children + infants
+        # Every infant travels on an adult's lap
+        valid_mix = (adults >= 0) & (children >= 0) & (infants >= 0) & (passengers > 0) & (infants <= adults)
+
+        # Room: -1 means the package default, -2 a room type no package offers
+        column = np.array([
+            -1 if r.room_type is None else self._room_columns.get(r.room_type, -2) for r in requests
+        ], dtype=np.int64)
+        chosen = self._room_supplement[row, np.maximum(column, 0)]
+        supplement = np.where(column == -1, self._default_supplement[row], chosen)
+        room_ok = (column == -1) | ((column >= 0) & ~np.isnan(chosen))
+        supplement = np.nan_to_num(supplement)
+
+        requested_day = np.array([
+            r.departure_date.toordinal() if r.departure_date else 0 for r in requests
+        ], dtype=np.int64)
+        travel_day = np.where(requested_day > 0, requested_day, np.maximum(self._departure[row], today))
+        # The travel day, requested or implied, must be bookable: not past, and inside
+        # the package's departure window (an implied day falls after a window that ended)
+        departure_ok = (
+            (travel_day >= today)
+            & (travel_day >= self._departure[row])
+            & (travel_day < self._departure_end[row])
+        )
+
+        if len(self._season_package):
+            in_season = (
+                (self._season_package[None, :] == row[:, None])
+                & (self._season_start[None, :] <= travel_day[:, None])
+                & (travel_day[:, None] < self._season_end[None, :])
+            )
+            # Overlapping seasons do not stack: the steepest surcharge applies
+            season_percent = np.where(in_season, self._season_percent[None, :], 0.0).max(axis=1)
+            season_amount = np.where(in_season, self._season_amount[None, :], 0.0).max(axis=1)
+        else:
+            season_percent = np.zeros(len(requests))
+            season_amount = np.zeros(len(requests))
+
+        base = self._base[row]
+        per_adult = np.rint((base + supplement) * (1 + season_percent / 100) + season_amount)
+        per_child = np.rint(per_adult * self._child_rate[row])
+        per_infant = np.rint(base * self._infant_rate[row])
+        subtotal = adults * per_adult + children * per_child + infants * per_infant
+
+        promo = np.array([
+            -1 if r.promo_code is None else self._promo_index.get(r.promo_code, -2) for r in requests
+        ], dtype=np.int64)
+        code = np.maximum(promo, 0)
+        applicable = (
+            (promo >= 0)
+            & (self._promo_from[code] <= today)
+            & (today < self._promo_until[code])
+            & (passengers >= self._promo_min_passengers[code])
+            & (~self._promo_restricted[code] | np.isin(code * (spare + 1) + row, self._promo_allowed))
+        )
+        discount = np.minimum(
+            subtotal * self._promo_percent[code] / 100 + self._promo_amount[code], self._promo_cap[code]
+        )
+        discount = np.where(applicable, np.rint(np.minimum(discount, subtotal)), 0.0)
+        total = subtotal - discount
+
+        results = []
+        for i, request in enumerate(requests):
+            if not known[i]:
+                error = PACKAGE_NOT_FOUND
+            elif not valid_mix[i]:
+                error = INVALID_PASSENGERS
+            elif not departure_ok[i]:
+                error = DEPARTURE_UNAVAILABLE
+            elif not room_ok[i]:
+                error = ROOM_TYPE_UNAVAILABLE
+            elif promo[i] == -2:
+                error = PROMO_CODE_INVALID
+            elif promo[i] >= 0 and not applicable[i]:
+                error = PROMO_CODE_NOT_APPLICABLE
+            else:
+                error = None
+            if error:
+                results.append({"package_id": request.package_id, "error": error})
+                continue
+            results.append({
+                "package_id": request.package_id,
+                "adults": request.adults,
+                "children": request.children,
+                "infants": request.infants,
+                "room_type": request.room_type or self._default_room[row[i]],
+                "promo_code": request.promo_code,
+                "departure_date": date.fromordinal(int(travel_day[i])).isoformat(),
+                "currency": CURRENCY,
+                "per_adult": int(per_adult[i]),
+                "per_child": int(per_child[i]),
+                "per_infant": int(per_infant[i]),
+                "season_surcharge_percent": float(season_percent[i]),
+                "subtotal": int(subtotal[i]),
+                "discount": int(discount[i]),
+                "total": int(total[i]),
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {"packages": len(self._ids), "memo_size": len(self._memo), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,209 @@
+import json
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+
+class Limit(NamedTuple):
+    """Token bucket: bursts of up to ``capacity`` requests, refilled at capacity/per_seconds"""
+    capacity: int
+    per_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+class Rule(NamedTuple):
+    method: str
+    path: str  # route template, e.g. "/api/payments/{payment_id}/complete"
+    limit: Limit
+    by_ip: bool = False  # key by client IP even for signed-in callers (routes usable without login)
+
+
+# Resolves a bearer token to a stable caller id, or None when it is not a live session
+Identify = Callable[[str], Awaitable[Optional[str]]]
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+
+def _decide(tokens: float, cost: int, rate: float) -> Decision:
+    if tokens >= cost:
+        return Decision(True, int(tokens - cost), 0.0)
+    return Decision(False, 0, (cost - tokens) / rate)
+
+
+class MemoryBackend:
+    """Per-process buckets; each worker enforces its own share of the budget"""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: Limit, cost: int = 1) -> Decision:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (float(limit.capacity), now))
+        tokens = min(float(limit.capacity), tokens + (now - updated) * limit.rate)
+        decision = _decide(tokens, cost, limit.rate)
+        self._buckets[key] = (tokens - cost if decision.allowed else tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return decision
+
+
+class MongoBackend:
+    """Buckets shared by every worker, refilled and debited in one atomic update.
+
+    Documents expire through a TTL index on ``expires_at`` once a bucket
+    would be full again, so idle keys do not accumulate.
+    """
+
+    def __init__(self, db, collection: str = "rate_limits"):
+        self.collection = db[collection]
+
+    async def take(self, key: str, limit: Limit, cost: int = 1) -> Decision:
+        now = time.time()
+        refilled = {"$min": [
+            limit.capacity,
+            {"$add": [
+                {"$ifNull": ["$tokens", limit.capacity]},
+                {"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}, limit.rate]},
+            ]},
+        ]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated": now}},
+            {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=limit.per_seconds),
+            }},
+        ]
+        for attempt in range(2):
+            try:
+                doc = await self.collection.find_one_and_update(
+                    {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+                )
+                break
+            except DuplicateKeyError:
+                # Two first requests raced to create the bucket; the loser retries as an update
+                if attempt:
+                    raise
+        if doc["allowed"]:
+            return Decision(True, int(doc["tokens"]), 0.0)
+        return _decide(doc["tokens"], cost, limit.rate)
+
+
+def _compile(path: str) -> "re.Pattern":
+    return re.compile("^" + re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(path)) + "$")
+
+
+def bearer_token(scope) -> Optional[str]:
+    headers = dict(scope.get("headers", []))
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if authorization.startswith("Bearer ") and len(authorization) > 7:
+        return authorization[7:]
+    return None
+
+
+def client_identity(scope, trust_forwarded: bool = False) -> str:
+    """Bucket key for callers without a verified session: the client IP"""
+    headers = dict(scope.get("headers", []))
+    if trust_forwarded and b"x-forwarded-for" in headers:
+        return "ip:" + headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying the first matching rule's token bucket, else ``default``.
+
+    Callers whose bearer token ``identify`` resolves to a live session get
+    their own bucket; everyone else, and every caller on ``by_ip`` rules, is
+    keyed by client IP, so made-up tokens cannot mint fresh buckets.
+    Requests over budget get 429 with Retry-After. If the backend fails the
+    request is let through: the limiter protects the service, it must not
+    take it down.
+    """
+
+    def __init__(
+        self,
+        app,
+        rules: Sequence[Rule] = (),
+        default: Optional[Limit] = None,
+        backend=None,
+        trust_forwarded: bool = False,
+        identify: Optional[Identify] = None,
+    ):
+        self.app = app
+        self.rules: List[Tuple[str, "re.Pattern", Rule]] = [
+            (rule.method.upper(), _compile(rule.path), rule) for rule in rules
+        ]
+        self.default = default
+        self.backend = backend or MemoryBackend()
+        self.trust_forwarded = trust_forwarded
+        self.identify = identify
+
+    def match(self, method: str, path: str) -> Tuple[Optional[str], Optional[Limit], bool]:
+        for rule_method, pattern, rule in self.rules:
+            if rule_method in (method, "*") and pattern.match(path):
+                return f"{rule.method} {rule.path}", rule.limit, rule.by_ip
+        if self.default is not None:
+            return "default", self.default, False
+        return None, None, False
+
+    async def caller(self, scope, by_ip: bool) -> str:
+        token = bearer_token(scope) if self.identify is not None and not by_ip else None
+        if token:
+            try:
+                caller_id = await self.identify(token)
+            except PyMongoError as e:
+                logger.error(f"Rate limit session lookup error, keying by IP: {str(e)}")
+                caller_id = None
+            if caller_id:
+                return "user:" + caller_id
+        return client_identity(scope, self.trust_forwarded)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+        name, limit, by_ip = self.match(scope["method"], scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        key = f"{name}|{await self.caller(scope, by_ip)}"
+        try:
+            decision = await self.backend.take(key, limit)
+        except PyMongoError as e:
+            logger.error(f"Rate limit backend error, allowing request: {str(e)}")
+            return await self.app(scope, receive, send)
+
+        if decision.allowed:
+            return await self.app(scope, receive, send)
+        RATE_LIMITED.inc(name)
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(decision.retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,224 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Daily rollups, one document per (day, package) and per (day, payment method).
+# Days are UTC "YYYY-MM-DD" strings so they sort and range-match as text.
+PACKAGE_STATS = "package_daily_stats"
+REVENUE_STATS = "revenue_daily_stats"
+
+PACKAGE_COUNTERS = ("bookings", "seats_booked", "booked_value", "seats_confirmed", "confirmed_value", "seats_released")
+REVENUE_COUNTERS = ("payments", "revenue")
+
+
+def day_key(moment: Optional[datetime] = None) -> str:
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d")
+
+
+def _package_update(day: str, package_id: str, counters: Dict[str, int]) -> UpdateOne:
+    return UpdateOne(
+        {"_id": f"{day}:{package_id}"},
+        {"$inc": counters, "$setOnInsert": {"day": day, "package_id": package_id}},
+        upsert=True,
+    )
+
+
+def _revenue_update(day: str, payment_method: str, counters: Dict[str, int]) -> UpdateOne:
+    return UpdateOne(
+        {"_id": f"{day}:{payment_method}"},
+        {"$inc": counters, "$setOnInsert": {"day": day, "payment_method": payment_method}},
+        upsert=True,
+    )
+
+
+async def _apply(db, collection: str, operations: List[UpdateOne]) -> None:
+    """Rollups are derived data: a failed update is logged, never raised to the caller"""
+    if not operations:
+        return
+    try:
+        await db[collection].bulk_write(operations, ordered=False)
+    except PyMongoError as e:
+        logger.error(f"Rollup update on {collection} failed, rebuild to reconcile: {str(e)}")
+
+
+async def record_booking(db, package_id: str, seats: int, value: int, at: Optional[datetime] = None) -> None:
+    await _apply(db, PACKAGE_STATS, [
+        _package_update(day_key(at), package_id, {"bookings": 1, "seats_booked": seats, "booked_value": value})
+    ])
+
+
+async def record_payments(db, completed: Iterable[Dict[str, Any]], at: Optional[datetime] = None) -> None:
+    """Count payments that just moved to completed.
+
+    Each entry holds ``package_id``, ``seats``, ``amount`` and ``payment_method``.
+    """
+    day = day_key(at)
+    per_package: Dict[str, Dict[str, int]] = defaultdict(lambda: {"seats_confirmed": 0, "confirmed_value": 0})
+    per_method: Dict[str, Dict[str, int]] = defaultdict(lambda: {"payments": 0, "revenue": 0})
+    for payment in completed:
+        per_package[payment["package_id"]]["seats_confirmed"] += payment["seats"]
+        per_package[payment["package_id"]]["confirmed_value"] += payment["amount"]
+        per_method[payment["payment_method"]]["payments"] += 1
+        per_method[payment["payment_method"]]["revenue"] += payment["amount"]
+    await _apply(db, PACKAGE_STATS, [_package_update(day, p, c) for p, c in per_package.items()])
+    await _apply(db, REVENUE_STATS, [_revenue_update(day, m, c) for m, c in per_method.items()])
+
+
+async def record_released(db, seats_by_package: Dict[str, int], at: Optional[datetime] = None) -> None:
+    day = day_key(at)
+    await _apply(db, PACKAGE_STATS, [
+        _package_update(day, package_id, {"seats_released": seats})
+        for package_id, seats in seats_by_package.items()
+    ])
+
+
+def _day_range(day_from: Optional[str], day_to: Optional[str]) -> Dict[str, Any]:
+    days: Dict[str, str] = {}
+    if day_from:
+        days["$gte"] = day_from
+    if day_to:
+        days["$lte"] = day_to
+    return {"day": days} if days else {}
+
+
+async def package_report(db, day_from: Optional[str] = None, day_to: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per-package totals over a day range, with the package's remaining seats"""
+    totals = await db[PACKAGE_STATS].aggregate([
+        {"$match": _day_range(day_from, day_to)},
+        {"$group": {"_id": "$package_id", **{name: {"$sum": f"${name}"} for name in PACKAGE_COUNTERS}}},
+    ]).to_list(None)
+    packages = {
+        package["id"]: package
+        async for package in db.packages.find(
+            {"id": {"$in": [row["_id"] for row in totals]}},
+            {"_id": 0, "id": 1, "name": 1, "availability": 1},
+        )
+    }
+    report = []
+    for row in totals:
+        package = packages.get(row["_id"], {})
+        report.append({
+            "package_id": row["_id"],
+            "name": package.get("name"),
+            "availability": package.get("availability"),
+            **{name: row.get(name, 0) for name in PACKAGE_COUNTERS},
+        })
+    report.sort(key=lambda row: (-row["confirmed_value"], row["package_id"]))
+    return report
+
+
+async def revenue_report(db, day_from: Optional[str] = None, day_to: Optional[str] = None) -> Dict[str, Any]:
+    """Completed revenue per day and payment method, with totals"""
+    days = await db[REVENUE_STATS].find(
+        _day_range(day_from, day_to), {"_id": 0, "day": 1, "payment_method": 1, **{n: 1 for n in REVENUE_COUNTERS}}
+    ).sort([("day", 1), ("payment_method", 1)]).to_list(None)
+    by_method: Dict[str, Dict[str, int]] = defaultdict(lambda: {"payments": 0, "revenue": 0})
+    for row in days:
+        for name in REVENUE_COUNTERS:
+            row.setdefault(name, 0)
+            by_method[row["payment_method"]][name] += row[name]
+    return {
+        "days": days,
+        "by_method": dict(by_method),
+        "total": {name: sum(row[name] for row in days) for name in REVENUE_COUNTERS},
+    }
+
+
+async def _replace_all(db, collection: str, docs: List[Dict[str, Any]]) -> None:
+    """Overwrite rollup documents in place (live $inc upserts keep working), then drop stale ones"""
+    if docs:
+        await db[collection].bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False
+        )
+    await db[collection].delete_many({"_id": {"$nin": [doc["_id"] for doc in docs]}})
+
+
+def _day_of(field: str) -> Dict[str, Any]:
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": field}}
+
+
+async def rebuild_rollups(db) -> Dict[str, int]:
+    """Recompute every rollup from bookings and payments (one-off backfill or reconciliation)"""
+    package_rows: Dict[tuple, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(PACKAGE_COUNTERS, 0))
+
+    async for row in db.bookings.aggregate([
+        {"$group": {
+            "_id": {"day": _day_of("$created_at"), "package_id": "$package_id"},
+            "bookings": {"$sum": 1},
+            "seats_booked": {"$sum": "$num_passengers"},
+            "booked_value": {"$sum": "$total_price"},
+        }},
+    ]):
+        counters = package_rows[(row["_id"]["day"], row["_id"]["package_id"])]
+        for name in ("bookings", "seats_booked", "booked_value"):
+            counters[name] = row[name]
+
+    async for row in db.bookings.aggregate([
+        {"$match": {"expired_at": {"$exists": True}}},
+        {"$group": {
+            "_id": {"day": _day_of("$expired_at"), "package_id": "$package_id"},
+            "seats_released": {"$sum": "$num_passengers"},
+        }},
+    ]):
+        package_rows[(row["_id"]["day"], row["_id"]["package_id"])]["seats_released"] = row["seats_released"]
+
+    revenue_rows: Dict[tuple, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(REVENUE_COUNTERS, 0))
+    async for row in db.payments.aggregate([
+        {"$match": {"payment_status": "completed"}},
+        {"$lookup": {"from": "bookings", "localField": "booking_id", "foreignField": "id", "as": "booking"}},
+        {"$unwind": "$booking"},
+        {"$group": {
+            "_id": {
+                "day": _day_of("$completed_at"),
+                "package_id": "$booking.package_id",
+                "payment_method": "$payment_method",
+            },
+            "payments": {"$sum": 1},
+            "seats": {"$sum": "$booking.num_passengers"},
+            "amount": {"$sum": "$amount"},
+        }},
+    ]):
+        key = row["_id"]
+        package_counters = package_rows[(key["day"], key["package_id"])]
+        package_counters["seats_confirmed"] += row["seats"]
+        package_counters["confirmed_value"] += row["amount"]
+        revenue_counters = revenue_rows[(key["day"], key["payment_method"])]
+        revenue_counters["payments"] += row["payments"]
+        revenue_counters["revenue"] += row["amount"]
+
+    await _replace_all(db, PACKAGE_STATS, [
+        {"_id": f"{day}:{package_id}", "day": day, "package_id": package_id, **counters}
+        for (day, package_id), counters in package_rows.items()
+    ])
+    await _replace_all(db, REVENUE_STATS, [
+        {"_id": f"{day}:{method}", "day": day, "payment_method": method, **counters}
+        for (day, method), counters in revenue_rows.items()
+    ])
+    return {"package_days": len(package_rows), "revenue_days": len(revenue_rows)}
+
+
+BOOKING_EXPORT_FIELDS = (
+    "id", "created_at", "package_id", "user_id", "customer_name", "customer_email", "customer_phone",
+    "num_passengers", "total_price", "booking_status", "payment_status",
+)
+
+
+def booking_export_cursor(db, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                          batch_size: int = 1000):
+    """Bookings in creation order, fetched from the server one batch at a time"""
+    query: Dict[str, Any] = {}
+    if created_from is not None:
+        query.setdefault("created_at", {})["$gte"] = created_from
+    if created_to is not None:
+        query.setdefault("created_at", {})["$lt"] = created_to
+    projection = {"_id": 0, **{name: 1 for name in BOOKING_EXPORT_FIELDS}}
+    return db.bookings.find(query, projection).sort([("created_at", 1), ("id", 1)]).batch_size(batch_size)
@@ -0,0 +1,200 @@
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Fields searched, with their weight in the relevance score
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "departure_city": 2.0,
+    "package_type": 2.0,
+    "airline": 2.0,
+    "hotel": 2.0,
+    "facilities": 1.5,
+    "duration": 1.0,
+    "departure_date": 1.0,
+    "description": 1.0,
+    "itinerary": 0.5,
+}
+
+# Matches on a longer word that merely starts with the query term count less
+PREFIX_MATCH_FACTOR = 0.5
+
+STOPWORDS = {"dan", "di", "ke", "dari", "dengan", "yang", "untuk", "atau", "the", "and", "of"}
+
+# Upper bounds (exclusive) of the price facet buckets, in rupiah
+PRICE_BUCKETS = [
+    ("< 5 jt", 5_000_000),
+    ("5 - 15 jt", 15_000_000),
+    ("15 - 30 jt", 30_000_000),
+    (">= 30 jt", None),
+]
+
+FACET_FIELDS = ("departure_city", "package_type", "airline", "hotel_rating")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode().lower()
+    return [token for token in _TOKEN.findall(text) if token not in STOPWORDS]
+
+
+def price_bucket(price: int) -> str:
+    for label, upper in PRICE_BUCKETS:
+        if upper is None or price < upper:
+            return label
+    return PRICE_BUCKETS[-1][0]
+
+
+class SearchIndex:
+    """In-memory inverted index and facet counts over the package catalog.
+
+    Postings map each term to ``{package_id: weighted term frequency}``. The
+    sorted vocabulary supports prefix matching, so "umr" finds "umrah" and
+    "bint" finds "Bintang". Catalog-wide facet counts are kept up to date as
+    packages are added, and facets for a query are counted in the same pass
+    that scores it.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._order: Dict[str, int] = {}
+        self._facets: Dict[str, Counter] = {}
+        self._reset()
+
+    def _reset(self) -> None:
+        self._postings = defaultdict(dict)
+        self._vocabulary = []
+        self._docs = {}
+        self._order = {}
+        self._facets = {field: Counter() for field in FACET_FIELDS + ("price",)}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def build(self, docs: Iterable[Dict[str, Any]], version: Optional[int] = None) -> None:
+        self._reset()
+        for doc in docs:
+            self._index(doc)
+        self._vocabulary = sorted(self._postings)
+        self.version = version
+
+    def add(self, doc: Dict[str, Any], version: Optional[int] = None) -> None:
+        """Index one new package and update the catalog-wide facet counts"""
+        if doc["id"] in self._docs:
+            return
+        self._index(doc)
+        self._vocabulary = sorted(self._postings)
+        if version is not None:
+            self.version = version
+
+    def _index(self, doc: Dict[str, Any]) -> None:
+        package_id = doc["id"]
+        self._docs[package_id] = {
+            "package_type": doc.get("package_type"),
+            "departure_city": doc.get("departure_city"),
+            "airline": doc.get("airline"),
+            "hotel_rating": doc.get("hotel_rating"),
+            "price": doc.get("price", 0),
+        }
+        self._order[package_id] = len(self._order)
+        for field, weight in FIELD_WEIGHTS.items():
+            value = doc.get(field)
+            if value is None:
+                continue
+            text = " ".join(value) if isinstance(value, list) else value
+            for token in tokenize(text):
+                postings = self._postings[token]
+                postings[package_id] = postings.get(package_id, 0.0) + weight
+        for field in FACET_FIELDS:
+            self._facets[field][doc.get(field)] += 1
+        self._facets["price"][price_bucket(doc.get("price", 0))] += 1
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Vocabulary terms matching ``term`` exactly or by prefix, with their factor"""
+        matches = []
+        start = bisect_left(self._vocabulary, term)
+        for candidate in self._vocabulary[start:]:
+            if not candidate.startswith(term):
+                break
+            matches.append((candidate, 1.0 if candidate == term else PREFIX_MATCH_FACTOR))
+        return matches
+
+    def _matches_filters(self, meta: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        for field in FACET_FIELDS:
+            wanted = filters.get(field)
+            if wanted is not None and meta[field] != wanted:
+                return False
+        if filters.get("min_price") is not None and meta["price"] < filters["min_price"]:
+            return False
+        if filters.get("max_price") is not None and meta["price"] > filters["max_price"]:
+            return False
+        return True
+
+    def search(
+        self,
+        query: str = "",
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """Rank packages for ``query``; every query term must match (by prefix)"""
+        filters = {key: value for key, value in (filters or {}).items() if value is not None}
+        terms = tokenize(query)
+
+        if terms:
+            total_docs = max(len(self._docs), 1)
+            scores: Optional[Dict[str, float]] = None
+            for term in terms:
+                term_scores: Dict[str, float] = defaultdict(float)
+                for candidate, factor in self._expand(term):
+                    postings = self._postings[candidate]
+                    idf = math.log(1 + total_docs / len(postings))
+                    for package_id, tf in postings.items():
+                        term_scores[package_id] += factor * idf * (1 + math.log(tf))
+                if scores is None:
+                    scores = dict(term_scores)
+                else:
+                    scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+                if not scores:
+                    break
+            scores = scores or {}
+        else:
+            scores = {package_id: 0.0 for package_id in self._docs}
+
+        if not filters and not terms:
+            facets = self._facets
+            matched = list(scores)
+        else:
+            facets = {field: Counter() for field in FACET_FIELDS + ("price",)}
+            matched = []
+            for package_id in scores:
+                meta = self._docs[package_id]
+                if filters and not self._matches_filters(meta, filters):
+                    continue
+                matched.append(package_id)
+                for field in FACET_FIELDS:
+                    facets[field][meta[field]] += 1
+                facets["price"][price_bucket(meta["price"])] += 1
+
+        matched.sort(key=lambda pid: (-scores[pid], self._order[pid]))
+        page = matched[offset:offset + limit]
+        return {
+            "total": len(matched),
+            "ids": page,
+            "scores": {pid: round(scores[pid], 4) for pid in page},
+            "facets": {
+                field: [
+                    {"value": value, "count": count}
+                    for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+                    if count
+                ]
+                for field, counts in facets.items()
+            },
+        }
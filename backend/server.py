@@ -1,28 +1,205 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Header, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 import hashlib
-import requests
+import functools
+import json
+import orjson
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+from session_cache import SessionCache
+from auth_client import EmergentAuthClient, InvalidSessionError, AuthServiceError
+from indexes import ensure_indexes, index_report
+from catalog_cache import CatalogCache, CachedResponse, SharedVersion, PRICING_VERSION_DOC_ID, etag_matches
+from pagination import paginate, InvalidCursorError
+import inventory
+import payment_completion
+import departure_dates
+import package_io
+import reports
+import wishlist
+import jobs
+import live_updates
+from notifications import EmailSender, WebhookNotifier
+from fast_json import RowEncoder
+import compression
+from rate_limit import Limit, Rule, RateLimitMiddleware, MemoryBackend, MongoBackend
+from load_shedding import LoadSheddingMiddleware
+from search_index import SearchIndex, FIELD_WEIGHTS, FACET_FIELDS
+from similar_packages import SimilarityIndex, FEATURE_FIELDS
+import pricing
+import metrics
+import database
+from idempotency import IdempotencyStore, IdempotencyKeyReusedError, IdempotencyKeyInProgressError
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, pool and read settings (MONGO_* env vars, see database.MongoSettings).
+# create_app() opens the client, so an app can be built with its own settings.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+mongo_settings = None
+client = None
+db = None
 
-# Create the main app
-app = FastAPI(title="Umroh Hemat API", version="1.0.0")
+# Uncached catalog reads (search rows, export, home) tolerate slight staleness and may
+# go to secondaries. Pages kept in catalog_cache are read from the primary like the
+# version they are cached under, so a lagging secondary cannot pin older rows to it.
+CATALOG_READ_PREFERENCE = database.read_preference("primary")
+
+def connect_mongo(settings: database.MongoSettings):
+    """Create the Motor client for ``settings`` and point this module's handles at it"""
+    global client, db, mongo_settings, CATALOG_READ_PREFERENCE
+    mongo_settings = settings
+    client = database.create_client(
+        mongo_url, settings, event_listeners=[metrics.MongoCommandListener(), metrics.MONGO_POOL]
+    )
+    db = client[os.environ['DB_NAME']]
+    CATALOG_READ_PREFERENCE = database.read_preference(
+        settings.catalog_read_preference, settings.catalog_max_staleness
+    )
+    return client
+
+def catalog_db():
+    """The database handle for uncached catalog reads"""
+    return database.with_read_preference(db, CATALOG_READ_PREFERENCE)
+
+# In-process cache of resolved sessions (token -> User)
+session_cache = SessionCache(
+    maxsize=int(os.environ.get('SESSION_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('SESSION_CACHE_TTL', '60')),
+    tombstone_ttl=float(os.environ.get('SESSION_CACHE_TOMBSTONE_TTL', '10'))
+)
+
+# Per-worker cache of serialized catalog responses
+catalog_cache = CatalogCache(
+    maxsize=int(os.environ.get('CATALOG_CACHE_SIZE', '512')),
+    check_interval=float(os.environ.get('CATALOG_VERSION_CHECK_INTERVAL', '1')),
+    max_age=float(os.environ.get('CATALOG_CACHE_MAX_AGE', '10'))
+)
+
+# Unpaid seat holds lapse after this window and are returned to stock
+BOOKING_HOLD_MINUTES = float(os.environ.get('BOOKING_HOLD_MINUTES', '30'))
+HOLD_SWEEP_INTERVAL = float(os.environ.get('HOLD_SWEEP_INTERVAL', '60'))
+
+# In-memory full-text/facet index over the catalog, rebuilt when the catalog version changes
+search_index = SearchIndex()
+search_index_lock = asyncio.Lock()
+SEARCH_PROJECTION = {"_id": 0, "id": 1, "price": 1, **{f: 1 for f in (*FIELD_WEIGHTS, *FACET_FIELDS)}}
+
+# Precomputed "similar packages" for every package, rebuilt like the search index
+similar_index = SimilarityIndex(neighbours=int(os.environ.get('SIMILAR_PACKAGES_K', '10')))
+similar_index_lock = asyncio.Lock()
+SIMILAR_PROJECTION = {"_id": 0, "id": 1, **{f: 1 for f in FEATURE_FIELDS}}
+
+# Package pricing rules and promo codes compiled for batched quotes, rebuilt when the catalog
+# changes or pricing_version does; pricing and promo writes bump only the latter, so they
+# leave cached catalog pages alone
+pricing_engine = pricing.PricingEngine(memo_size=int(os.environ.get('QUOTE_MEMO_SIZE', '50000')))
+pricing_version = SharedVersion(
+    PRICING_VERSION_DOC_ID, check_interval=float(os.environ.get('CATALOG_VERSION_CHECK_INTERVAL', '1'))
+)
+pricing_engine_lock = asyncio.Lock()
+PRICING_PROJECTION = {"_id": 0, "id": 1, "price": 1, "departure_start": 1, "departure_end": 1, "pricing": 1}
+QUOTE_BATCH_MAX = int(os.environ.get('QUOTE_BATCH_MAX', '200'))
+
+# Home screen section sizes
+HOME_FEATURED_LIMIT = int(os.environ.get('HOME_FEATURED_LIMIT', '6'))
+HOME_WISHLIST_LIMIT = int(os.environ.get('HOME_WISHLIST_LIMIT', '20'))
+HOME_BOOKINGS_LIMIT = int(os.environ.get('HOME_BOOKINGS_LIMIT', '5'))
+
+# Signed-in users allowed on admin routes, by email (comma-separated)
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+# Multi-document transactions: "auto" uses them when the deployment supports them
+MONGO_TRANSACTIONS = os.environ.get('MONGO_TRANSACTIONS', 'auto')
+
+# Stored outcomes of requests retried with an Idempotency-Key
+idempotency_store = IdempotencyStore(
+    ttl=float(os.environ.get('IDEMPOTENCY_KEY_TTL', str(24 * 3600))),
+    wait_timeout=float(os.environ.get('IDEMPOTENCY_WAIT_TIMEOUT', '30')),
+    lease_seconds=float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '30'))
+)
+
+# Shared async client for the Emergent Auth session exchange
+auth_client = EmergentAuthClient(
+    base_url=os.environ.get('EMERGENT_AUTH_URL', 'https://demobackend.emergentagent.com'),
+    timeout=float(os.environ.get('EMERGENT_AUTH_TIMEOUT', '10')),
+    connect_timeout=float(os.environ.get('EMERGENT_AUTH_CONNECT_TIMEOUT', '3')),
+    retries=int(os.environ.get('EMERGENT_AUTH_RETRIES', '2')),
+    backoff=float(os.environ.get('EMERGENT_AUTH_BACKOFF', '0.2'))
+)
+
+# Token-bucket budgets per session token (or client IP when anonymous)
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+RATE_LIMIT_RULES = [
+    # Usable without a login: always budgeted per client IP
+    Rule("POST", "/api/auth/session", Limit(10, 60), by_ip=True),
+    Rule("POST", "/api/seed", Limit(2, 60), by_ip=True),
+    Rule("POST", "/api/packages/import", Limit(5, 60), by_ip=True),
+    Rule("POST", "/api/packages", Limit(30, 60), by_ip=True),
+    Rule("POST", "/api/bookings", Limit(10, 60)),
+    Rule("POST", "/api/quotes/batch", Limit(60, 60)),
+    Rule("POST", "/api/payments", Limit(20, 60)),
+    Rule("POST", "/api/payments/{payment_id}/complete", Limit(20, 60)),
+    Rule("POST", "/api/payments/complete-batch", Limit(5, 60)),
+]
+RATE_LIMIT_DEFAULT = Limit(
+    int(os.environ.get('RATE_LIMIT_DEFAULT_REQUESTS', '300')),
+    float(os.environ.get('RATE_LIMIT_DEFAULT_SECONDS', '60'))
+)
+# "mongo" shares buckets between workers; "memory" enforces the budget per worker
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+# Only behind a proxy that overwrites X-Forwarded-For, or clients can pick their own key
+TRUST_FORWARDED_FOR = os.environ.get('TRUST_FORWARDED_FOR', '').lower() in ('1', 'true', 'yes')
+
+# Load shedding thresholds; 0 disables a check
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', '256'))
+MAX_MONGO_POOL_WAITERS = int(os.environ.get('MAX_MONGO_POOL_WAITERS', '64'))
+
+# Open connections and fill the catalog cache before serving the first request
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP', '1').lower() in ('1', 'true', 'yes')
+
+# Live availability streams: "auto" uses a change stream on replica sets, else this
+# worker's own write hooks; updates to a package are pushed at most once per interval
+LIVE_UPDATES_SOURCE = os.environ.get('LIVE_UPDATES_SOURCE', 'auto')
+LIVE_HEARTBEAT_SECONDS = float(os.environ.get('LIVE_HEARTBEAT_SECONDS', '15'))
+live_hub = live_updates.AvailabilityHub(
+    max_subscribers=int(os.environ.get('LIVE_MAX_STREAMS', '5000')),
+    coalesce_seconds=float(os.environ.get('LIVE_COALESCE_SECONDS', '0.5'))
+)
+LIVE_STREAM_SUFFIX = "/availability/stream"
+
+# Background job workers per process; 0 only enqueues, leaving the jobs to other processes
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+JOB_DRAIN_TIMEOUT = float(os.environ.get('JOB_DRAIN_TIMEOUT', '10'))
+
+# Side-effect targets, run as background jobs; each is skipped when not configured
+NOTIFY_WEBHOOK_URL = os.environ.get('NOTIFY_WEBHOOK_URL')
+webhook_notifier = WebhookNotifier(
+    NOTIFY_WEBHOOK_URL,
+    timeout=float(os.environ.get('NOTIFY_WEBHOOK_TIMEOUT', '10')),
+    secret=os.environ.get('NOTIFY_WEBHOOK_SECRET')
+) if NOTIFY_WEBHOOK_URL else None
+SMTP_HOST = os.environ.get('SMTP_HOST')
+email_sender = EmailSender(
+    SMTP_HOST,
+    port=int(os.environ.get('SMTP_PORT', '587')),
+    sender=os.environ.get('SMTP_FROM', 'Umroh Hemat <noreply@umrohhemat.id>'),
+    username=os.environ.get('SMTP_USERNAME'),
+    password=os.environ.get('SMTP_PASSWORD'),
+    starttls=os.environ.get('SMTP_STARTTLS', '1').lower() in ('1', 'true', 'yes'),
+    timeout=float(os.environ.get('SMTP_TIMEOUT', '10'))
+) if SMTP_HOST else None
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -61,6 +238,10 @@ class PackageItem(BaseModel):
     package_type: str  # "umrah" or "tour"
     departure_city: str
     departure_date: str
+    # Parsed from departure_date: window [start, end) and "daily"/"weekly"/... schedules
+    departure_start: Optional[datetime] = None
+    departure_end: Optional[datetime] = None
+    departure_recurrence: Optional[str] = None
     airline: str
     hotel: str
     hotel_rating: int
@@ -68,8 +249,25 @@ class PackageItem(BaseModel):
     itinerary: List[str]
     image_url: str
     availability: int
+    saved_count: int = 0  # wishlist saves, maintained by the wishlist module
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class PackageCard(BaseModel):
+    """Compact package row for list screens"""
+    id: str
+    name: str
+    price: int
+    duration: str
+    package_type: str
+    departure_city: str
+    departure_date: str
+    airline: str
+    hotel_rating: int
+    image_url: str
+    availability: int
+    saved_count: int = 0
+    created_at: datetime
+
 class PackageCreate(BaseModel):
     name: str
     description: str
@@ -94,9 +292,16 @@ class Booking(BaseModel):
     customer_email: str
     customer_phone: str
     num_passengers: int
+    children: int = 0
+    infants: int = 0
+    room_type: Optional[str] = None
+    promo_code: Optional[str] = None
+    departure_date: Optional[str] = None  # ISO day the total was priced for
+    discount: int = 0
     total_price: int
     payment_status: str  # "pending", "completed", "failed"
-    booking_status: str  # "confirmed", "cancelled"
+    booking_status: str  # "held", "confirmed", "expired", "cancelled"
+    hold_expires_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class BookingCreate(BaseModel):
@@ -104,7 +309,49 @@ class BookingCreate(BaseModel):
     customer_name: str
     customer_email: str
     customer_phone: str
-    num_passengers: int
+    num_passengers: int = Field(gt=0)
+    # Of num_passengers; the rest are adults
+    children: int = Field(0, ge=0)
+    infants: int = Field(0, ge=0)
+    room_type: Optional[str] = None
+    promo_code: Optional[str] = None
+    departure_date: Optional[date] = None
+
+class SeasonSurcharge(BaseModel):
+    name: str = ""
+    start: date
+    end: date  # exclusive
+    surcharge_percent: float = Field(0, ge=0)
+    surcharge_amount: int = Field(0, ge=0)  # per adult and child
+
+class PackagePricing(BaseModel):
+    room_types: Dict[str, int] = Field(default_factory=dict)  # per-person supplement, e.g. {"Quad": 0, "Double": 4000000}
+    child_rate: float = Field(1.0, ge=0)  # fraction of the adult price
+    infant_rate: float = Field(1.0, ge=0)  # fraction of the base price
+    seasons: List[SeasonSurcharge] = Field(default_factory=list)
+
+class PromoCode(BaseModel):
+    code: str = Field(min_length=1, max_length=64)
+    percent_off: float = Field(0, ge=0, le=100)
+    amount_off: int = Field(0, ge=0)
+    max_discount: Optional[int] = Field(None, ge=0)
+    min_passengers: int = Field(1, ge=1)
+    package_ids: List[str] = Field(default_factory=list)  # empty: every package
+    valid_from: Optional[date] = None
+    valid_until: Optional[date] = None  # exclusive
+    active: bool = True
+
+class QuoteItem(BaseModel):
+    package_id: str
+    adults: int = Field(1, ge=0)
+    children: int = Field(0, ge=0)
+    infants: int = Field(0, ge=0)
+    room_type: Optional[str] = None
+    promo_code: Optional[str] = None
+    departure_date: Optional[date] = None
+
+class QuoteBatch(BaseModel):
+    items: List[QuoteItem] = Field(min_length=1, max_length=QUOTE_BATCH_MAX)
 
 class Payment(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -121,12 +368,78 @@ class PaymentCreate(BaseModel):
     booking_id: str
     payment_method: str
 
+class PaymentBatchComplete(BaseModel):
+    payment_ids: List[str] = Field(min_length=1, max_length=500)
+
 class Wishlist(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     package_id: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class WishlistBulkUpdate(BaseModel):
+    add: List[str] = Field(default_factory=list, max_length=500)
+    remove: List[str] = Field(default_factory=list, max_length=500)
+
+# Stable keyset orders used for cursor pagination
+PACKAGE_SORT = [("created_at", 1), ("id", 1)]
+PACKAGE_POPULAR_SORT = [(wishlist.SAVED_COUNT, -1), ("id", 1)]
+PACKAGE_SORTS = {"newest": PACKAGE_SORT, "popular": PACKAGE_POPULAR_SORT}
+# Home screen: latest packages first (the created_id index, walked backwards)
+FEATURED_SORT = [("created_at", -1), ("id", -1)]
+USER_ITEMS_SORT = [("created_at", -1), ("id", -1)]
+
+# Response model and pre-compiled field projection for each package view mode
+PACKAGE_VIEW_MODELS = {"full": PackageItem, "card": PackageCard}
+PACKAGE_ENCODERS = {view: RowEncoder(model) for view, model in PACKAGE_VIEW_MODELS.items()}
+BOOKING_ENCODER = RowEncoder(Booking)
+
+@functools.lru_cache(maxsize=256)
+def _package_field_encoder(view: str, fields: tuple) -> RowEncoder:
+    return RowEncoder(PACKAGE_VIEW_MODELS[view], fields)
+
+def package_encoder(view: str, fields: Optional[str]) -> RowEncoder:
+    """Encoder for a view, narrowed to a comma-separated ?fields= list (id always included)"""
+    if not fields:
+        return PACKAGE_ENCODERS[view]
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(PACKAGE_ENCODERS[view].fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return _package_field_encoder(view, tuple(sorted(requested | {"id"})))
+
+# Opt-in: serialize trusted Mongo documents straight to JSON with orjson
+# instead of building, re-validating and encoding Pydantic models
+FAST_JSON = os.environ.get('FAST_JSON', '').lower() in ('1', 'true', 'yes')
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+async def fetch_page(collection, query, sort, limit, cursor, projection):
+    """Fetch one keyset page, mapping bad cursors to a 400"""
+    try:
+        return await paginate(collection, query, sort, limit, cursor, projection)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def run_idempotent(scope: str, user, idempotency_key: Optional[str], payload, handler):
+    """Run handler once per Idempotency-Key, replaying the stored response for repeats"""
+    if not idempotency_key:
+        return await handler()
+    if len(idempotency_key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key too long")
+    try:
+        result, replayed = await idempotency_store.run(
+            db, scope, user.id, idempotency_key, payload, handler
+        )
+    except IdempotencyKeyReusedError:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was used with a different request")
+    except IdempotencyKeyInProgressError:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    return JSONResponse(content=result, headers={"Idempotent-Replayed": "true" if replayed else "false"})
+
 # ==================== AUTH HELPERS ====================
 
 async def get_current_user(authorization: Optional[str] = None, session_token: Optional[str] = None) -> Optional[User]:
@@ -136,22 +449,49 @@ async def get_current_user(authorization: Optional[str] = None, session_token: O
     if not token:
         return None
     
-    # Find session
-    session = await db.user_sessions.find_one({
-        "session_token": token,
-        "expires_at": {"$gt": datetime.now(timezone.utc)}
-    })
+    user = session_cache.get(token)
+    if user:
+        return user
     
-    if not session:
-        return None
+    # Resolve session and user in a single round trip
+    docs = await db.user_sessions.aggregate([
+        {"$match": {
+            "session_token": token,
+            "expires_at": {"$gt": datetime.now(timezone.utc)}
+        }},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "_id",
+            "as": "user"
+        }},
+        {"$unwind": "$user"},
+        {"$project": {"_id": 0, "expires_at": 1, "user": 1}}
+    ]).to_list(1)
     
-    # Find user
-    user_doc = await db.users.find_one({"_id": session["user_id"]})
-    if not user_doc:
+    if not docs:
         return None
     
+    user_doc = docs[0]["user"]
     user_doc["id"] = user_doc.pop("_id")
-    return User(**user_doc)
+    user = User(**user_doc)
+    session_cache.set(token, user, docs[0]["expires_at"])
+    return user
+
+async def rate_limit_caller(token: str) -> Optional[str]:
+    """Rate-limit bucket owner for a bearer token: the user id of a live session"""
+    user = await get_current_user(session_token=token)
+    return user.id if user else None
+
+async def require_admin(authorization: Optional[str] = Header(None)) -> User:
+    """Route dependency: the caller must be signed in with an email listed in ADMIN_EMAILS"""
+    user = await get_current_user(authorization=authorization)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
 
 # ==================== AUTH ENDPOINTS ====================
 
@@ -163,40 +503,37 @@ async def process_session(request: Request, x_session_id: str = Header(None)):
             raise HTTPException(status_code=400, detail="Session ID required")
         
         # Call Emergent Auth to get session data
-        emergent_auth_url = os.environ.get('EMERGENT_AUTH_URL', 'https://demobackend.emergentagent.com')
-        response = requests.get(
-            f"{emergent_auth_url}/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": x_session_id}
-        )
-        
-        if response.status_code != 200:
+        try:
+            session_data = await auth_client.get_session_data(x_session_id)
+        except InvalidSessionError:
             raise HTTPException(status_code=401, detail="Invalid session")
+        except AuthServiceError as e:
+            logger.error(f"Emergent Auth unavailable: {str(e)}")
+            raise HTTPException(status_code=503, detail="Auth service unavailable")
         
-        session_data = response.json()
-        
-        # Check if user exists
-        user_doc = await db.users.find_one({"_id": session_data["email"]})
-        
-        if not user_doc:
-            # Create new user
-            new_user = {
-                "_id": session_data["email"],
+        # Create user if it does not exist yet
+        await db.users.update_one(
+            {"_id": session_data["email"]},
+            {"$setOnInsert": {
                 "email": session_data["email"],
                 "name": session_data["name"],
                 "picture": session_data.get("picture"),
                 "created_at": datetime.now(timezone.utc)
-            }
-            await db.users.insert_one(new_user)
+            }},
+            upsert=True
+        )
         
         # Create session
         session_token = session_data["session_token"]
-        user_session = {
-            "user_id": session_data["email"],
-            "session_token": session_token,
-            "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-            "created_at": datetime.now(timezone.utc)
-        }
-        await db.user_sessions.insert_one(user_session)
+        await db.user_sessions.update_one(
+            {"session_token": session_token},
+            {"$setOnInsert": {
+                "user_id": session_data["email"],
+                "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
+                "created_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
         
         return {
             "user": {
@@ -208,6 +545,8 @@ async def process_session(request: Request, x_session_id: str = Header(None)):
             "session_token": session_token
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Session processing error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -225,19 +564,99 @@ async def logout(authorization: Optional[str] = Header(None)):
     """Logout user"""
     if authorization:
         token = authorization.replace("Bearer ", "")
+        # Delete first: a lookup racing the logout then finds no session, or is refused by the tombstone
         await db.user_sessions.delete_one({"session_token": token})
+        session_cache.invalidate(token)
     return {"message": "Logged out successfully"}
 
+@api_router.get("/auth/cache-stats", dependencies=[Depends(require_admin)])
+async def get_session_cache_stats():
+    """Session cache hit/miss counters"""
+    return session_cache.stats()
+
 # ==================== PACKAGE ENDPOINTS ====================
 
-@api_router.get("/packages", response_model=List[PackageItem])
+def serialize_json(content) -> bytes:
+    """Serialize like FastAPI's JSONResponse"""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+def serialize_rows(docs, model, encoder: RowEncoder) -> bytes:
+    """Serialize Mongo documents as a JSON list of model"""
+    if FAST_JSON:
+        return encoder.encode_many(docs)
+    if encoder.partial:
+        return serialize_json([encoder.row(doc) for doc in docs])
+    return serialize_json([model(**doc) for doc in docs])
+
+def serialize_row(doc, model, encoder: RowEncoder) -> bytes:
+    """Serialize one Mongo document as model"""
+    if FAST_JSON:
+        return encoder.encode_one(doc)
+    if encoder.partial:
+        return serialize_json(encoder.row(doc))
+    return serialize_json(model(**doc))
+
+def rows(docs, model, encoder: RowEncoder) -> list:
+    """Mongo documents as models, or as plain field dicts on the fast path"""
+    if FAST_JSON or encoder.partial:
+        return [encoder.row(doc) for doc in docs]
+    return [model(**doc) for doc in docs]
+
+def catalog_response(
+    entry: CachedResponse, if_none_match: Optional[str], accept_encoding: Optional[str] = None
+) -> Response:
+    """Serve a cached catalog body, or 304 when the client already has it.
+
+    Compressed bodies are cached on the entry, so each encoding is
+    compressed once per catalog version rather than on every hit.
+    """
+    encoding = compression.negotiate(accept_encoding) if len(entry.body) >= COMPRESSION_MIN_SIZE else None
+    etag = compression.variant_etag(entry.etag, encoding)
+    headers = {**(entry.headers or {}), "ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=compression.encoded_body(entry, encoding), media_type="application/json", headers=headers)
+
+@api_router.get("/packages", response_model=Union[List[PackageItem], List[PackageCard]])
 async def get_packages(
     package_type: Optional[str] = None,
     min_price: Optional[int] = None,
     max_price: Optional[int] = None,
-    departure_city: Optional[str] = None
+    departure_city: Optional[str] = None,
+    departure_from: Optional[date] = None,
+    departure_to: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|card)$"),
+    fields: Optional[str] = None,
+    sort: str = Query("newest", pattern="^(newest|popular)$"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
 ):
-    """Get all packages with optional filters"""
+    """Get packages with optional filters, one cursor page at a time.
+
+    ``sort=popular`` orders by wishlist saves; counts in cached pages may
+    trail live saves until the catalog cache entry ages out.
+    """
+    encoder = package_encoder(view, fields)
+    await catalog_cache.sync(db)
+    cache_key = (
+        "list", package_type, min_price, max_price, departure_city, departure_from, departure_to,
+        limit, cursor, view, encoder.fields, sort
+    )
+    entry = catalog_cache.get(cache_key)
+    if entry:
+        return catalog_response(entry, if_none_match, accept_encoding)
+    
+    version = catalog_cache.version
     query = {}
     if package_type:
         query["package_type"] = package_type
@@ -247,63 +666,366 @@ async def get_packages(
         query.setdefault("price", {})["$lte"] = max_price
     if departure_city:
         query["departure_city"] = departure_city
+    # Packages departing at any time between the two dates, both inclusive
+    query.update(departure_dates.departure_filter(
+        datetime.combine(departure_from, datetime.min.time(), timezone.utc) if departure_from else None,
+        datetime.combine(departure_to + timedelta(days=1), datetime.min.time(), timezone.utc) if departure_to else None
+    ))
+    
+    # Sort keys are read even when not requested: the next cursor is built from them
+    order = PACKAGE_SORTS[sort]
+    projection = {**encoder.projection, **{field: 1 for field, _ in order}}
+    packages, next_cursor = await fetch_page(
+        db.packages, query, order, limit, cursor, projection
+    )
+    body = serialize_rows(packages, PACKAGE_VIEW_MODELS[view], encoder)
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return catalog_response(catalog_cache.set(cache_key, body, version, headers), if_none_match, accept_encoding)
+
+async def ensure_search_index() -> SearchIndex:
+    """Rebuild the search index if the catalog changed since it was built"""
+    await catalog_cache.sync(db)
+    if search_index.version is None or search_index.version != catalog_cache.version:
+        async with search_index_lock:
+            version = catalog_cache.version
+            if search_index.version is None or search_index.version != version:
+                # Primary read: an index built from a lagging secondary would keep
+                # missing packages until the next catalog write
+                docs = await db.packages.find({}, SEARCH_PROJECTION).to_list(None)
+                search_index.build(docs, version)
+    return search_index
+
+async def ensure_similar_index() -> SimilarityIndex:
+    """Recompute all nearest neighbours if the catalog changed since the last build"""
+    global similar_index
+    await catalog_cache.sync(db)
+    if similar_index.version is None or similar_index.version != catalog_cache.version:
+        async with similar_index_lock:
+            version = catalog_cache.version
+            if similar_index.version is None or similar_index.version != version:
+                docs = await db.packages.find({}, SIMILAR_PROJECTION).to_list(None)
+                # Scoring is CPU-bound: build off the event loop, then swap the new index in
+                rebuilt = SimilarityIndex(neighbours=similar_index.neighbours)
+                await asyncio.to_thread(rebuilt.build, docs, version)
+                similar_index = rebuilt
+    return similar_index
+
+async def ensure_pricing_engine(force: bool = False) -> pricing.PricingEngine:
+    """Recompile pricing rules and promo codes if the catalog or pricing changed since the last build"""
+    await catalog_cache.sync(db)
+    await pricing_version.sync(db)
+    if force or pricing_engine.version != (catalog_cache.version, pricing_version.version):
+        async with pricing_engine_lock:
+            version = (catalog_cache.version, pricing_version.version)
+            if force or pricing_engine.version != version:
+                packages = await db.packages.find({}, PRICING_PROJECTION).to_list(None)
+                promos = await db.promo_codes.find({"active": True}, {"_id": 0}).to_list(None)
+                pricing_engine.build(packages, promos, version)
+    return pricing_engine
+
+@api_router.get("/packages/search")
+async def search_packages(
+    q: str = "",
+    package_type: Optional[str] = None,
+    departure_city: Optional[str] = None,
+    airline: Optional[str] = None,
+    hotel_rating: Optional[int] = None,
+    min_price: Optional[int] = None,
+    max_price: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """Full-text package search with relevance ranking and facet counts"""
+    index = await ensure_search_index()
+    found = index.search(
+        q,
+        filters={
+            "package_type": package_type,
+            "departure_city": departure_city,
+            "airline": airline,
+            "hotel_rating": hotel_rating,
+            "min_price": min_price,
+            "max_price": max_price
+        },
+        limit=limit,
+        offset=offset
+    )
+    
+    # Page rows come from Mongo so seat counts are current
+    encoder = PACKAGE_ENCODERS["card"]
+    docs = await catalog_db().packages.find(
+        {"id": {"$in": found["ids"]}}, encoder.projection
+    ).to_list(len(found["ids"]))
+    by_id = {doc["id"]: doc for doc in docs}
+    ranked = [by_id[package_id] for package_id in found["ids"] if package_id in by_id]
     
-    packages = await db.packages.find(query).to_list(100)
-    return [PackageItem(**pkg) for pkg in packages]
+    payload = {
+        "total": found["total"],
+        "results": rows(ranked, PackageCard, encoder),
+        "facets": found["facets"]
+    }
+    body = orjson.dumps(payload) if FAST_JSON else serialize_json(payload)
+    return Response(content=body, media_type="application/json")
+
+PACKAGE_LIST_FIELDS = ("facilities", "itinerary")
+
+@api_router.get("/packages/export")
+async def export_packages(
+    format: str = Query(package_io.NDJSON, pattern="^(ndjson|csv)$"),
+    package_type: Optional[str] = None
+):
+    """Stream the catalog as NDJSON or CSV in the format the import accepts"""
+    query = {"package_type": package_type} if package_type else {}
+    chunks = package_io.export_packages(
+        catalog_db(), query, PACKAGE_ENCODERS["full"].fields, PACKAGE_SORT, format, list_fields=PACKAGE_LIST_FIELDS
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=package_io.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="packages.{format}"'}
+    )
 
 @api_router.get("/packages/{package_id}", response_model=PackageItem)
-async def get_package(package_id: str):
+async def get_package(
+    package_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
     """Get single package by ID"""
-    package = await db.packages.find_one({"id": package_id})
+    encoder = package_encoder("full", fields)
+    await catalog_cache.sync(db)
+    cache_key = ("detail", package_id, encoder.fields)
+    entry = catalog_cache.get(cache_key)
+    if entry:
+        return catalog_response(entry, if_none_match, accept_encoding)
+    
+    version = catalog_cache.version
+    package = await db.packages.find_one({"id": package_id}, encoder.projection)
     if not package:
         raise HTTPException(status_code=404, detail="Package not found")
-    return PackageItem(**package)
+    body = serialize_row(package, PackageItem, encoder)
+    return catalog_response(catalog_cache.set(cache_key, body, version), if_none_match, accept_encoding)
+
+@api_router.get("/packages/{package_id}/similar", response_model=List[PackageCard])
+async def get_similar_packages(
+    package_id: str,
+    limit: int = Query(6, ge=1, le=50),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """Packages most like this one, best match first, from the precomputed neighbour lists"""
+    await catalog_cache.sync(db)
+    cache_key = ("similar", package_id, limit)
+    entry = catalog_cache.get(cache_key)
+    if entry:
+        return catalog_response(entry, if_none_match, accept_encoding)
+    
+    version = catalog_cache.version
+    index = await ensure_similar_index()
+    similar = index.similar(package_id, limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Package not found")
+    ids = [similar_id for similar_id, _ in similar]
+    encoder = PACKAGE_ENCODERS["card"]
+    docs = await db.packages.find({"id": {"$in": ids}}, encoder.projection).to_list(len(ids))
+    by_id = {doc["id"]: doc for doc in docs}
+    body = serialize_rows([by_id[i] for i in ids if i in by_id], PackageCard, encoder)
+    return catalog_response(catalog_cache.set(cache_key, body, version), if_none_match, accept_encoding)
+
+@api_router.get("/packages/{package_id}" + LIVE_STREAM_SUFFIX)
+async def stream_availability(package_id: str):
+    """Server-Sent Events carrying the package's seats left and price, pushed as they change"""
+    try:
+        subscription = live_hub.subscribe(package_id)
+    except live_updates.HubFullError:
+        raise HTTPException(status_code=503, detail="Too many live streams", headers={"Retry-After": "5"})
+    try:
+        # Subscribed before reading, so a change landing in between is not missed
+        package = await db.packages.find_one(
+            {"id": package_id}, {"_id": 1, "id": 1, **{field: 1 for field in live_updates.LIVE_FIELDS}}
+        )
+    except Exception:
+        live_hub.unsubscribe(subscription)
+        raise
+    if not package:
+        live_hub.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Package not found")
+    return live_updates.EventStreamResponse(
+        live_hub, subscription,
+        live_updates.event_stream(live_hub, subscription, live_hub.prime(package), LIVE_HEARTBEAT_SECONDS),
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.post("/packages", response_model=PackageItem)
 async def create_package(package: PackageCreate):
     """Create new package (admin only)"""
     package_dict = package.dict()
-    package_obj = PackageItem(**package_dict)
+    package_obj = PackageItem(**package_dict, **departure_dates.parse_departure(package.departure_date))
     await db.packages.insert_one(package_obj.dict())
+    previous_version = catalog_cache.version
+    version = await catalog_cache.bump(db)
+    # Index in place when no other write happened since the indexes were built
+    if previous_version is not None and version == previous_version + 1:
+        if search_index.version == previous_version:
+            search_index.add(package_obj.dict(), version)
+        if similar_index.version == previous_version:
+            similar_index.add(package_obj.dict(), version)
     return package_obj
 
+@api_router.post("/packages/import", dependencies=[Depends(require_admin)])
+async def import_packages(request: Request, format: Optional[str] = Query(None, pattern="^(ndjson|csv)$")):
+    """Bulk create or update packages from an NDJSON or CSV request body (admin only)"""
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = package_io.CSV if "csv" in content_type else package_io.NDJSON
+    if format == package_io.CSV:
+        rows = package_io.iter_csv_rows(request.stream(), list_fields=PACKAGE_LIST_FIELDS)
+    else:
+        rows = package_io.iter_ndjson_rows(request.stream())
+    try:
+        report = await package_io.import_packages(db, rows, PackageCreate)
+    except package_io.ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if report["inserted"] or report["updated"]:
+        await catalog_cache.bump(db)
+        live_hub.touch_all()
+    return report
+
+@api_router.put("/packages/{package_id}/pricing", response_model=PackagePricing, dependencies=[Depends(require_admin)])
+async def set_package_pricing(package_id: str, rules: PackagePricing):
+    """Replace a package's room, child/infant and seasonal pricing rules (admin only)"""
+    if any(season.end <= season.start for season in rules.seasons):
+        raise HTTPException(status_code=400, detail="Season end must be after its start")
+    result = await db.packages.update_one({"id": package_id}, {"$set": {"pricing": rules.model_dump(mode="json")}})
+    if not result.matched_count:
+        raise HTTPException(status_code=404, detail="Package not found")
+    await pricing_version.bump(db)
+    return rules
+
+# ==================== QUOTE ENDPOINTS ====================
+
+QUOTE_ERROR_DETAILS = {
+    pricing.PACKAGE_NOT_FOUND: "Package not found",
+    pricing.INVALID_PASSENGERS: "Invalid passenger mix: at least one passenger and no more infants than adults",
+    pricing.DEPARTURE_UNAVAILABLE: "Departure date is in the past or outside the package's departure window",
+    pricing.ROOM_TYPE_UNAVAILABLE: "Room type not offered for this package",
+    pricing.PROMO_CODE_INVALID: "Unknown promo code",
+    pricing.PROMO_CODE_NOT_APPLICABLE: "Promo code does not apply to this booking",
+}
+
+@api_router.post("/quotes/batch")
+async def quote_batch(batch: QuoteBatch):
+    """Price many packages and passenger mixes at once; items that cannot be priced carry an error"""
+    engine = await ensure_pricing_engine()
+    quotes = engine.quote([
+        pricing.QuoteRequest(
+            item.package_id, item.adults, item.children, item.infants,
+            item.room_type, item.promo_code, item.departure_date
+        )
+        for item in batch.items
+    ])
+    return {"version": engine.version, "quotes": quotes}
+
+async def quote_booking(booking: BookingCreate) -> dict:
+    """Price a booking with the engine behind /quotes/batch, so the booked total matches the quote"""
+    request = pricing.QuoteRequest(
+        booking.package_id, booking.num_passengers - booking.children - booking.infants,
+        booking.children, booking.infants, booking.room_type, booking.promo_code, booking.departure_date
+    )
+    quote = (await ensure_pricing_engine()).quote([request])[0]
+    if quote.get("error") == pricing.PACKAGE_NOT_FOUND:
+        if not await db.packages.find_one({"id": booking.package_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Package not found")
+        # Created by another worker since this one last checked the catalog version
+        quote = (await ensure_pricing_engine(force=True)).quote([request])[0]
+    if "error" in quote:
+        status = 404 if quote["error"] == pricing.PACKAGE_NOT_FOUND else 400
+        raise HTTPException(status_code=status, detail=QUOTE_ERROR_DETAILS[quote["error"]])
+    return quote
+
 # ==================== BOOKING ENDPOINTS ====================
 
 @api_router.post("/bookings", response_model=Booking)
-async def create_booking(booking: BookingCreate, authorization: Optional[str] = Header(None)):
+async def create_booking(
+    booking: BookingCreate,
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
     """Create new booking"""
     user = await get_current_user(authorization=authorization)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Get package
-    package = await db.packages.find_one({"id": booking.package_id})
+    return await run_idempotent(
+        "create_booking", user, idempotency_key, booking,
+        lambda: insert_booking(booking, user)
+    )
+
+async def insert_booking(booking: BookingCreate, user: User) -> Booking:
+    """Price the booking, reserve seats and write it"""
+    quote = await quote_booking(booking)
+
+    # Reserve seats atomically; the hold lapses unless paid in time
+    package = await inventory.reserve_seats(
+        db, booking.package_id, booking.num_passengers, projection={"_id": 1}
+    )
     if not package:
-        raise HTTPException(status_code=404, detail="Package not found")
-    
-    # Calculate total price
-    total_price = package["price"] * booking.num_passengers
+        if not await db.packages.find_one({"id": booking.package_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Package not found")
+        raise HTTPException(status_code=409, detail="Not enough seats available")
+    live_hub.touch([booking.package_id])
     
     # Create booking
-    booking_dict = booking.dict()
+    booking_dict = booking.dict(exclude={"departure_date"})
     booking_dict["user_id"] = user.id
-    booking_dict["total_price"] = total_price
+    booking_dict["room_type"] = quote["room_type"]
+    booking_dict["promo_code"] = quote["promo_code"]
+    booking_dict["departure_date"] = quote["departure_date"]
+    booking_dict["discount"] = quote["discount"]
+    booking_dict["total_price"] = quote["total"]
     booking_dict["payment_status"] = "pending"
-    booking_dict["booking_status"] = "confirmed"
+    booking_dict["booking_status"] = inventory.HELD
+    booking_dict["hold_expires_at"] = datetime.now(timezone.utc) + timedelta(minutes=BOOKING_HOLD_MINUTES)
     
     booking_obj = Booking(**booking_dict)
-    await db.bookings.insert_one(booking_obj.dict())
+    try:
+        await db.bookings.insert_one(booking_obj.dict())
+    except Exception:
+        await inventory.release_seats(db, booking.package_id, booking.num_passengers)
+        live_hub.touch([booking.package_id])
+        raise
+    await reports.record_booking(
+        db, booking_obj.package_id, booking_obj.num_passengers, booking_obj.total_price, booking_obj.created_at
+    )
+    await enqueue_side_effects("booking.created", [{
+        "booking_id": booking_obj.id,
+        "package_id": booking_obj.package_id,
+        "num_passengers": booking_obj.num_passengers,
+        "total_price": booking_obj.total_price
+    }])
     return booking_obj
 
 @api_router.get("/bookings", response_model=List[Booking])
-async def get_user_bookings(authorization: Optional[str] = Header(None)):
-    """Get user's bookings"""
+async def get_user_bookings(
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    """Get user's bookings, newest first, one cursor page at a time"""
     user = await get_current_user(authorization=authorization)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    bookings = await db.bookings.find({"user_id": user.id}).to_list(100)
-    return [Booking(**booking) for booking in bookings]
+    bookings, next_cursor = await fetch_page(
+        db.bookings, {"user_id": user.id}, USER_ITEMS_SORT, limit, cursor, BOOKING_ENCODER.projection
+    )
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(
+        content=serialize_rows(bookings, Booking, BOOKING_ENCODER),
+        media_type="application/json",
+        headers=headers
+    )
 
 @api_router.get("/bookings/{booking_id}", response_model=Booking)
 async def get_booking(booking_id: str, authorization: Optional[str] = Header(None)):
@@ -320,12 +1042,23 @@ async def get_booking(booking_id: str, authorization: Optional[str] = Header(Non
 # ==================== PAYMENT ENDPOINTS (MOCK) ====================
 
 @api_router.post("/payments", response_model=Payment)
-async def create_payment(payment: PaymentCreate, authorization: Optional[str] = Header(None)):
+async def create_payment(
+    payment: PaymentCreate,
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
     """Create payment (mock)"""
     user = await get_current_user(authorization=authorization)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    return await run_idempotent(
+        "create_payment", user, idempotency_key, payment,
+        lambda: insert_payment(payment, user)
+    )
+
+async def insert_payment(payment: PaymentCreate, user: User) -> Payment:
+    """Open a pending payment for one of the user's bookings"""
     # Get booking
     booking = await db.bookings.find_one({"id": payment.booking_id, "user_id": user.id})
     if not booking:
@@ -345,33 +1078,48 @@ async def create_payment(payment: PaymentCreate, authorization: Optional[str] =
     return payment_obj
 
 @api_router.post("/payments/{payment_id}/complete")
-async def complete_payment(payment_id: str, authorization: Optional[str] = Header(None)):
+async def complete_payment(
+    payment_id: str,
+    authorization: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None)
+):
     """Complete payment (mock - simulate successful payment)"""
     user = await get_current_user(authorization=authorization)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Get payment
-    payment = await db.payments.find_one({"id": payment_id, "user_id": user.id})
-    if not payment:
+    return await run_idempotent(
+        "complete_payment", user, idempotency_key, {"payment_id": payment_id},
+        lambda: mark_payment_completed(payment_id, user)
+    )
+
+async def mark_payment_completed(payment_id: str, user: User) -> dict:
+    """Confirm the booking hold and mark the payment completed in one transaction"""
+    try:
+        await payment_completion.complete_payment(
+            db, user.id, payment_id, MONGO_TRANSACTIONS, on_completed=enqueue_payment_side_effects
+        )
+    except payment_completion.PaymentNotFoundError:
         raise HTTPException(status_code=404, detail="Payment not found")
+    except payment_completion.HoldExpiredError:
+        raise HTTPException(status_code=409, detail="Booking hold has expired")
     
-    # Update payment status
-    await db.payments.update_one(
-        {"id": payment_id},
-        {"$set": {
-            "payment_status": "completed",
-            "completed_at": datetime.now(timezone.utc)
-        }}
-    )
+    return {"message": "Payment completed successfully"}
+
+@api_router.post("/payments/complete-batch")
+async def complete_payment_batch(batch: PaymentBatchComplete, authorization: Optional[str] = Header(None)):
+    """Complete many payments at once (mock - for reconciliation)"""
+    user = await get_current_user(authorization=authorization)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Update booking payment status
-    await db.bookings.update_one(
-        {"id": payment["booking_id"]},
-        {"$set": {"payment_status": "completed"}}
+    results = await payment_completion.complete_payments(
+        db, user.id, batch.payment_ids, MONGO_TRANSACTIONS, on_completed=enqueue_payment_side_effects
     )
-    
-    return {"message": "Payment completed successfully"}
+    return {
+        "results": results,
+        "completed": sum(1 for status in results.values() if status == payment_completion.COMPLETED)
+    }
 
 @api_router.get("/payments/{payment_id}")
 async def get_payment(payment_id: str, authorization: Optional[str] = Header(None)):
@@ -394,13 +1142,9 @@ async def add_to_wishlist(package_id: str, authorization: Optional[str] = Header
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Check if already in wishlist
-    existing = await db.wishlist.find_one({"user_id": user.id, "package_id": package_id})
-    if existing:
+    # One upsert on the unique (user_id, package_id) key: concurrent adds cannot duplicate
+    if not await wishlist.add(db, user.id, package_id):
         raise HTTPException(status_code=400, detail="Already in wishlist")
-    
-    wishlist_item = Wishlist(user_id=user.id, package_id=package_id)
-    await db.wishlist.insert_one(wishlist_item.dict())
     return {"message": "Added to wishlist"}
 
 @api_router.delete("/wishlist/{package_id}")
@@ -410,21 +1154,179 @@ async def remove_from_wishlist(package_id: str, authorization: Optional[str] = H
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    result = await db.wishlist.delete_one({"user_id": user.id, "package_id": package_id})
-    if result.deleted_count == 0:
+    if not await wishlist.remove(db, user.id, package_id):
         raise HTTPException(status_code=404, detail="Not found in wishlist")
     return {"message": "Removed from wishlist"}
 
+@api_router.post("/wishlist/bulk")
+async def update_wishlist(update: WishlistBulkUpdate, authorization: Optional[str] = Header(None)):
+    """Add and remove many packages at once; returns the ids that actually changed"""
+    user = await get_current_user(authorization=authorization)
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return await wishlist.sync(db, user.id, update.add, update.remove)
+
 @api_router.get("/wishlist", response_model=List[str])
-async def get_wishlist(authorization: Optional[str] = Header(None)):
-    """Get user's wishlist"""
+async def get_wishlist(
+    response: Response,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    authorization: Optional[str] = Header(None)
+):
+    """Get user's wishlist package IDs, newest first, one cursor page at a time"""
     user = await get_current_user(authorization=authorization)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    wishlist = await db.wishlist.find({"user_id": user.id}).to_list(100)
+    wishlist, next_cursor = await fetch_page(
+        db.wishlist, {"user_id": user.id}, USER_ITEMS_SORT, limit, cursor,
+        {"_id": 0, "package_id": 1, "created_at": 1, "id": 1}
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return [item["package_id"] for item in wishlist]
 
+# ==================== ADMIN / DIAGNOSTICS ====================
+
+@api_router.get("/admin/index-report", dependencies=[Depends(require_admin)])
+async def get_index_report():
+    """Report queries that are answered without an index"""
+    return await index_report(db)
+
+@api_router.post("/admin/release-expired-holds", dependencies=[Depends(require_admin)])
+async def release_expired_holds():
+    """Return seats from lapsed unpaid holds to stock now"""
+    return await inventory.release_expired_holds(db, on_released=live_hub.touch)
+
+@api_router.post("/admin/backfill-departure-dates", dependencies=[Depends(require_admin)])
+async def backfill_departure_dates(only_missing: bool = True):
+    """Parse departure_date into departure_start/departure_end for existing packages"""
+    result = await departure_dates.backfill_departure_dates(db, only_missing=only_missing)
+    await catalog_cache.bump(db)
+    return result
+
+@api_router.get("/admin/jobs", dependencies=[Depends(require_admin)])
+async def get_job_stats():
+    """Background job counts per kind and status"""
+    return await jobs.job_stats(db)
+
+@api_router.post("/admin/recount-saved", dependencies=[Depends(require_admin)])
+async def recount_saved():
+    """Recompute every package's saved_count from the wishlist collection"""
+    counted = await wishlist.recount(db)
+    await catalog_cache.bump(db)
+    return {"packages_with_saves": counted}
+
+@api_router.post("/admin/promo-codes", response_model=PromoCode, dependencies=[Depends(require_admin)])
+async def upsert_promo_code(promo: PromoCode):
+    """Create or replace a promo code; codes are case-insensitive"""
+    if promo.valid_from and promo.valid_until and promo.valid_until <= promo.valid_from:
+        raise HTTPException(status_code=400, detail="valid_until must be after valid_from")
+    doc = {**promo.model_dump(mode="json"), "code": pricing.normalize_code(promo.code)}
+    await db.promo_codes.update_one({"code": doc["code"]}, {"$set": doc}, upsert=True)
+    await pricing_version.bump(db)
+    return doc
+
+@api_router.get("/admin/pricing-engine", dependencies=[Depends(require_admin)])
+async def get_pricing_engine_stats():
+    """Compiled pricing rules and quote memo counters for this worker"""
+    return (await ensure_pricing_engine()).stats()
+
+@api_router.get("/admin/reports/packages", dependencies=[Depends(require_admin)])
+async def get_package_report(day_from: Optional[date] = None, day_to: Optional[date] = None):
+    """Bookings, seats booked/confirmed/released and value per package (UTC days, inclusive)"""
+    return await reports.package_report(
+        db, day_from.isoformat() if day_from else None, day_to.isoformat() if day_to else None
+    )
+
+@api_router.get("/admin/reports/revenue", dependencies=[Depends(require_admin)])
+async def get_revenue_report(day_from: Optional[date] = None, day_to: Optional[date] = None):
+    """Completed revenue per day and payment method (UTC days, inclusive)"""
+    return await reports.revenue_report(
+        db, day_from.isoformat() if day_from else None, day_to.isoformat() if day_to else None
+    )
+
+@api_router.post("/admin/reports/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_reports():
+    """Recompute the report rollups from bookings and payments"""
+    return await reports.rebuild_rollups(db)
+
+@api_router.get("/admin/reports/bookings.csv", dependencies=[Depends(require_admin)])
+async def export_bookings(created_from: Optional[date] = None, created_to: Optional[date] = None):
+    """Stream raw bookings created between two UTC dates (inclusive) as CSV"""
+    cursor = reports.booking_export_cursor(
+        db,
+        datetime.combine(created_from, datetime.min.time(), timezone.utc) if created_from else None,
+        datetime.combine(created_to + timedelta(days=1), datetime.min.time(), timezone.utc) if created_to else None
+    )
+    return StreamingResponse(
+        package_io.csv_chunks(cursor, reports.BOOKING_EXPORT_FIELDS),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="bookings.csv"'}
+    )
+
+@api_router.get("/admin/pool-stats", dependencies=[Depends(require_admin)])
+async def get_pool_stats():
+    """MongoDB connection pool usage for this worker"""
+    return database.pool_stats(mongo_settings, metrics.MONGO_POOL.stats())
+
+@api_router.get("/admin/catalog-cache", dependencies=[Depends(require_admin)])
+async def get_catalog_cache_stats():
+    """Catalog cache version and hit/miss counters"""
+    return catalog_cache.stats()
+
+# ==================== HOME SCREEN ====================
+
+async def fetch_featured_packages(limit: int):
+    encoder = PACKAGE_ENCODERS["card"]
+    return await catalog_db().packages.find({}, encoder.projection).sort(FEATURED_SORT).limit(limit).to_list(limit)
+
+async def fetch_wishlist_packages(user_id: str, limit: int):
+    """Wishlisted packages as cards, newest first, joined in one pipeline"""
+    return await db.wishlist.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$sort": dict(USER_ITEMS_SORT)},
+        {"$limit": limit},
+        {"$lookup": {
+            "from": "packages",
+            "localField": "package_id",
+            "foreignField": "id",
+            "as": "package"
+        }},
+        {"$unwind": "$package"},
+        {"$replaceRoot": {"newRoot": "$package"}},
+        {"$project": PACKAGE_ENCODERS["card"].projection}
+    ]).to_list(limit)
+
+async def fetch_recent_bookings(user_id: str, limit: int):
+    return await db.bookings.find(
+        {"user_id": user_id}, BOOKING_ENCODER.projection
+    ).sort(USER_ITEMS_SORT).limit(limit).to_list(limit)
+
+@api_router.get("/home")
+async def get_home(authorization: Optional[str] = Header(None)):
+    """Everything the home screen needs in one request"""
+    user = await get_current_user(authorization=authorization)
+    
+    if user:
+        featured, wishlist, bookings = await asyncio.gather(
+            fetch_featured_packages(HOME_FEATURED_LIMIT),
+            fetch_wishlist_packages(user.id, HOME_WISHLIST_LIMIT),
+            fetch_recent_bookings(user.id, HOME_BOOKINGS_LIMIT)
+        )
+    else:
+        featured, wishlist, bookings = await fetch_featured_packages(HOME_FEATURED_LIMIT), [], []
+    
+    card_encoder = PACKAGE_ENCODERS["card"]
+    payload = {
+        "user": jsonable_encoder(user) if user else None,
+        "featured_packages": rows(featured, PackageCard, card_encoder),
+        "wishlist": rows(wishlist, PackageCard, card_encoder),
+        "recent_bookings": rows(bookings, Booking, BOOKING_ENCODER)
+    }
+    body = orjson.dumps(payload) if FAST_JSON else serialize_json(payload)
+    return Response(content=body, media_type="application/json")
+
 # ==================== SEED DATA ====================
 
 @api_router.post("/seed")
@@ -583,26 +1485,238 @@ async def seed_data():
     ]
     
     all_packages = umrah_packages + tour_packages
+    for package in all_packages:
+        package.update(departure_dates.parse_departure(package["departure_date"]))
+        package[wishlist.SAVED_COUNT] = 0
     await db.packages.insert_many(all_packages)
+    await catalog_cache.bump(db)
     
     return {"message": f"Seeded {len(all_packages)} packages"}
 
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=[
-        "http://localhost:3000",
-        "https://umroh-hemat.stage-preview.emergentagent.com",
-        "*"
-    ],
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
+# ==================== METRICS ====================
+
+metrics.REGISTRY.register(metrics.Gauge(
+    "session_cache_events", "Session cache counters", ["event"],
+    callback=lambda: {(k,): v for k, v in session_cache.stats().items() if k in ("size", "hits", "misses", "evictions")}
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    "live_availability", "Live availability streams, watched packages and pushed updates", ["stat"],
+    callback=lambda: {(k,): v for k, v in live_hub.stats().items() if k != "source"}
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    "pricing_quote_memo", "Pricing engine quote memo counters", ["event"],
+    callback=lambda: {(k,): v for k, v in pricing_engine.stats().items() if k != "packages"}
+))
+metrics.REGISTRY.register(metrics.Gauge(
+    "catalog_cache_events", "Catalog cache counters", ["event"],
+    callback=lambda: {(k,): v for k, v in catalog_cache.stats().items() if k in ("size", "hits", "misses")}
+))
+
+async def get_metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    return Response(content=metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+# ==================== BACKGROUND JOBS ====================
+
+def format_rupiah(amount: int) -> str:
+    return "Rp " + f"{amount:,}".replace(",", ".")
+
+async def send_booking_confirmation(payload: dict):
+    """Email the customer their booking details and payment deadline"""
+    booking = await db.bookings.find_one({"id": payload["booking_id"]}, {"_id": 0})
+    if not booking or email_sender is None:
+        return
+    package = await db.packages.find_one({"id": booking["package_id"]}, {"_id": 0, "name": 1}) or {}
+    lines = [
+        f"Assalamu'alaikum {booking['customer_name']},",
+        "",
+        f"Your booking for {package.get('name', booking['package_id'])} has been received.",
+        f"Booking ID: {booking['id']}",
+        f"Passengers: {booking['num_passengers']}",
+        f"Total: {format_rupiah(booking['total_price'])}",
+    ]
+    if booking.get("hold_expires_at"):
+        lines.append(f"Please complete payment before {booking['hold_expires_at']:%d %b %Y %H:%M} UTC.")
+    subject = f"Booking {booking['id'][:8].upper()} received"
+    await email_sender.send(booking["customer_email"], subject, "\n".join(lines))
+
+async def send_payment_receipt(payload: dict):
+    """Email the customer a receipt for a completed payment"""
+    payment = await db.payments.find_one({"id": payload["payment_id"]}, {"_id": 0})
+    booking = await db.bookings.find_one({"id": payload["booking_id"]}, {"_id": 0})
+    if not payment or not booking or email_sender is None:
+        return
+    lines = [
+        f"Assalamu'alaikum {booking['customer_name']},",
+        "",
+        "We have received your payment. Your booking is confirmed.",
+        f"Booking ID: {booking['id']}",
+        f"Transaction: {payment['transaction_id']}",
+        f"Amount: {format_rupiah(payment['amount'])}",
+        f"Method: {payment['payment_method']}",
+    ]
+    subject = f"Payment receipt {payment['transaction_id']}"
+    await email_sender.send(booking["customer_email"], subject, "\n".join(lines))
+
+async def deliver_webhook(payload: dict):
+    if webhook_notifier is not None:
+        await webhook_notifier.send(payload["event"], payload["data"])
+
+JOB_HANDLERS = {
+    "booking_confirmation": send_booking_confirmation,
+    "payment_receipt": send_payment_receipt,
+    "webhook": deliver_webhook,
+}
+EVENT_EMAILS = {"booking.created": "booking_confirmation", "payment.completed": "payment_receipt"}
+
+job_worker = jobs.JobWorker(
+    JOB_HANDLERS,
+    concurrency=JOB_WORKERS,
+    poll_interval=float(os.environ.get('JOB_POLL_INTERVAL', '1')),
+    lease_seconds=float(os.environ.get('JOB_LEASE_SECONDS', '60')),
+    job_timeout=float(os.environ.get('JOB_TIMEOUT', '30')),
+    max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', '5')),
+    backoff=float(os.environ.get('JOB_RETRY_BACKOFF', '5'))
 )
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def enqueue_side_effects(event: str, items: List[dict]):
+    """Queue the notifications for an event; they run on the job workers, after the response"""
+    work = []
+    for data in items:
+        if email_sender is not None:
+            work.append((EVENT_EMAILS[event], data))
+        if webhook_notifier is not None:
+            work.append(("webhook", {"event": event, "data": data}))
+    try:
+        await job_worker.enqueue(db, work)
+    except Exception as e:
+        # The write itself is committed; a lost notification must not fail the request
+        logger.error(f"Could not enqueue {event} side effects: {str(e)}")
+
+async def enqueue_payment_side_effects(completed: List[dict]):
+    await enqueue_side_effects("payment.completed", completed)
+
+# ==================== APP LIFECYCLE ====================
+
+async def create_indexes():
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Index provisioning error: {str(e)}")
+
+async def backfill_saved_counts():
+    """Give packages stored before saved_count existed a count, so sort=popular pages reach them"""
+    try:
+        if await wishlist.backfill_saved_counts(db):
+            await catalog_cache.bump(db)
+    except Exception as e:
+        logger.error(f"saved_count backfill error: {str(e)}")
+
+async def sweep_expired_holds():
+    """Periodically return seats from lapsed holds to stock"""
+    while True:
+        await asyncio.sleep(HOLD_SWEEP_INTERVAL)
+        try:
+            await inventory.release_expired_holds(db, on_released=live_hub.touch)
+        except Exception as e:
+            logger.error(f"Hold sweep error: {str(e)}")
+
+async def warm_up():
+    """Open pooled connections, build the catalog indexes and cache the default catalog page"""
+    try:
+        pool = await database.warm_pool(db, mongo_settings.warm_connections)
+        logger.info(f"Opened {pool['connections']} Mongo connections in {pool['seconds']}s")
+    except Exception as e:
+        logger.error(f"Connection pool warm-up error: {str(e)}")
+    try:
+        await ensure_search_index()
+        await ensure_similar_index()
+        await ensure_pricing_engine()
+        await get_packages(
+            package_type=None, min_price=None, max_price=None, departure_city=None,
+            departure_from=None, departure_to=None, limit=100, cursor=None, view="full",
+            fields=None, sort="newest", if_none_match=None, accept_encoding=None
+        )
+        logger.info(f"Catalog warm: {len(search_index)} packages indexed, first page cached")
+    except Exception as e:
+        logger.error(f"Catalog warm-up error: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await create_indexes()
+    await backfill_saved_counts()
+    if WARMUP_ON_STARTUP:
+        await warm_up()
+    hold_sweeper = asyncio.create_task(sweep_expired_holds())
+    live_source = LIVE_UPDATES_SOURCE
+    if live_source == "auto":
+        # Change streams need the same replica set / sharded deployment as transactions
+        supported = await payment_completion.supports_transactions(db.client)
+        live_source = live_updates.CHANGE_STREAM if supported else live_updates.HOOKS
+    await live_hub.start(db, live_source)
+    if JOB_WORKERS > 0:
+        await job_worker.start(db)
+    try:
+        yield
+    finally:
+        # End open event streams first so the server is not left waiting on them
+        await live_hub.stop()
+        # Let running jobs finish (or hand them back) while Mongo is still reachable
+        await job_worker.drain(JOB_DRAIN_TIMEOUT)
+        hold_sweeper.cancel()
+        if webhook_notifier is not None:
+            await webhook_notifier.aclose()
+        await auth_client.aclose()
+        app.state.mongo_client.close()
+
+def create_app(settings: Optional[database.MongoSettings] = None) -> FastAPI:
+    """Build the ASGI app: Mongo client, routes, middleware stack and lifespan"""
+    app = FastAPI(title="Umroh Hemat API", version="1.0.0", lifespan=lifespan)
+    app.state.mongo_client = connect_mongo(settings or database.MongoSettings.from_env())
+    app.add_api_route("/metrics", get_metrics, methods=["GET"], include_in_schema=False)
+    app.include_router(api_router)
+    
+    # Innermost: refused requests still get CORS headers, metrics and compression
+    if RATE_LIMIT_ENABLED:
+        app.add_middleware(
+            RateLimitMiddleware,
+            rules=RATE_LIMIT_RULES,
+            default=RATE_LIMIT_DEFAULT,
+            backend=MongoBackend(db) if RATE_LIMIT_BACKEND == "mongo" else MemoryBackend(),
+            trust_forwarded=TRUST_FORWARDED_FOR,
+            identify=rate_limit_caller
+        )
+    
+    app.add_middleware(
+        LoadSheddingMiddleware,
+        max_in_flight=MAX_IN_FLIGHT,
+        max_pool_waiters=MAX_MONGO_POOL_WAITERS,
+        pool_waiters=lambda: metrics.MONGO_POOL.waiting,
+        exempt_suffixes=[LIVE_STREAM_SUFFIX]
+    )
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=[
+            "http://localhost:3000",
+            "https://umroh-hemat.stage-preview.emergentagent.com",
+            "*"
+        ],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        # Only what the frontend reads; "*" is not honoured for credentialed requests anyway
+        expose_headers=["ETag", NEXT_CURSOR_HEADER, "Retry-After"],
+    )
+    
+    # Compresses everything else; pre-compressed catalog bodies pass through
+    app.add_middleware(compression.CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+    
+    # Outermost so latency includes CORS handling; SLOW_REQUEST_SECONDS=0 disables the slow log
+    app.add_middleware(
+        metrics.MetricsMiddleware,
+        slow_request_seconds=float(os.environ.get('SLOW_REQUEST_SECONDS', '1'))
+    )
+    return app
+
+app = create_app()
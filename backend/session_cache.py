@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+class SessionCache:
+    """Bounded LRU cache of resolved users keyed by session token.
+
+    Entries expire after ``ttl`` seconds or at the session's own
+    ``expires_at``, whichever comes first. The cache is per-process, so the
+    TTL also bounds how long a logout on another worker can go unnoticed.
+
+    Invalidated tokens are remembered for ``tombstone_ttl`` seconds so a
+    lookup that read the session just before it was deleted cannot put it
+    back.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, tombstone_ttl: float = 10.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.tombstone_ttl = tombstone_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tombstones: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _timestamp(expires_at: Optional[datetime]) -> float:
+        if expires_at is None:
+            return float("inf")
+        # Motor returns naive datetimes that are already in UTC
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at.timestamp()
+
+    def get(self, token: str) -> Optional[Any]:
+        """Return the cached user for a token, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, deadline = entry
+            if deadline <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def set(self, token: str, user: Any, expires_at: Optional[datetime] = None) -> None:
+        """Cache a user until the TTL or the session expiry elapses"""
+        now = time.time()
+        deadline = min(now + self.ttl, self._timestamp(expires_at))
+        if deadline <= now:
+            return
+        with self._lock:
+            if self._tombstones.get(token, 0) > now:
+                return
+            self._entries[token] = (user, deadline)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, token: str) -> None:
+        """Drop a token immediately (e.g. on logout) and refuse to cache it again for a while"""
+        now = time.time()
+        with self._lock:
+            self._entries.pop(token, None)
+            self._tombstones.pop(token, None)
+            self._tombstones[token] = now + self.tombstone_ttl
+            # Oldest first, and every tombstone lives equally long
+            while self._tombstones and (
+                next(iter(self._tombstones.values())) <= now or len(self._tombstones) > self.maxsize
+            ):
+                self._tombstones.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tombstones.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,195 @@
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Contribution of each feature to the similarity score (scores are scaled to 0..1)
+FEATURE_WEIGHTS = {
+    "package_type": 3.0,
+    "price": 2.0,
+    "departure_city": 1.5,
+    "hotel_rating": 1.0,
+    "duration": 1.0,
+    "facilities": 1.0,
+    "airline": 0.5,
+}
+
+CATEGORICAL_FIELDS = ("package_type", "departure_city", "airline")
+
+# Numeric features compare as exp(-|a - b| / scale): a difference of one
+# scale unit (about 30% in price, one star, three days) scores 1/e
+NUMERIC_SCALES = {"price": 0.3, "hotel_rating": 1.0, "duration": 3.0}
+
+FEATURE_FIELDS = (*CATEGORICAL_FIELDS, "price", "hotel_rating", "duration", "facilities")
+
+DEFAULT_NEIGHBOURS = 10
+
+# Rows scored per matrix product during a full build, bounding peak memory
+BLOCK_SIZE = 512
+
+_DAYS = re.compile(r"(\d+)\s*(?:hari|days?)", re.IGNORECASE)
+_NUMBER = re.compile(r"\d+")
+
+
+def duration_days(duration: Optional[str]) -> float:
+    """Trip length in days from text such as "10 Hari 9 Malam"; NaN if unknown"""
+    if not duration:
+        return math.nan
+    match = _DAYS.search(duration)
+    if match:
+        return float(match.group(1))
+    match = _NUMBER.search(duration)
+    return float(match.group(0)) if match else math.nan
+
+
+def _numeric(doc: Dict[str, Any]) -> List[float]:
+    price = doc.get("price") or 0
+    rating = doc.get("hotel_rating")
+    return [
+        math.log(price) / NUMERIC_SCALES["price"] if price > 0 else math.nan,
+        rating / NUMERIC_SCALES["hotel_rating"] if rating is not None else math.nan,
+        duration_days(doc.get("duration")) / NUMERIC_SCALES["duration"],
+    ]
+
+
+def _numeric_similarity(rows: np.ndarray, numeric: np.ndarray) -> np.ndarray:
+    """Weighted closeness of ``rows`` to every row of ``numeric``; unknown values score 0"""
+    scores = np.zeros((rows.shape[0], numeric.shape[0]))
+    for column, field in enumerate(NUMERIC_SCALES):
+        closeness = np.exp(-np.abs(rows[:, column, None] - numeric[None, :, column]))
+        scores += FEATURE_WEIGHTS[field] * np.nan_to_num(closeness, nan=0.0)
+    return scores
+
+
+class SimilarityIndex:
+    """Precomputed nearest neighbours of every package, served from memory.
+
+    Categorical fields are one-hot columns and facilities a normalized
+    multi-hot block, each scaled by the square root of its weight, so one
+    matrix product scores every categorical match and the facility cosine
+    for a block of packages at once. Price (log scale), hotel rating and
+    duration add a closeness term. Columns are only ever appended, so a new
+    package is scored against the catalog with one vector product and
+    slotted into the neighbour lists it beats without rescoring the rest.
+    Lists are ordered by rounded score, then package id, so an incremental
+    add and a full build produce the same lists.
+    """
+
+    def __init__(self, neighbours: int = DEFAULT_NEIGHBOURS):
+        self.neighbours = neighbours
+        self.version: Optional[int] = None
+        self._norm = sum(FEATURE_WEIGHTS.values())
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: List[str] = []
+        self._id_array = np.array([], dtype=str)  # _ids as an array, for tie-breaking sorts
+        self._position: Dict[str, int] = {}
+        self._columns: Dict[Tuple[str, str], int] = {}
+        self._matrix = np.zeros((0, 0))
+        self._numeric = np.zeros((0, len(NUMERIC_SCALES)))
+        self._similar: List[List[Tuple[str, float]]] = []
+        self._floor = np.zeros(0)  # score to beat to enter each package's list
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _encode(self, doc: Dict[str, Any]) -> Dict[int, float]:
+        """Sparse feature row, registering any new category or facility column"""
+        row: Dict[int, float] = {}
+        for field in CATEGORICAL_FIELDS:
+            value = doc.get(field)
+            if value:
+                key = (field, str(value).strip().lower())
+                row[self._columns.setdefault(key, len(self._columns))] = math.sqrt(FEATURE_WEIGHTS[field])
+        facilities = {str(f).strip().lower() for f in doc.get("facilities") or [] if str(f).strip()}
+        for facility in facilities:
+            column = self._columns.setdefault(("facilities", facility), len(self._columns))
+            row[column] = math.sqrt(FEATURE_WEIGHTS["facilities"] / len(facilities))
+        return row
+
+    def _dense(self, rows: List[Dict[int, float]]) -> np.ndarray:
+        matrix = np.zeros((len(rows), len(self._columns)))
+        for i, row in enumerate(rows):
+            for column, value in row.items():
+                matrix[i, column] = value
+        return matrix
+
+    def _scores(self, rows: np.ndarray, numeric: np.ndarray) -> np.ndarray:
+        return (rows @ self._matrix.T + _numeric_similarity(numeric, self._numeric)) / self._norm
+
+    def _top(self, scores: np.ndarray) -> List[Tuple[str, float]]:
+        k = min(self.neighbours, scores.shape[0])
+        if k == 0:
+            return []
+        rounded = np.round(scores, 4)
+        # Everything tied with the k-th best is a candidate; ids decide among equal scores
+        kth = np.partition(rounded, -k)[-k]
+        candidates = np.nonzero(rounded >= kth)[0]
+        best = candidates[np.lexsort((self._id_array[candidates], -rounded[candidates]))][:k]
+        return [(self._ids[j], float(rounded[j])) for j in best if np.isfinite(rounded[j])]
+
+    def _floor_of(self, similar: List[Tuple[str, float]]) -> float:
+        return similar[-1][1] if len(similar) >= self.neighbours else -math.inf
+
+    def build(self, docs: Iterable[Dict[str, Any]], version: Optional[int] = None) -> None:
+        self._reset()
+        rows = []
+        numeric = []
+        for doc in docs:
+            if doc["id"] in self._position:
+                continue
+            self._position[doc["id"]] = len(self._ids)
+            self._ids.append(doc["id"])
+            rows.append(self._encode(doc))
+            numeric.append(_numeric(doc))
+        self._id_array = np.array(self._ids, dtype=str)
+        self._matrix = self._dense(rows)
+        self._numeric = np.array(numeric).reshape(len(numeric), len(NUMERIC_SCALES))
+
+        for start in range(0, len(self._ids), BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, len(self._ids))
+            scores = self._scores(self._matrix[start:end], self._numeric[start:end])
+            scores[np.arange(end - start), np.arange(start, end)] = -np.inf
+            self._similar.extend(self._top(block_row) for block_row in scores)
+        self._floor = np.array([self._floor_of(similar) for similar in self._similar])
+        self.version = version
+
+    def add(self, doc: Dict[str, Any], version: Optional[int] = None) -> None:
+        """Add one package: score it once against the catalog and update the lists it enters"""
+        if doc["id"] in self._position:
+            return
+        row = self._encode(doc)
+        if len(self._columns) > self._matrix.shape[1]:
+            self._matrix = np.pad(self._matrix, ((0, 0), (0, len(self._columns) - self._matrix.shape[1])))
+        vector = self._dense([row])
+        numeric = np.array([_numeric(doc)])
+        scores = self._scores(vector, numeric)[0]
+        rounded = np.round(scores, 4)
+
+        # A tie with a list's last entry may still win on package id
+        for i in np.nonzero(rounded >= self._floor)[0]:
+            similar = self._similar[i]
+            similar.append((doc["id"], float(rounded[i])))
+            similar.sort(key=lambda item: (-item[1], item[0]))
+            del similar[self.neighbours:]
+            self._floor[i] = self._floor_of(similar)
+
+        own = self._top(scores)
+        self._position[doc["id"]] = len(self._ids)
+        self._ids.append(doc["id"])
+        self._id_array = np.append(self._id_array, doc["id"])
+        self._matrix = np.vstack([self._matrix, vector])
+        self._numeric = np.vstack([self._numeric, numeric])
+        self._similar.append(own)
+        self._floor = np.append(self._floor, self._floor_of(own))
+        if version is not None:
+            self.version = version
+
+    def similar(self, package_id: str, limit: Optional[int] = None) -> Optional[List[Tuple[str, float]]]:
+        """Most similar packages with their scores, best first; None for an unknown package"""
+        position = self._position.get(package_id)
+        if position is None:
+            return None
+        return self._similar[position][:limit]
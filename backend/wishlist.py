@@ -0,0 +1,146 @@
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Denormalized on each package: how many users have it in their wishlist
+SAVED_COUNT = "saved_count"
+
+DUPLICATE_KEY = 11000
+
+
+def _entry(user_id: str, package_id: str) -> UpdateOne:
+    """Insert-if-absent on the unique (user_id, package_id) key"""
+    return UpdateOne(
+        {"user_id": user_id, "package_id": package_id},
+        {"$setOnInsert": {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "package_id": package_id,
+            "created_at": datetime.now(timezone.utc),
+        }},
+        upsert=True,
+    )
+
+
+async def adjust_saved_counts(db, deltas: Dict[str, int]) -> None:
+    operations = [
+        UpdateOne({"id": package_id}, {"$inc": {SAVED_COUNT: delta}})
+        for package_id, delta in deltas.items() if delta
+    ]
+    if operations:
+        await db.packages.bulk_write(operations, ordered=False)
+
+
+async def backfill_saved_counts(db) -> int:
+    """Set ``saved_count`` to 0 where it is missing or null; returns the packages changed.
+
+    ``sort=popular`` pages with ``$lt`` on the count, which never matches a
+    missing or null value, so such packages would drop out of every page
+    after the first. Insert paths all write 0; this covers older documents.
+    """
+    result = await db.packages.update_many({SAVED_COUNT: None}, {"$set": {SAVED_COUNT: 0}})
+    return result.modified_count
+
+
+async def add(db, user_id: str, package_id: str) -> bool:
+    """Save a package in one atomic upsert; False if it was already saved"""
+    try:
+        result = await db.wishlist.bulk_write([_entry(user_id, package_id)])
+    except BulkWriteError as e:
+        if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+            raise
+        # A concurrent upsert of the same pair won the insert
+        return False
+    if not result.upserted_count:
+        return False
+    await adjust_saved_counts(db, {package_id: 1})
+    return True
+
+
+async def remove(db, user_id: str, package_id: str) -> bool:
+    result = await db.wishlist.delete_one({"user_id": user_id, "package_id": package_id})
+    if not result.deleted_count:
+        return False
+    await adjust_saved_counts(db, {package_id: -1})
+    return True
+
+
+async def sync(db, user_id: str, add_ids: Sequence[str], remove_ids: Sequence[str]) -> Dict[str, List[str]]:
+    """Apply many adds and removes in two writes to the wishlist.
+
+    Returns the package ids actually added and removed; ids already in
+    (or absent from) the wishlist are left alone and not counted.
+    """
+    add_ids = list(dict.fromkeys(add_ids))
+    remove_ids = [package_id for package_id in dict.fromkeys(remove_ids) if package_id not in add_ids]
+    added: List[str] = []
+    removed: List[str] = []
+
+    if add_ids:
+        try:
+            result = await db.wishlist.bulk_write(
+                [_entry(user_id, package_id) for package_id in add_ids], ordered=False
+            )
+            upserted = list(result.upserted_ids.values())
+        except BulkWriteError as e:
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+            upserted = [item["_id"] for item in e.details.get("upserted", [])]
+        if len(upserted) == len(add_ids):
+            added = add_ids
+        elif upserted:
+            # Map the new entries back to packages by _id rather than trusting operation indexes
+            inserted = {
+                doc["package_id"]
+                async for doc in db.wishlist.find({"_id": {"$in": upserted}}, {"_id": 0, "package_id": 1})
+            }
+            added = [package_id for package_id in add_ids if package_id in inserted]
+
+    present: List[str] = []
+    if remove_ids:
+        present = [
+            doc["package_id"]
+            async for doc in db.wishlist.find(
+                {"user_id": user_id, "package_id": {"$in": remove_ids}}, {"_id": 0, "package_id": 1}
+            )
+        ]
+        if present:
+            result = await db.wishlist.delete_many({"user_id": user_id, "package_id": {"$in": present}})
+            removed = present
+            if result.deleted_count != len(present):
+                # Another request removed some of them first: settle these counts exactly
+                await recount(db, present)
+                present = []
+
+    deltas = Counter({package_id: 1 for package_id in added})
+    deltas.update({package_id: -1 for package_id in present})
+    await adjust_saved_counts(db, dict(deltas))
+    return {"added": added, "removed": removed}
+
+
+async def recount(db, package_ids: Optional[Iterable[str]] = None) -> int:
+    """Recompute ``saved_count`` from the wishlist (every package when no ids are given).
+
+    A full recount also backfills the field on packages created before it existed.
+    """
+    scope = {"id": {"$in": list(package_ids)}} if package_ids is not None else {}
+    match = {"package_id": scope["id"]} if scope else {}
+    counts = {
+        row["_id"]: row["count"]
+        async for row in db.wishlist.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$package_id", "count": {"$sum": 1}}},
+        ])
+    }
+    unsaved = {"$and": [scope, {"id": {"$nin": list(counts)}}]} if scope else {"id": {"$nin": list(counts)}}
+    await db.packages.update_many(unsaved, {"$set": {SAVED_COUNT: 0}})
+    if counts:
+        await db.packages.bulk_write(
+            [UpdateOne({"id": package_id}, {"$set": {SAVED_COUNT: count}}) for package_id, count in counts.items()],
+            ordered=False,
+        )
+    return len(counts)
@@ -0,0 +1,460 @@
+"""Load-test harness for the Umroh Hemat API.
+
+Seeds a scratch database, replays a weighted mix of user journeys (browse,
+filter, detail, home, book, pay, wishlist) from concurrent virtual users and
+reports throughput and p50/p95/p99 latency per endpoint. Results are written
+as JSON so runs can be compared between commits.
+
+Run from the repository root, e.g.:
+
+    # in-process ASGI app against the in-memory Motor stand-in
+    python benchmarks/loadtest.py --duration 15 --output bench.json
+
+    # real HTTP under uvicorn against a local MongoDB, compared with a baseline
+    python benchmarks/loadtest.py --server uvicorn --mongo mongodb://localhost:27017 \\
+        --packages 5000 --users 500 --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+
+CITIES = ["Jakarta", "Surabaya", "Semarang", "Medan", "Makassar", "Bandung"]
+AIRLINES = ["Garuda Indonesia", "Saudia Airlines", "Turkish Airlines", "Lion Air", "Emirates"]
+MONTHS = ["Januari", "Februari", "Maret", "April", "Mei", "Juni",
+          "Juli", "Agustus", "September", "Oktober", "November", "Desember"]
+FACILITIES = ["Tiket Pesawat", "Visa", "Transportasi", "City Tour", "Makan",
+              "Hotel Bintang 4", "Hotel Bintang 5", "Pembimbing Ustadz", "Guide", "Tiket Wisata"]
+
+# Journey name -> relative weight in the replayed mix
+DEFAULT_MIX = {
+    "browse": 30,
+    "filter": 20,
+    "detail": 20,
+    "home": 10,
+    "wishlist": 8,
+    "my_bookings": 5,
+    "book": 5,
+    "book_and_pay": 2,
+}
+
+
+# ==================== SEEDING ====================
+
+def make_package(rng: random.Random, index: int, created_at: datetime) -> Dict[str, Any]:
+    umrah = rng.random() < 0.6
+    rating = rng.choice([3, 4, 5])
+    days = rng.choice([9, 11, 12, 14]) if umrah else rng.choice([3, 4, 5])
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"{'Umrah' if umrah else 'Tour'} Paket {index}",
+        "description": "Paket perjalanan dengan fasilitas lengkap dan pembimbing berpengalaman",
+        "price": rng.randrange(20_000_000, 45_000_000, 100_000) if umrah
+        else rng.randrange(1_000_000, 10_000_000, 50_000),
+        "duration": f"{days} Hari",
+        "package_type": "umrah" if umrah else "tour",
+        "departure_city": rng.choice(CITIES),
+        "departure_date": f"{rng.choice(MONTHS)} 2026",
+        "airline": rng.choice(AIRLINES),
+        "hotel": f"Hotel Bintang {rating}",
+        "hotel_rating": rating,
+        "facilities": rng.sample(FACILITIES, 6),
+        "itinerary": [f"Hari {d}: Kegiatan" for d in range(1, days + 1)],
+        "image_url": "https://images.unsplash.com/photo-1591604466107-ec97de577aff?w=800",
+        "availability": 1_000_000,
+        "created_at": created_at + timedelta(milliseconds=index),
+    }
+
+
+async def insert_chunked(collection, docs: List[Dict[str, Any]], chunk: int = 1000) -> None:
+    for start in range(0, len(docs), chunk):
+        await collection.insert_many(docs[start:start + chunk], ordered=False)
+
+
+async def seed(db, args, rng: random.Random) -> Dict[str, Any]:
+    """Populate packages, users, sessions, bookings and wishlists"""
+    from indexes import ensure_indexes
+
+    await ensure_indexes(db)
+    now = datetime.now(timezone.utc)
+    packages = [make_package(rng, i, now - timedelta(days=30)) for i in range(args.packages)]
+    await insert_chunked(db.packages, packages)
+
+    users, sessions = [], []
+    for i in range(args.users):
+        email = f"loadtest-{i}@example.com"
+        users.append({"_id": email, "email": email, "name": f"Jamaah {i}", "created_at": now})
+        sessions.append({
+            "user_id": email,
+            "session_token": f"loadtest-session-{i}-{uuid.uuid4().hex}",
+            "expires_at": now + timedelta(days=1),
+            "created_at": now,
+        })
+    await insert_chunked(db.users, users)
+    await insert_chunked(db.user_sessions, sessions)
+
+    bookings = []
+    for i in range(args.bookings):
+        package = rng.choice(packages)
+        user = rng.choice(users)
+        passengers = rng.randint(1, 4)
+        bookings.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user["_id"],
+            "package_id": package["id"],
+            "customer_name": user["name"],
+            "customer_email": user["email"],
+            "customer_phone": "08123456789",
+            "num_passengers": passengers,
+            "total_price": package["price"] * passengers,
+            "payment_status": rng.choice(["pending", "completed"]),
+            "booking_status": "confirmed",
+            "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+        })
+    await insert_chunked(db.bookings, bookings)
+
+    wishlist = {}
+    for _ in range(args.wishlist):
+        user = rng.choice(users)["_id"]
+        package = rng.choice(packages)["id"]
+        wishlist[(user, package)] = {
+            "id": str(uuid.uuid4()),
+            "user_id": user,
+            "package_id": package,
+            "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+        }
+    await insert_chunked(db.wishlist, list(wishlist.values()))
+
+    return {
+        "package_ids": [p["id"] for p in packages],
+        "tokens": [s["session_token"] for s in sessions],
+    }
+
+
+# ==================== WORKLOAD ====================
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.samples[label].append(time.perf_counter() - started)
+        self.statuses[label][status] += 1
+        return response
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, seeded, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.package_ids = seeded["package_ids"]
+        self.headers = {"Authorization": f"Bearer {rng.choice(seeded['tokens'])}"}
+        self.rng = rng
+
+    async def browse(self):
+        response = await self.recorder.call(
+            self.client, "GET /packages (card page)", "GET", "/api/packages",
+            params={"view": "card", "limit": 20}
+        )
+        cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+        if cursor:
+            await self.recorder.call(
+                self.client, "GET /packages (card page)", "GET", "/api/packages",
+                params={"view": "card", "limit": 20, "cursor": cursor}
+            )
+
+    async def filter(self):
+        params = {"view": "card", "limit": 20}
+        if self.rng.random() < 0.7:
+            params["package_type"] = self.rng.choice(["umrah", "tour"])
+        if self.rng.random() < 0.5:
+            params["departure_city"] = self.rng.choice(CITIES)
+        if self.rng.random() < 0.5:
+            params["max_price"] = self.rng.choice([5_000_000, 25_000_000, 35_000_000])
+        await self.recorder.call(self.client, "GET /packages (filtered)", "GET", "/api/packages", params=params)
+
+    async def detail(self):
+        package_id = self.rng.choice(self.package_ids)
+        await self.recorder.call(self.client, "GET /packages/{id}", "GET", f"/api/packages/{package_id}")
+
+    async def home(self):
+        await self.recorder.call(self.client, "GET /home", "GET", "/api/home", headers=self.headers)
+
+    async def wishlist(self):
+        package_id = self.rng.choice(self.package_ids)
+        await self.recorder.call(
+            self.client, "POST /wishlist", "POST", "/api/wishlist",
+            params={"package_id": package_id}, headers=self.headers
+        )
+        await self.recorder.call(self.client, "GET /wishlist", "GET", "/api/wishlist", headers=self.headers)
+
+    async def my_bookings(self):
+        await self.recorder.call(self.client, "GET /bookings", "GET", "/api/bookings", headers=self.headers)
+
+    async def book(self) -> Optional[str]:
+        response = await self.recorder.call(
+            self.client, "POST /bookings", "POST", "/api/bookings", headers=self.headers,
+            json={
+                "package_id": self.rng.choice(self.package_ids),
+                "customer_name": "Load Test",
+                "customer_email": "loadtest@example.com",
+                "customer_phone": "08123456789",
+                "num_passengers": self.rng.randint(1, 4),
+            },
+        )
+        if response is not None and response.status_code == 200:
+            return response.json()["id"]
+        return None
+
+    async def book_and_pay(self):
+        booking_id = await self.book()
+        if not booking_id:
+            return
+        response = await self.recorder.call(
+            self.client, "POST /payments", "POST", "/api/payments", headers=self.headers,
+            json={"booking_id": booking_id, "payment_method": "bank_transfer"}
+        )
+        if response is not None and response.status_code == 200:
+            await self.recorder.call(
+                self.client, "POST /payments/{id}/complete", "POST",
+                f"/api/payments/{response.json()['id']}/complete", headers=self.headers
+            )
+
+    async def run(self, mix: Dict[str, int], deadline: float):
+        journeys = list(mix)
+        weights = [mix[name] for name in journeys]
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(journeys, weights)[0])()
+
+
+# ==================== REPORTING ====================
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    for label, samples in sorted(recorder.samples.items()):
+        values = sorted(samples)
+        statuses = dict(recorder.statuses[label])
+        errors = sum(n for status, n in statuses.items() if not status.isdigit() or int(status) >= 500)
+        endpoints[label] = {
+            "requests": len(values),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "errors": errors,
+            "statuses": statuses,
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "endpoints": endpoints,
+        "total": {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "elapsed_s": round(elapsed, 3),
+        },
+    }
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(f"\n{'endpoint':<34}{'reqs':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for label, stats in summary["endpoints"].items():
+        print(
+            f"{label:<34}{stats['requests']:>8}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.2f}"
+            f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['errors']:>8}"
+        )
+    total = summary["total"]
+    print(f"\ntotal {total['requests']} requests in {total['elapsed_s']}s "
+          f"({total['throughput_rps']} req/s, {total['errors']} errors)")
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Endpoints whose p95 grew or throughput fell by more than ``threshold``"""
+    regressions = []
+    for label, stats in summary["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(label)
+        if not before:
+            continue
+        if before["p95_ms"] and stats["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{label}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if before["throughput_rps"] and stats["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{label}: throughput {before['throughput_rps']} -> {stats['throughput_rps']} req/s"
+            )
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ==================== RUNNER ====================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    db_name = f"loadtest_{uuid.uuid4().hex[:8]}"
+    os.environ.setdefault("MONGO_URL", args.mongo if args.mongo != "memory" else "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", db_name)
+    # Measure the endpoints, not the limiter: virtual users share a few tokens
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("MAX_IN_FLIGHT", "0")
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.mongo == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+
+        db = AsyncMongoMockClient()[db_name]
+        mongo_client = None
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        mongo_client = AsyncIOMotorClient(args.mongo, event_listeners=[server.metrics.MongoCommandListener()])
+        db = mongo_client[db_name]
+    server.db = db
+    server.session_cache.clear()
+    server.catalog_cache.clear()
+
+    print(f"Seeding {args.packages} packages, {args.users} users, {args.bookings} bookings ...")
+    seeded = await seed(db, args, rng)
+
+    uvicorn_server = None
+    if args.server == "uvicorn":
+        import uvicorn
+
+        port = free_port()
+        uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, port=port, log_level="warning"))
+        serve_task = asyncio.create_task(uvicorn_server.serve())
+        while not uvicorn_server.started:
+            await asyncio.sleep(0.05)
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=30,
+            limits=httpx.Limits(max_connections=args.concurrency)
+        )
+    else:
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=server.app), base_url="http://loadtest", timeout=30
+        )
+
+    recorder = Recorder()
+    mix = dict(DEFAULT_MIX)
+    for item in args.mix or []:
+        name, weight = item.split("=")
+        mix[name] = int(weight)
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+
+    print(f"Running {args.concurrency} virtual users for {args.duration}s ({args.server}, mongo={args.mongo}) ...")
+    started = time.perf_counter()
+    deadline = started + args.duration
+    try:
+        async with client:
+            await asyncio.gather(*[
+                VirtualUser(client, recorder, seeded, random.Random(rng.random())).run(mix, deadline)
+                for _ in range(args.concurrency)
+            ])
+        elapsed = time.perf_counter() - started
+    finally:
+        if uvicorn_server is not None:
+            uvicorn_server.should_exit = True
+            await serve_task
+        if mongo_client is not None:
+            await mongo_client.drop_database(db_name)
+            mongo_client.close()
+
+    summary = summarize(recorder, elapsed)
+    summary["meta"] = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "server": args.server,
+        "mongo": "memory" if args.mongo == "memory" else "mongodb",
+        "fast_json": getattr(server, "FAST_JSON", False),
+        "config": {key: getattr(args, key) for key in
+                   ("packages", "users", "bookings", "wishlist", "concurrency", "duration", "seed")},
+        "mix": mix,
+    }
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the API and report per-endpoint latency")
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--mongo", default="memory",
+                        help="'memory' for the in-memory Motor stand-in, or a MongoDB URL")
+    parser.add_argument("--packages", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--wishlist", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mix", nargs="*", metavar="JOURNEY=WEIGHT",
+                        help=f"override journey weights ({', '.join(DEFAULT_MIX)})")
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative p95/throughput regression (default 0.2)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    summary = asyncio.run(run(args))
+    print_report(summary)
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2))
+        print(f"Results written to {args.output}")
+    if args.compare:
+        regressions = compare(summary, json.loads(Path(args.compare).read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Micro-benchmark: model path vs fast JSON path for package listings.
+
+Run from the repository root:
+
+    python benchmarks/serialization.py [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from fast_json import RowEncoder  # noqa: E402
+from server import PackageItem, serialize_json  # noqa: E402
+
+
+def make_documents(count: int) -> List[dict]:
+    """Package documents shaped like Motor returns them (naive UTC datetimes)"""
+    now = datetime.utcnow().replace(microsecond=0)
+    return [{
+        "id": str(uuid.uuid4()),
+        "name": f"Umrah Paket {i}",
+        "description": "Paket Umrah 11 hari dengan fasilitas lengkap termasuk city tour",
+        "price": 25000000 + i * 1000,
+        "duration": "11 Hari",
+        "package_type": "umrah" if i % 2 else "tour",
+        "departure_city": ["Jakarta", "Surabaya", "Semarang"][i % 3],
+        "departure_date": "Maret 2026",
+        "airline": "Garuda Indonesia",
+        "hotel": "Hotel Bintang 4",
+        "hotel_rating": 4,
+        "facilities": ["Tiket Pesawat", "Visa", "Transportasi", "Makan", "Hotel Bintang 4"],
+        "itinerary": [f"Hari {d}: Kegiatan" for d in range(1, 12)],
+        "image_url": "https://images.unsplash.com/photo-1591604466107-ec97de577aff?w=800",
+        "availability": 20,
+        "created_at": now,
+    } for i in range(count)]
+
+
+LIST_ADAPTER = TypeAdapter(List[PackageItem])
+
+
+def model_path(docs: List[dict]) -> bytes:
+    # Handler builds models, FastAPI re-validates them against response_model
+    # and encodes with jsonable_encoder + json.dumps
+    items = [PackageItem(**doc) for doc in docs]
+    validated = LIST_ADAPTER.validate_python(items, from_attributes=True)
+    return serialize_json(validated)
+
+
+ENCODER = RowEncoder(PackageItem)
+
+
+def fast_path(docs: List[dict]) -> bytes:
+    return ENCODER.encode_many(docs)
+
+
+def measure(fn, docs, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(docs)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000])
+    args = parser.parse_args(argv)
+
+    for size in args.sizes:
+        docs = make_documents(size)
+        # Both paths must produce the same JSON
+        assert json.loads(model_path(docs)) == json.loads(fast_path(docs))
+
+        model = statistics.median(measure(model_path, docs, args.repeat))
+        fast = statistics.median(measure(fast_path, docs, args.repeat))
+        print(
+            f"{size:>6} packages  model path {model * 1000:8.2f} ms  "
+            f"fast path {fast * 1000:8.2f} ms  speedup {model / fast:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
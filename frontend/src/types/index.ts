@@ -7,6 +7,9 @@ export interface Package {
   package_type: 'umrah' | 'tour';
   departure_city: string;
   departure_date: string;
+  departure_start?: string | null;
+  departure_end?: string | null;
+  departure_recurrence?: 'daily' | 'weekly' | 'weekend' | 'monthly' | null;
   airline: string;
   hotel: string;
   hotel_rating: number;
@@ -14,6 +17,7 @@ export interface Package {
   itinerary: string[];
   image_url: string;
   availability: number;
+  saved_count?: number;
   created_at: string;
 }
 
@@ -25,9 +29,16 @@ export interface Booking {
   customer_email: string;
   customer_phone: string;
   num_passengers: number;
+  children?: number;
+  infants?: number;
+  room_type?: string | null;
+  promo_code?: string | null;
+  departure_date?: string | null;
+  discount?: number;
   total_price: number;
   payment_status: 'pending' | 'completed' | 'failed';
-  booking_status: 'confirmed' | 'cancelled';
+  booking_status: 'held' | 'confirmed' | 'expired' | 'cancelled';
+  hold_expires_at?: string;
   created_at: string;
 }
 
@@ -42,3 +53,33 @@ export interface Payment {
   created_at: string;
   completed_at?: string;
 }
+
+export interface QuoteItem {
+  package_id: string;
+  adults?: number;
+  children?: number;
+  infants?: number;
+  room_type?: string;
+  promo_code?: string;
+  departure_date?: string;
+}
+
+// Items that cannot be priced carry only package_id and error
+export interface Quote {
+  package_id: string;
+  error?: string;
+  adults?: number;
+  children?: number;
+  infants?: number;
+  room_type?: string | null;
+  promo_code?: string | null;
+  departure_date?: string | null;
+  currency?: string;
+  per_adult?: number;
+  per_child?: number;
+  per_infant?: number;
+  season_surcharge_percent?: number;
+  subtotal?: number;
+  discount?: number;
+  total?: number;
+}
@@ -28,6 +28,9 @@ api.interceptors.request.use(
 export const packagesApi = {
   getAll: (filters?: any) => api.get('/packages', { params: filters }),
   getById: (id: string) => api.get(`/packages/${id}`),
+  getSimilar: (id: string, limit = 6) => api.get(`/packages/${id}/similar`, { params: { limit } }),
+  // Server-Sent Events URL for live seat counts and price (open with EventSource)
+  availabilityStreamUrl: (id: string) => `${BACKEND_URL}/api/packages/${id}/availability/stream`,
 };
 
 export const bookingsApi = {
@@ -36,6 +39,10 @@ export const bookingsApi = {
   getById: (id: string) => api.get(`/bookings/${id}`),
 };
 
+export const quotesApi = {
+  batch: (items: any[]) => api.post('/quotes/batch', { items }),
+};
+
 export const paymentsApi = {
   create: (data: any) => api.post('/payments', data),
   complete: (id: string) => api.post(`/payments/${id}/complete`),
@@ -46,6 +53,11 @@ export const wishlistApi = {
   add: (packageId: string) => api.post('/wishlist', null, { params: { package_id: packageId } }),
   remove: (packageId: string) => api.delete(`/wishlist/${packageId}`),
   getAll: () => api.get('/wishlist'),
+  sync: (add: string[], remove: string[]) => api.post('/wishlist/bulk', { add, remove }),
+};
+
+export const homeApi = {
+  get: () => api.get('/home'),
 };
 
 export const seedData = () => api.post('/seed');
@@ -0,0 +1,198 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+# Tests drive bursts far beyond production budgets from one client
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("MAX_IN_FLIGHT", "0")
+
+import server  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+
+# One bookable package; tests override fields as needed
+PACKAGE = {
+    "id": "launch-umrah",
+    "name": "Umrah Launch",
+    "description": "High-demand departure",
+    "price": 25000000,
+    "duration": "11 Hari",
+    "package_type": "umrah",
+    "departure_city": "Jakarta",
+    "departure_date": "Maret 2026",
+    "airline": "Saudia Airlines",
+    "hotel": "Hotel Bintang 4",
+    "hotel_rating": 4,
+    "facilities": [],
+    "itinerary": [],
+    "image_url": "",
+    "created_at": datetime.now(timezone.utc),
+}
+
+
+def booking_payload(seats, **fields):
+    """POST /api/bookings body for seats on PACKAGE"""
+    return {
+        "package_id": PACKAGE["id"],
+        "customer_name": "Jamaah",
+        "customer_email": "jamaah@example.com",
+        "customer_phone": "08123456789",
+        "num_passengers": seats,
+        **fields,
+    }
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    """Point the app at a scratch database with production indexes.
+
+    Uses the MongoDB server at TEST_MONGO_URL when set, otherwise an
+    in-memory Motor stand-in.
+    """
+    test_mongo_url = os.environ.get("TEST_MONGO_URL")
+    if test_mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(test_mongo_url)
+        test_db = client[f"test_{uuid.uuid4().hex[:12]}"]
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+
+        client = None
+        test_db = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    await ensure_indexes(test_db)
+    monkeypatch.setattr(server, "db", test_db)
+    server.session_cache.clear()
+    server.catalog_cache.clear()
+    server.pricing_version.clear()
+    # Versions restart in each scratch database; drop rules compiled from another
+    server.pricing_engine.build([], [])
+    yield test_db
+    if client is not None:
+        await client.drop_database(test_db.name)
+        client.close()
+
+
+@pytest.fixture
+async def api(db):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def auth_headers(db):
+    """Create a user with a live session and return its Authorization header"""
+    await db.users.insert_one({"_id": "tester@example.com", "email": "tester@example.com", "name": "Tester"})
+    await db.user_sessions.insert_one({
+        "user_id": "tester@example.com",
+        "session_token": "test-session",
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=1),
+        "created_at": datetime.now(timezone.utc),
+    })
+    return {"Authorization": "Bearer test-session"}
+
+
+@pytest.fixture
+async def admin_headers(db, monkeypatch):
+    """Create a user listed in ADMIN_EMAILS with a live session and return its Authorization header"""
+    monkeypatch.setattr(server, "ADMIN_EMAILS", {"admin@example.com"})
+    await db.users.insert_one({"_id": "admin@example.com", "email": "admin@example.com", "name": "Admin"})
+    await db.user_sessions.insert_one({
+        "user_id": "admin@example.com",
+        "session_token": "admin-session",
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=1),
+        "created_at": datetime.now(timezone.utc),
+    })
+    return {"Authorization": "Bearer admin-session"}
+
+
+@pytest.fixture
+async def package(db):
+    """PACKAGE stored with 10 seats"""
+    doc = {**PACKAGE, "availability": 10}
+    await db.packages.insert_one(dict(doc))
+    return doc
+
+
+@pytest.fixture
+def book(api, auth_headers):
+    """Book seats on PACKAGE as the test user and return the response"""
+    async def book(seats=2, headers=None, **fields):
+        return await api.post("/api/bookings", json=booking_payload(seats, **fields), headers=headers or auth_headers)
+    return book
+
+
+class AuthStub:
+    """Local stand-in for the Emergent Auth session-data endpoint"""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.statuses = []
+        self.hits = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.hits += 1
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                time.sleep(stub.delay)
+                session_id = self.headers.get("X-Session-ID", "")
+                body = json.dumps({
+                    "email": f"{session_id}@example.com",
+                    "name": "Stub User",
+                    "picture": None,
+                    "session_token": f"token-{session_id}",
+                }).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+async def auth_stub(monkeypatch):
+    from auth_client import EmergentAuthClient
+
+    stub = AuthStub()
+    stub.start()
+    auth_client = EmergentAuthClient(stub.url, timeout=5, retries=2, backoff=0.01)
+    monkeypatch.setattr(server, "auth_client", auth_client)
+    yield stub
+    await auth_client.aclose()
+    stub.stop()
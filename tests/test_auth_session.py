@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_slow_exchange_does_not_block_other_requests(api, auth_stub):
+    auth_stub.delay = 1.0
+    login = asyncio.create_task(api.post("/api/auth/session", headers={"X-Session-ID": "slow"}))
+    await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    for _ in range(5):
+        response = await api.get("/api/packages")
+        assert response.status_code == 200
+    elapsed = time.perf_counter() - started
+
+    assert not login.done()
+    assert elapsed < 0.5
+    response = await login
+    assert response.status_code == 200
+    assert response.json()["session_token"] == "token-slow"
+
+
+async def test_concurrent_exchanges_for_same_session_are_merged(api, auth_stub, db):
+    auth_stub.delay = 0.2
+    responses = await asyncio.gather(*[
+        api.post("/api/auth/session", headers={"X-Session-ID": "dup"}) for _ in range(5)
+    ])
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert auth_stub.hits == 1
+    assert await db.user_sessions.count_documents({"session_token": "token-dup"}) == 1
+    assert await db.users.count_documents({"_id": "dup@example.com"}) == 1
+
+
+async def test_transient_upstream_errors_are_retried(api, auth_stub):
+    auth_stub.statuses = [503, 502]
+    response = await api.post("/api/auth/session", headers={"X-Session-ID": "flaky"})
+
+    assert response.status_code == 200
+    assert auth_stub.hits == 3
+
+
+async def test_rejected_session_returns_401(api, auth_stub):
+    auth_stub.statuses = [401]
+    response = await api.post("/api/auth/session", headers={"X-Session-ID": "bad"})
+
+    assert response.status_code == 401
+    assert auth_stub.hits == 1
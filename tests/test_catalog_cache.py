@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+import pytest
+
+import server
+from catalog_cache import VERSION_DOC_ID
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def instant_sync(monkeypatch):
+    """Re-read meta.catalog_version on every request instead of once per interval"""
+    monkeypatch.setattr(server.catalog_cache, "check_interval", 0)
+
+
+async def test_unchanged_catalog_answers_304(api, package):
+    first = await api.get("/api/packages")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+
+    again = await api.get("/api/packages", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    assert (await api.get("/api/packages", headers={"If-None-Match": '"stale", ' + etag})).status_code == 304
+    assert (await api.get("/api/packages", headers={"If-None-Match": '"stale"'})).status_code == 200
+
+    detail = await api.get(f"/api/packages/{PACKAGE['id']}")
+    assert (await api.get(
+        f"/api/packages/{PACKAGE['id']}", headers={"If-None-Match": detail.headers["ETag"]}
+    )).status_code == 304
+
+
+async def test_version_bump_from_another_worker_invalidates_cached_pages(api, db, package, instant_sync):
+    etag = (await api.get("/api/packages")).headers["ETag"]
+    hits = server.catalog_cache.stats()["hits"]
+    assert (await api.get("/api/packages", headers={"If-None-Match": etag})).status_code == 304
+    assert server.catalog_cache.stats()["hits"] == hits + 1
+
+    # Another worker adds a package: the row lands, then the shared version moves
+    await db.packages.insert_one({
+        **PACKAGE, "id": "second-umrah", "availability": 5, "created_at": PACKAGE["created_at"] + timedelta(seconds=1)
+    })
+    cached = await api.get("/api/packages", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    await db.meta.update_one({"_id": VERSION_DOC_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+    response = await api.get("/api/packages", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [row["id"] for row in response.json()] == [PACKAGE["id"], "second-umrah"]
+    assert server.catalog_cache.stats()["version"] == (await db.meta.find_one({"_id": VERSION_DOC_ID}))["version"]
+
+
+async def test_catalog_cache_stats_require_an_admin(api, auth_headers, admin_headers):
+    assert (await api.get("/api/admin/catalog-cache")).status_code == 401
+    assert (await api.get("/api/admin/catalog-cache", headers=auth_headers)).status_code == 403
+    response = await api.get("/api/admin/catalog-cache", headers=admin_headers)
+    assert response.status_code == 200
+    assert {"version", "hits", "misses"} <= response.json().keys()
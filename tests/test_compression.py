@@ -0,0 +1,90 @@
+import pytest
+
+import compression
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+# httpx asks for every encoding it can decode unless told otherwise
+GZIP = {"Accept-Encoding": "gzip"}
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+@pytest.fixture
+async def catalog(db):
+    await db.packages.insert_many([{**PACKAGE, "id": f"pkg-{i}", "availability": 5} for i in range(8)])
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", compression.GZIP),
+    ("GZIP;q=0.5, deflate", compression.GZIP),
+    ("gzip;q=0", None),
+    ("*", compression.SUPPORTED[0]),
+    ("*;q=0.1, gzip;q=0", None if compression.SUPPORTED == (compression.GZIP,) else compression.BROTLI),
+])
+def test_negotiate_picks_the_best_accepted_encoding(accept_encoding, expected):
+    assert compression.negotiate(accept_encoding) == expected
+
+
+async def test_catalog_pages_are_gzipped_with_their_own_etag(api, catalog):
+    plain = await api.get("/api/packages", headers=IDENTITY)
+    zipped = await api.get("/api/packages", headers=GZIP)
+
+    assert "Content-Encoding" not in plain.headers
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.headers["Vary"] == "Accept-Encoding"
+    assert zipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert int(zipped.headers["Content-Length"]) < len(plain.content)
+    # httpx decodes the body; it is the identity representation once decompressed
+    assert zipped.content == plain.content
+
+    # Each representation only matches its own validator
+    etag = zipped.headers["ETag"]
+    assert (await api.get("/api/packages", headers={**GZIP, "If-None-Match": etag})).status_code == 304
+    assert (await api.get("/api/packages", headers={**IDENTITY, "If-None-Match": etag})).status_code == 200
+
+
+async def test_cached_body_is_compressed_once(api, catalog, monkeypatch):
+    calls = []
+    compress = compression.compress
+
+    def counting_compress(body, encoding):
+        calls.append(encoding)
+        return compress(body, encoding)
+
+    monkeypatch.setattr(compression, "compress", counting_compress)
+    for _ in range(3):
+        response = await api.get("/api/packages", headers=GZIP)
+        assert response.headers["Content-Encoding"] == "gzip"
+
+    assert calls == ["gzip"]
+
+
+async def test_small_bodies_are_sent_uncompressed(api, db):
+    await db.packages.insert_one({**PACKAGE, "availability": 5})
+    response = await api.get(f"/api/packages/{PACKAGE['id']}", headers=GZIP, params={"fields": "name"})
+    assert "Content-Encoding" not in response.headers
+
+
+async def test_uncached_responses_are_compressed_by_the_middleware(api, catalog):
+    response = await api.get("/api/packages/export", headers=GZIP)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 8
+
+
+async def test_fields_narrow_rows_and_unknown_fields_are_rejected(api, catalog):
+    rows = (await api.get("/api/packages", params={"fields": "name, price", "limit": 2})).json()
+    assert rows == [{"id": f"pkg-{i}", "name": PACKAGE["name"], "price": PACKAGE["price"]} for i in range(2)]
+    cards = (await api.get("/api/packages", params={"view": "card", "fields": "airline", "limit": 1})).json()
+    assert cards == [{"id": "pkg-0", "airline": PACKAGE["airline"]}]
+    detail = (await api.get("/api/packages/pkg-3", params={"fields": "hotel"})).json()
+    assert detail == {"id": "pkg-3", "hotel": PACKAGE["hotel"]}
+
+    response = await api.get("/api/packages", params={"fields": "name,password"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown fields: password"
+    # "hotel" is a full-view field, not a card one
+    assert (await api.get("/api/packages", params={"view": "card", "fields": "hotel"})).status_code == 400
@@ -0,0 +1,81 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.read_preferences import Nearest, Primary, SecondaryPreferred
+
+import database
+import server
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+
+def test_settings_from_env_map_to_client_options():
+    settings = database.MongoSettings.from_env({
+        "MONGO_MAX_POOL_SIZE": "40",
+        "MONGO_MIN_POOL_SIZE": "4",
+        "MONGO_MAX_IDLE_TIME_MS": "0",
+        "MONGO_WAIT_QUEUE_TIMEOUT_MS": "750",
+        "MONGO_COMPRESSORS": "zlib, lz77",
+        "MONGO_APP_NAME": "api-test",
+    })
+
+    assert settings.warm_connections == 4
+    assert database.client_options(settings) == {
+        "maxPoolSize": 40,
+        "minPoolSize": 4,
+        "serverSelectionTimeoutMS": 5000,
+        "connectTimeoutMS": 5000,
+        "waitQueueTimeoutMS": 750,
+        "compressors": "zlib",
+        "appname": "api-test",
+    }
+
+
+def test_read_preferences_use_the_public_modes():
+    assert database.read_preference("primary") == Primary()
+    assert database.read_preference("secondaryPreferred", 120) == SecondaryPreferred(max_staleness=120)
+    assert database.read_preference("nearest") == Nearest()
+    with pytest.raises(ValueError):
+        database.read_preference("anywhere")
+
+
+def test_create_app_opens_a_client_with_its_own_pool_settings(monkeypatch):
+    # Restore the module's handles once this app is gone
+    for name in ("client", "db", "mongo_settings", "CATALOG_READ_PREFERENCE"):
+        monkeypatch.setattr(server, name, getattr(server, name))
+    settings = database.MongoSettings(
+        max_pool_size=7, min_pool_size=2, wait_queue_timeout_ms=250, catalog_read_preference="nearest"
+    )
+
+    app = server.create_app(settings)
+
+    client = app.state.mongo_client
+    try:
+        assert server.client is client and server.db.client is client
+        pool = client.options.pool_options
+        assert (pool.max_pool_size, pool.min_pool_size, pool.wait_queue_timeout) == (7, 2, 0.25)
+        assert server.catalog_db().read_preference == Nearest()
+        assert database.pool_stats(server.mongo_settings, {"in_use": 7})["utilization"] == 1.0
+        # Another app gets a client of its own
+        other = server.create_app(database.MongoSettings(max_pool_size=3)).state.mongo_client
+        assert other is not client and other.options.pool_options.max_pool_size == 3
+        other.close()
+    finally:
+        client.close()
+
+
+async def test_pool_stats_require_an_admin(api, auth_headers, admin_headers):
+    assert (await api.get("/api/admin/pool-stats")).status_code == 401
+    assert (await api.get("/api/admin/pool-stats", headers=auth_headers)).status_code == 403
+    response = await api.get("/api/admin/pool-stats", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["max_pool_size"] == server.mongo_settings.max_pool_size
+
+
+async def test_cached_catalog_pages_are_not_read_from_a_lagging_secondary(api, package, monkeypatch):
+    # A secondary that has not replicated the package yet
+    lagging = AsyncMongoMockClient()["lagging"]
+    monkeypatch.setattr(server, "catalog_db", lambda: lagging)
+
+    assert [row["id"] for row in (await api.get("/api/packages")).json()] == [PACKAGE["id"]]
+    assert (await api.get(f"/api/packages/{PACKAGE['id']}")).status_code == 200
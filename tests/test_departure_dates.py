@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from departure_dates import OPEN_END, departure_filter, parse_departure
+from tests.conftest import PACKAGE
+
+TODAY = datetime(2025, 10, 15, 9, 30, tzinfo=timezone.utc)
+
+
+def day(year, month, day_of_month=1):
+    return datetime(year, month, day_of_month, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("text, start, end", [
+    # Whole month
+    ("Desember 2025", day(2025, 12), day(2026, 1)),
+    ("desember, 2025", day(2025, 12), day(2026, 1)),
+    ("Des. 2025", day(2025, 12), day(2026, 1)),
+    ("March 2026", day(2026, 3), day(2026, 4)),
+    # Year-less months mean the next such month, counting the current one
+    ("Maret", day(2026, 3), day(2026, 4)),
+    ("Oktober", day(2025, 10), day(2025, 11)),
+    ("November", day(2025, 11), day(2025, 12)),
+    # Single day
+    ("15 Des 2025", day(2025, 12, 15), day(2025, 12, 16)),
+    ("1 Januari", day(2026, 1, 1), day(2026, 1, 2)),
+    # Day span within a month
+    ("10-20 Januari 2026", day(2026, 1, 10), day(2026, 1, 21)),
+    ("10 - 20 Jan", day(2026, 1, 10), day(2026, 1, 21)),
+    # Ranges across months
+    ("Desember 2025 - Januari 2026", day(2025, 12), day(2026, 2)),
+    ("Desember 2025 s/d Februari 2026", day(2025, 12), day(2026, 3)),
+    ("November sampai Desember", day(2025, 11), day(2026, 1)),
+    ("5 Nov 2025 hingga 2 Des 2025", day(2025, 11, 5), day(2025, 12, 3)),
+])
+def test_fixed_windows(text, start, end):
+    assert parse_departure(text, today=TODAY) == {
+        "departure_start": start, "departure_end": end, "departure_recurrence": None,
+    }
+
+
+@pytest.mark.parametrize("text, recurrence", [
+    ("Setiap Hari", "daily"),
+    ("setiap harian", "daily"),
+    ("Setiap Minggu", "weekly"),
+    ("Setiap Pekan", "weekly"),
+    ("Setiap Weekend", "weekend"),
+    ("Setiap Akhir Pekan", "weekend"),
+    ("Setiap Bulan", "monthly"),
+])
+def test_recurring_schedules_start_today_with_no_end(text, recurrence):
+    assert parse_departure(text, today=TODAY) == {
+        "departure_start": day(2025, 10, 15), "departure_end": OPEN_END, "departure_recurrence": recurrence,
+    }
+
+
+@pytest.mark.parametrize("text", [
+    None,
+    "",
+    "   ",
+    "Segera",
+    "Setiap Tahun",
+    "Smarch 2025",
+    "31 Februari 2026",
+    "20-10 Januari 2026",
+    "Januari 2026 - Desember 2025",
+    "Januari 2026 - Kapan saja",
+    "2025",
+])
+def test_unparseable_input_is_unknown(text):
+    assert parse_departure(text, today=TODAY) == {
+        "departure_start": None, "departure_end": None, "departure_recurrence": None,
+    }
+
+
+def test_departure_filter_matches_overlapping_windows():
+    assert departure_filter(day(2025, 12), day(2026, 1)) == {
+        "departure_start": {"$lt": day(2026, 1)}, "departure_end": {"$gt": day(2025, 12)},
+    }
+    assert departure_filter(None, None) == {}
+
+
+@pytest.mark.anyio
+async def test_backfill_requires_an_admin(api, db, auth_headers, admin_headers):
+    await db.packages.insert_one({**PACKAGE, "availability": 5, "departure_date": "Desember 2025"})
+    assert (await api.post("/api/admin/backfill-departure-dates")).status_code == 401
+    assert (await api.post("/api/admin/backfill-departure-dates", headers=auth_headers)).status_code == 403
+
+    response = await api.post("/api/admin/backfill-departure-dates", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"updated": 1, "unparsed": 0}
+    stored = await db.packages.find_one({"id": PACKAGE["id"]})
+    assert "departure_start" in stored and stored["departure_recurrence"] is None
@@ -0,0 +1,56 @@
+import json
+
+import orjson
+import pytest
+
+import server
+from benchmarks import serialization
+from fast_json import RowEncoder
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+# Motor hands back naive UTC datetimes
+STORED = {**PACKAGE, "availability": 5, "created_at": PACKAGE["created_at"].replace(tzinfo=None)}
+
+BOOKING = {
+    "id": "booking-1", "user_id": "tester@example.com", "package_id": PACKAGE["id"],
+    "customer_name": "Jamaah", "customer_email": "jamaah@example.com", "customer_phone": "0812",
+    "num_passengers": 2, "total_price": 50000000, "payment_status": "pending", "booking_status": "held",
+    "created_at": STORED["created_at"],
+}
+
+
+@pytest.mark.parametrize("model, doc", [
+    # Stored before saved_count existed
+    (server.PackageItem, STORED),
+    (server.PackageItem, {**STORED, "saved_count": 3, "departure_recurrence": "weekly"}),
+    (server.PackageCard, STORED),
+    # Optional pricing fields left out
+    (server.Booking, BOOKING),
+])
+def test_rows_match_the_model_path(model, doc):
+    encoder = RowEncoder(model)
+    # What the handlers send on the model path
+    expected = json.loads(server.serialize_json(model(**doc)))
+
+    assert json.loads(encoder.encode_one(doc)) == expected
+    assert json.loads(orjson.dumps(encoder.row(doc))) == expected
+    assert json.loads(encoder.encode_many([doc, doc])) == [expected, expected]
+
+
+def test_serialization_benchmark_paths_agree():
+    # The benchmark asserts both paths produce the same JSON for each size
+    serialization.main(["--sizes", "50", "--repeat", "1"])
+
+
+async def test_fast_path_serves_the_same_catalog(api, db, monkeypatch):
+    await db.packages.insert_one({**PACKAGE, "availability": 5})
+    paths = ["/api/packages", f"/api/packages/{PACKAGE['id']}", "/api/packages?view=card"]
+    model_bodies = [(await api.get(path)).json() for path in paths]
+
+    monkeypatch.setattr(server, "FAST_JSON", True)
+    server.catalog_cache.clear()
+
+    assert [(await api.get(path)).json() for path in paths] == model_bodies
+    assert model_bodies[0][0]["saved_count"] == 0
@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+import pytest
+
+import server
+import wishlist
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def catalog(db):
+    await db.packages.insert_many([
+        {**PACKAGE, "id": f"pkg-{i}", "availability": 10, "created_at": PACKAGE["created_at"] + timedelta(days=i)}
+        for i in range(server.HOME_FEATURED_LIMIT + 2)
+    ])
+
+
+async def test_anonymous_home_features_the_newest_packages(api, catalog):
+    response = await api.get("/api/home")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["user"] is None and body["wishlist"] == [] and body["recent_bookings"] == []
+    newest = [f"pkg-{i}" for i in range(server.HOME_FEATURED_LIMIT + 1, 1, -1)]
+    assert [card["id"] for card in body["featured_packages"]] == newest
+    assert set(body["featured_packages"][0]) == set(server.PackageCard.model_fields)
+
+
+async def test_signed_in_home_adds_wishlist_and_bookings(api, db, auth_headers, catalog, book):
+    await wishlist.add(db, "tester@example.com", "pkg-0")
+    await wishlist.add(db, "tester@example.com", "pkg-3")
+    # Saved a minute apart, so the newest-first order does not rest on clock resolution
+    saved = await db.wishlist.find_one({"package_id": "pkg-3"})
+    await db.wishlist.update_one(
+        {"package_id": "pkg-0"}, {"$set": {"created_at": saved["created_at"] - timedelta(minutes=1)}}
+    )
+    booking = (await book(2, package_id="pkg-1")).json()
+
+    body = (await api.get("/api/home", headers=auth_headers)).json()
+
+    assert body["user"]["email"] == "tester@example.com"
+    assert [card["id"] for card in body["wishlist"]] == ["pkg-3", "pkg-0"]
+    assert set(body["wishlist"][0]) == set(server.PackageCard.model_fields)
+    assert [row["id"] for row in body["recent_bookings"]] == [booking["id"]]
+    assert body["recent_bookings"][0]["total_price"] == 2 * PACKAGE["price"]
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import idempotency
+import server
+from tests.conftest import PACKAGE, booking_payload
+
+pytestmark = pytest.mark.anyio
+
+
+def keyed(headers, key):
+    return {**headers, "Idempotency-Key": key}
+
+
+async def test_retry_replays_the_stored_response(api, db, auth_headers, package):
+
+    first = await api.post("/api/bookings", json=booking_payload(2), headers=keyed(auth_headers, "order-1"))
+    retry = await api.post("/api/bookings", json=booking_payload(2), headers=keyed(auth_headers, "order-1"))
+
+    assert first.status_code == retry.status_code == 200
+    assert first.headers["Idempotent-Replayed"] == "false"
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert await db.bookings.count_documents({}) == 1
+    assert (await db.packages.find_one({"id": PACKAGE["id"]}))["availability"] == 8
+
+
+async def test_key_reused_with_another_payload_is_rejected(api, db, auth_headers, package):
+
+    await api.post("/api/bookings", json=booking_payload(2), headers=keyed(auth_headers, "order-1"))
+    response = await api.post("/api/bookings", json=booking_payload(3), headers=keyed(auth_headers, "order-1"))
+
+    assert response.status_code == 422
+    assert await db.bookings.count_documents({}) == 1
+
+
+async def test_concurrent_duplicate_waits_for_the_original(api, db, auth_headers, package, monkeypatch):
+    insert_booking = server.insert_booking
+    calls = []
+
+    async def slow_insert_booking(booking, user):
+        calls.append(booking)
+        await asyncio.sleep(0.3)
+        return await insert_booking(booking, user)
+
+    monkeypatch.setattr(server, "insert_booking", slow_insert_booking)
+
+    responses = await asyncio.gather(*[
+        api.post("/api/bookings", json=booking_payload(2), headers=keyed(auth_headers, "order-1"))
+        for _ in range(2)
+    ])
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert sorted(r.headers["Idempotent-Replayed"] for r in responses) == ["false", "true"]
+    assert responses[0].json()["id"] == responses[1].json()["id"]
+    assert len(calls) == 1
+
+
+async def test_abandoned_key_is_taken_over_once_its_lease_lapses(api, db, auth_headers, package, monkeypatch):
+    monkeypatch.setattr(server.idempotency_store, "wait_timeout", 0.2)
+    now = datetime.now(timezone.utc)
+    record = {
+        "_id": "create_booking:tester@example.com:order-1",
+        "state": idempotency.IN_PROGRESS,
+        "fingerprint": idempotency.fingerprint(server.BookingCreate(**booking_payload(2))),
+        "lease": "dead-worker",
+        "lease_expires_at": now + timedelta(minutes=1),
+        "created_at": now,
+        "expires_at": now + timedelta(days=1),
+    }
+    await db.idempotency_keys.insert_one(record)
+
+    # Lease still live: the original may be running elsewhere
+    response = await api.post("/api/bookings", json=booking_payload(2), headers=keyed(auth_headers, "order-1"))
+    assert response.status_code == 409
+
+    await db.idempotency_keys.update_one(
+        {"_id": record["_id"]}, {"$set": {"lease_expires_at": now - timedelta(seconds=1)}}
+    )
+    response = await api.post("/api/bookings", json=booking_payload(2), headers=keyed(auth_headers, "order-1"))
+    assert response.status_code == 200
+    assert response.headers["Idempotent-Replayed"] == "false"
+    assert (await db.idempotency_keys.find_one({"_id": record["_id"]}))["state"] == idempotency.COMPLETED
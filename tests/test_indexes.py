@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from indexes import INDEXES, QUERY_SHAPES, ensure_indexes, index_report
+
+pytestmark = pytest.mark.anyio
+
+
+class ProfiledDb:
+    """Explain and profiler answers as a deployment without clusterMonitor gives them"""
+
+    def __init__(self, profile, scanned):
+        self.profile = profile
+        self.scanned = scanned
+
+    def __getitem__(self, name):
+        assert name == "system.profile"
+        return self.profile
+
+    async def command(self, name, spec=None, **kwargs):
+        if name == "serverStatus":
+            raise OperationFailure("not authorized on admin to execute command", code=13)
+        if spec["find"] in self.scanned:
+            plan = {"stage": "COLLSCAN", "filter": spec["filter"]}
+        else:
+            plan = {
+                "stage": "FETCH",
+                "inputStage": {"stage": "IXSCAN", "indexName": "id_unique", "keyPattern": {"id": 1}},
+            }
+        return {"queryPlanner": {"winningPlan": plan}}
+
+
+async def test_ensure_indexes_is_idempotent(db):
+    before = {name: await db[name].index_information() for name in INDEXES}
+
+    created = await ensure_indexes(db)
+
+    assert created == {name: [model.document["name"] for model in models] for name, models in INDEXES.items()}
+    assert {name: await db[name].index_information() for name in INDEXES} == before
+
+
+async def test_report_lists_plans_and_key_patterns_without_filter_values(db):
+    await db.profile_sample.insert_one({
+        "ns": "test.user_sessions", "op": "command", "planSummary": "COLLSCAN", "millis": 12,
+        "docsExamined": 4000, "ts": 1,
+        "command": {"aggregate": "user_sessions", "pipeline": [{"$match": {"session_token": "live-token"}}]},
+    })
+
+    report = await index_report(ProfiledDb(db.profile_sample, scanned={"jobs"}))
+
+    assert len(report["query_shapes"]) == len(QUERY_SHAPES)
+    assert report["unindexed_shapes"] == ["claim_job"]
+    get_package = report["query_shapes"][0]
+    assert get_package == {
+        "name": "get_package", "collection": "packages", "stages": ["FETCH", "IXSCAN"],
+        "key_patterns": [{"id": 1}], "collection_scan": False,
+    }
+    assert report["profiled_collection_scans"] == [{
+        "ns": "test.user_sessions", "op": "command", "planSummary": "COLLSCAN", "millis": 12,
+        "docsExamined": 4000, "ts": 1,
+    }]
+    # No serverStatus privilege: the total is unknown rather than an error
+    assert report["collection_scans_total"] is None
+    assert "live-token" not in json.dumps(report)
+
+
+async def test_index_report_requires_an_admin(api, auth_headers):
+    assert (await api.get("/api/admin/index-report")).status_code == 401
+    assert (await api.get("/api/admin/index-report", headers=auth_headers)).status_code == 403
@@ -0,0 +1,120 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import inventory
+from tests.conftest import PACKAGE, booking_payload
+
+pytestmark = pytest.mark.anyio
+
+async def test_parallel_bookings_never_oversell(api, db, auth_headers):
+    capacity = 500
+    await db.packages.insert_one({**PACKAGE, "availability": capacity})
+    rng = random.Random(42)
+    requests = [booking_payload(rng.randint(1, 3)) for _ in range(2000)]
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*[
+        api.post("/api/bookings", json=payload, headers=auth_headers) for payload in requests
+    ])
+    elapsed = time.perf_counter() - started
+
+    statuses = [r.status_code for r in responses]
+    assert set(statuses) <= {200, 409}
+    booked = sum(r.json()["num_passengers"] for r in responses if r.status_code == 200)
+    package = await db.packages.find_one({"id": PACKAGE["id"]})
+
+    assert booked <= capacity
+    assert package["availability"] == capacity - booked
+    assert package["availability"] >= 0
+    assert await db.bookings.count_documents({"package_id": PACKAGE["id"]}) == statuses.count(200)
+    # Once sold out, every remaining request is refused rather than queued
+    assert package["availability"] < 3
+    print(f"\n{len(requests)} bookings in {elapsed:.2f}s "
+          f"({len(requests) / elapsed:.0f} req/s, {statuses.count(200)} accepted)")
+
+
+async def test_expired_holds_are_returned_to_stock(api, db, auth_headers, package, book):
+    held = (await book(4)).json()
+    kept = (await book(3)).json()
+    assert held["booking_status"] == inventory.HELD
+    assert (await db.packages.find_one({"id": PACKAGE["id"]}))["availability"] == 3
+
+    # Pay for one booking, let the other lapse
+    payment = (await api.post("/api/payments", json={
+        "booking_id": kept["id"], "payment_method": "bank_transfer"
+    }, headers=auth_headers)).json()
+    response = await api.post(f"/api/payments/{payment['id']}/complete", headers=auth_headers)
+    assert response.status_code == 200
+
+    released = await inventory.release_expired_holds(db, now=datetime.now(timezone.utc) + timedelta(days=1))
+
+    assert released == {"bookings": 1, "seats": 4}
+    assert (await db.packages.find_one({"id": PACKAGE["id"]}))["availability"] == 7
+    assert (await db.bookings.find_one({"id": held["id"]}))["booking_status"] == inventory.EXPIRED
+    assert (await db.bookings.find_one({"id": kept["id"]}))["booking_status"] == inventory.CONFIRMED
+
+
+async def test_lapsed_hold_cannot_be_paid(api, db, auth_headers, package, book):
+    booking = (await book(2)).json()
+    payment = (await api.post("/api/payments", json={
+        "booking_id": booking["id"], "payment_method": "e_wallet"
+    }, headers=auth_headers)).json()
+    await db.bookings.update_one(
+        {"id": booking["id"]},
+        {"$set": {"hold_expires_at": datetime.now(timezone.utc) - timedelta(minutes=1)}}
+    )
+
+    response = await api.post(f"/api/payments/{payment['id']}/complete", headers=auth_headers)
+
+    assert response.status_code == 409
+    assert (await db.payments.find_one({"id": payment["id"]}))["payment_status"] == "pending"
+
+
+async def test_sweep_resumes_after_a_crash_without_double_restock(db, package, book):
+    crashed = (await book(2)).json()
+    restocked = (await book(3)).json()
+    # A sweep died an hour ago after claiming both holds; it had restocked the second one but not marked it
+    await db.bookings.update_many(
+        {"id": {"$in": [crashed["id"], restocked["id"]]}},
+        {"$set": {
+            "booking_status": inventory.EXPIRED, "sweep_id": "crashed-sweep", "seats_returned": False,
+            "expired_at": datetime.now(timezone.utc) - timedelta(hours=1),
+        }},
+    )
+    await db.bookings.update_one({"id": restocked["id"]}, {"$set": {"sweep_id": "restocked-sweep"}})
+    await db.packages.update_one(
+        {"id": PACKAGE["id"]}, {"$inc": {"availability": 3}, "$push": {"restocked_sweeps": "restocked-sweep"}}
+    )
+    assert (await db.packages.find_one({"id": PACKAGE["id"]}))["availability"] == 8
+
+    released = await asyncio.gather(*[inventory.release_expired_holds(db) for _ in range(3)])
+
+    assert sum(r["seats"] for r in released) == 5
+    assert (await db.packages.find_one({"id": PACKAGE["id"]}))["availability"] == 10
+    assert await db.bookings.count_documents({"seats_returned": False}) == 0
+    assert await inventory.release_expired_holds(db) == {"bookings": 0, "seats": 0}
+
+
+async def test_sweep_leaves_another_sweeps_fresh_claim_alone(db, package, book):
+    claimed = (await book(2)).json()
+    lapsed = (await book(3)).json()
+    now = datetime.now(timezone.utc) + timedelta(days=1)
+    # Sweep A's claiming update_many has reached one of the two lapsed holds so far
+    await db.bookings.update_one({"id": claimed["id"]}, {"$set": {
+        "booking_status": inventory.EXPIRED, "sweep_id": "sweep-a", "expired_at": now, "seats_returned": False,
+    }})
+
+    assert await inventory.release_expired_holds(db, now=now) == {"bookings": 1, "seats": 3}
+    package = await db.packages.find_one({"id": PACKAGE["id"]})
+    assert package["availability"] == 8
+    assert "sweep-a" not in package["restocked_sweeps"]
+    assert (await db.bookings.find_one({"id": lapsed["id"]}))["seats_returned"] is True
+
+    # Sweep A never finished: its claim is recovered once the grace period is over
+    later = now + timedelta(seconds=inventory.RECOVERY_GRACE_SECONDS)
+    assert await inventory.release_expired_holds(db, now=later) == {"bookings": 1, "seats": 2}
+    assert (await db.packages.find_one({"id": PACKAGE["id"]}))["availability"] == 10
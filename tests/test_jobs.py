@@ -0,0 +1,160 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import jobs
+import server
+from notifications import WebhookNotifier
+
+pytestmark = pytest.mark.anyio
+
+
+class WebhookStub:
+    """Local webhook receiver with a configurable delay and status sequence"""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.statuses = []
+        self.events = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(stub.delay)
+                with stub._lock:
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                    if status == 200:
+                        stub.events.append(body)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hooks"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+async def webhook(monkeypatch):
+    stub = WebhookStub()
+    notifier = WebhookNotifier(stub.url, timeout=5)
+    monkeypatch.setattr(server, "webhook_notifier", notifier)
+    yield stub
+    await notifier.aclose()
+    stub.stop()
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not await condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.02)
+
+
+async def test_booking_does_not_wait_for_slow_webhook(db, package, book, webhook):
+    webhook.delay = 1.0
+    await server.job_worker.start(db)
+    try:
+        started = time.perf_counter()
+        response = await book(2)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200
+        assert elapsed < 0.5
+
+        async def delivered():
+            return await db.jobs.count_documents({"status": jobs.DONE}) == 1
+        await wait_for(delivered)
+        assert webhook.events[0]["event"] == "booking.created"
+        assert webhook.events[0]["data"]["booking_id"] == response.json()["id"]
+    finally:
+        await server.job_worker.drain(timeout=5)
+
+
+async def test_failed_jobs_are_retried_then_given_up(db, webhook):
+    worker = jobs.JobWorker(
+        {"webhook": server.deliver_webhook}, concurrency=2, poll_interval=0.05, backoff=0.01, max_attempts=3
+    )
+    webhook.statuses = [500, 503]
+    await worker.start(db)
+    try:
+        [recovered] = await worker.enqueue(db, [("webhook", {"event": "ping", "data": {}})])
+
+        async def finished(job_id, status):
+            return await db.jobs.count_documents({"_id": job_id, "status": status}) == 1
+        await wait_for(lambda: finished(recovered, jobs.DONE))
+        assert (await db.jobs.find_one({"_id": recovered}))["attempts"] == 3
+
+        webhook.statuses = [500, 500, 500]
+        [abandoned] = await worker.enqueue(db, [("webhook", {"event": "ping", "data": {}})])
+        await wait_for(lambda: finished(abandoned, jobs.FAILED))
+        job = await db.jobs.find_one({"_id": abandoned})
+        assert job["attempts"] == 3
+        assert "500" in job["last_error"]
+        # Both expire through the TTL index; failures are kept longer
+        done = await db.jobs.find_one({"_id": recovered})
+        assert done["expires_at"] - done["finished_at"] == timedelta(seconds=worker.retention_seconds)
+        assert job["expires_at"] - job["finished_at"] == timedelta(seconds=worker.failed_retention_seconds)
+        assert worker.failed_retention_seconds > worker.retention_seconds
+    finally:
+        await worker.drain(timeout=5)
+
+
+async def test_each_job_is_claimed_by_one_worker(db):
+    runs = []
+
+    async def record(payload):
+        runs.append(payload["n"])
+        await asyncio.sleep(0.01)
+
+    workers = [jobs.JobWorker({"record": record}, concurrency=4, poll_interval=0.05) for _ in range(2)]
+    await workers[0].enqueue(db, [("record", {"n": n}) for n in range(40)])
+    for worker in workers:
+        await worker.start(db)
+    try:
+        async def all_done():
+            return await db.jobs.count_documents({"status": jobs.DONE}) == 40
+        await wait_for(all_done)
+        assert sorted(runs) == list(range(40))
+    finally:
+        for worker in workers:
+            await worker.drain(timeout=5)
+
+
+async def test_drain_hands_unfinished_jobs_back(db):
+    started = asyncio.Event()
+
+    async def stuck(payload):
+        started.set()
+        await asyncio.sleep(60)
+
+    worker = jobs.JobWorker({"stuck": stuck}, concurrency=1, poll_interval=0.05)
+    [job_id] = await worker.enqueue(db, [("stuck", {})])
+    await worker.start(db)
+    await asyncio.wait_for(started.wait(), 5)
+    await worker.drain(timeout=0.1)
+    assert not worker.running
+    assert (await db.jobs.find_one({"_id": job_id}))["status"] == jobs.QUEUED
+
+
+async def test_job_stats_require_an_admin(api, db, auth_headers, admin_headers):
+    await jobs.JobWorker({}).enqueue(db, [("webhook", {}), ("webhook", {})])
+    assert (await api.get("/api/admin/jobs")).status_code == 401
+    assert (await api.get("/api/admin/jobs", headers=auth_headers)).status_code == 403
+
+    response = await api.get("/api/admin/jobs", headers=admin_headers)
+
+    assert response.json() == {"webhook": {jobs.QUEUED: 2}}
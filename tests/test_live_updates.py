@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import live_updates
+import server
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+
+def parse_event(chunk: bytes):
+    data = [line[6:] for line in chunk.decode().splitlines() if line.startswith("data: ")]
+    return json.loads(data[0]) if data else None
+
+
+@pytest.fixture
+async def live(db, monkeypatch):
+    """The app's hub with a short coalescing window; tests start it with their source"""
+    monkeypatch.setattr(server.live_hub, "coalesce_seconds", 0.05)
+    yield server.live_hub
+    await server.live_hub.stop()
+
+
+async def test_rapid_updates_are_coalesced_per_subscriber():
+    hub = live_updates.AvailabilityHub()
+    fast, slow = hub.subscribe("p1"), hub.subscribe("p1")
+    hub.prime({"_id": 1, "id": "p1", "availability": 100, "price": 10})
+    for seats in range(99, -1, -1):
+        hub.publish("p1", {"availability": seats})
+    assert (await fast.next(1))["availability"] == 0
+    assert (await slow.next(1))["availability"] == 0
+
+    # An unchanged state wakes nobody
+    hub.publish("p1", {"availability": 0, "price": 10})
+    assert await fast.next(0.05) is None
+    hub.unsubscribe(fast)
+    hub.unsubscribe(slow)
+    assert hub.stats()["subscribers"] == 0
+
+
+async def test_booking_pushes_availability_to_open_stream(api, db, package, book, live):
+    await live.start(db, live_updates.HOOKS)
+    assert (await api.get("/api/packages/missing/availability/stream")).status_code == 404
+
+    response = await server.stream_availability(PACKAGE["id"])
+    events = response.body_iterator
+    first = await events.__anext__()
+    assert first.startswith(b"retry: ")
+    assert parse_event(first) == {"package_id": PACKAGE["id"], "availability": 10, "price": PACKAGE["price"]}
+
+    assert (await book(3)).status_code == 200
+    assert parse_event(await asyncio.wait_for(events.__anext__(), 2))["availability"] == 7
+
+    await events.aclose()
+    assert live.stats()["subscribers"] == 0
+
+
+async def test_change_stream_pushes_writes_from_other_workers(db, package, live):
+    if not os.environ.get("TEST_MONGO_URL") or not await live_updates_supported(db):
+        pytest.skip("needs TEST_MONGO_URL pointing at a replica set (a single-node one will do)")
+    await live.start(db, live_updates.CHANGE_STREAM)
+    response = await server.stream_availability(PACKAGE["id"])
+    events = response.body_iterator
+    assert parse_event(await events.__anext__())["availability"] == 10
+    await asyncio.sleep(0.5)  # let the change stream open
+
+    # Written straight to Mongo, as another worker would: no in-process hook fires
+    await db.packages.update_one({"id": PACKAGE["id"]}, {"$inc": {"availability": -4}})
+    assert parse_event(await asyncio.wait_for(events.__anext__(), 5))["availability"] == 6
+    await events.aclose()
+
+
+async def live_updates_supported(db) -> bool:
+    hello = await db.client.admin.command("hello")
+    return "setName" in hello
+
+
+@pytest.mark.parametrize("failure", ["disconnect", "send_error"])
+async def test_stream_slot_is_released_when_client_leaves_before_first_event(package, live, failure):
+    response = await server.stream_availability(PACKAGE["id"])
+    assert live.stats()["subscribers"] == 1
+
+    async def receive():
+        if failure == "disconnect":
+            return {"type": "http.disconnect"}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if failure == "send_error":
+            raise OSError("connection reset")
+        await asyncio.sleep(0.1)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    try:
+        await asyncio.wait_for(response(scope, receive, send), 2)
+    except* OSError:
+        pass
+    assert live.stats()["subscribers"] == 0
@@ -0,0 +1,33 @@
+import pytest
+
+import server
+from benchmarks import loadtest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_harness_reports_every_journey(monkeypatch):
+    # The harness points the app at its own database; restore it afterwards
+    monkeypatch.setattr(server, "db", server.db)
+    args = loadtest.parse_args([
+        "--packages", "50", "--users", "5", "--bookings", "20", "--wishlist", "10",
+        "--concurrency", "4", "--duration", "0.5",
+    ])
+
+    summary = await loadtest.run(args)
+
+    assert summary["total"]["requests"] > 0
+    assert summary["total"]["errors"] == 0
+    for stats in summary["endpoints"].values():
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert summary["meta"]["config"]["packages"] == 50
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    baseline = {"endpoints": {"GET /home": {"p95_ms": 10.0, "throughput_rps": 100.0}}}
+    current = {"endpoints": {"GET /home": {"p95_ms": 13.0, "throughput_rps": 70.0}}}
+
+    regressions = loadtest.compare(current, baseline, threshold=0.2)
+
+    assert len(regressions) == 2
+    assert loadtest.compare(baseline, baseline, threshold=0.2) == []
@@ -0,0 +1,113 @@
+import itertools
+import logging
+import re
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import metrics
+import server
+
+pytestmark = pytest.mark.anyio
+
+_request_ids = itertools.count()
+
+
+def command_event(name, collection, **fields):
+    """What PyMongo hands a CommandListener for one command"""
+    return SimpleNamespace(
+        command_name=name, command={name: collection, **fields},
+        connection_id=("localhost", 27017), request_id=next(_request_ids), duration_micros=2500,
+    )
+
+
+def sample(text, name, **labels):
+    """Value of one sample line in a text exposition, or None"""
+    rendered = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = "^" + re.escape(name + ("{" + rendered + "}" if labels else "")) + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_query_shape_keeps_fields_and_drops_values():
+    spec = {"session_token": "secret", "expires_at": {"$gt": 1.5}, "$or": [{"id": {"$in": ["a", "b"]}}]}
+    assert metrics.query_shape(spec) == {
+        "session_token": "<str>", "expires_at": {"$gt": "<float>"}, "$or": [{"id": {"$in": ["<str>", "<str>"]}}],
+    }
+    assert metrics.query_shape([{"$match": {"user_id": "tester@example.com"}}, {"$limit": 5}]) == [
+        {"$match": {"user_id": "<str>"}}, {"$limit": "<int>"},
+    ]
+
+
+async def test_slow_authenticated_request_does_not_log_the_token(db, auth_headers, caplog):
+    listener = metrics.MongoCommandListener()
+
+    async def app(scope, receive, send):
+        # The session lookup as Motor reports it, then the real request
+        for event in (
+            command_event("find", "user_sessions", filter={"session_token": "test-session"}),
+            command_event("update", "user_sessions", updates=[{"q": {"session_token": "test-session"}, "u": {}}]),
+        ):
+            listener.started(event)
+            listener.succeeded(event)
+        await server.app(scope, receive, send)
+
+    transport = httpx.ASGITransport(app=metrics.MetricsMiddleware(app, slow_request_seconds=1e-9))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        with caplog.at_level(logging.WARNING, logger=metrics.logger.name):
+            response = await client.get("/api/auth/me", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert "Slow request GET" in caplog.text and "mongo_commands=2" in caplog.text
+    assert "find user_sessions" in caplog.text and "{'session_token': '<str>'}" in caplog.text
+    assert "test-session" not in caplog.text
+
+
+def test_registry_renders_the_text_exposition_format():
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter("jobs_total", "Jobs run", ["kind"]))
+    gauge = registry.register(metrics.Gauge("queue_depth", "Queued jobs"))
+    histogram = registry.register(metrics.Histogram("job_seconds", "Job time", ["kind"], buckets=(0.1, 1.0)))
+    counter.inc('say "hi"\n')
+    counter.inc('say "hi"\n', amount=2)
+    gauge.set(3)
+    for value in (0.05, 0.5, 7):
+        histogram.observe(value, "sync")
+
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Jobs run",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="say \\"hi\\"\\n"} 3.0',
+        "# HELP queue_depth Queued jobs",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+        "# HELP job_seconds Job time",
+        "# TYPE job_seconds histogram",
+        'job_seconds_bucket{kind="sync",le="0.1"} 1',
+        'job_seconds_bucket{kind="sync",le="1.0"} 2',
+        'job_seconds_bucket{kind="sync",le="+Inf"} 3',
+        'job_seconds_sum{kind="sync"} 7.55',
+        'job_seconds_count{kind="sync"} 3',
+    ]
+
+
+async def test_metrics_endpoint_counts_requests_by_route(api, package):
+    labels = {"method": "GET", "route": "/api/packages/{package_id}", "status": "200"}
+    before = (await api.get("/metrics")).text
+    for _ in range(2):
+        assert (await api.get(f"/api/packages/{package['id']}")).status_code == 200
+    response = await api.get("/metrics")
+
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert "# TYPE http_requests_total counter" in text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert sample(text, "http_requests_total", **labels) == (sample(before, "http_requests_total", **labels) or 0) + 2
+    latency = {"method": "GET", "route": "/api/packages/{package_id}"}
+    assert sample(text, "http_request_duration_seconds_count", **latency) == sample(
+        text, "http_request_duration_seconds_bucket", **latency, le="+Inf"
+    )
+    # The scrape itself is in flight while it renders
+    assert sample(text, "http_requests_in_flight") == 1
+    assert sample(text, "mongo_pool_connections", state="in_use") is not None
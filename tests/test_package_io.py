@@ -0,0 +1,163 @@
+import csv
+import io
+import json
+from datetime import date
+
+import pytest
+
+import package_io
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+IMPORT_FIELDS = (
+    "id", "name", "description", "price", "duration", "package_type", "departure_city", "departure_date",
+    "airline", "hotel", "hotel_rating", "facilities", "itinerary", "image_url",
+)
+CSV_HEADER = ",".join(IMPORT_FIELDS + ("availability",))
+# Imports parse departure_date; a window still open so the packages stay bookable
+DEPARTURE = f"Desember {date.today().year + 1}"
+
+
+def ndjson(*rows):
+    return "\n".join(json.dumps(row) for row in rows).encode()
+
+
+def import_row(**fields):
+    return {
+        **{field: PACKAGE[field] for field in IMPORT_FIELDS}, "departure_date": DEPARTURE, "availability": 10, **fields
+    }
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+async def test_reimport_keeps_live_stock_of_booked_package(api, db, book, admin_headers):
+    row = import_row()
+    response = await api.post("/api/packages/import?format=ndjson", content=ndjson(row), headers=admin_headers)
+    assert response.json()["inserted"] == 1
+    assert (await book(3)).status_code == 200
+
+    response = await api.post(
+        "/api/packages/import?format=ndjson", content=ndjson({**row, "price": 27000000, "availability": 10}),
+        headers=admin_headers
+    )
+
+    assert response.json()["updated"] == 1
+    package = await db.packages.find_one({"id": PACKAGE["id"]})
+    assert package["price"] == 27000000
+    # The 3 held seats stay taken; the import does not put them back on sale
+    assert package["availability"] == 7
+
+
+async def test_import_requires_an_admin(api, db, auth_headers):
+    body = ndjson(import_row())
+    assert (await api.post("/api/packages/import", content=body)).status_code == 401
+    assert (await api.post("/api/packages/import", content=body, headers=auth_headers)).status_code == 403
+    assert await db.packages.count_documents({}) == 0
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+async def test_csv_records_survive_any_chunking(size):
+    data = (
+        "\ufeffid,name,facilities\r\n"
+        'pkg-1,"Umrah ""Plus""",Visa|Hotel | \n'
+        "\n"
+        'pkg-2,"Two\nlines",\n'
+        "pkg-3,short\n"
+        'pkg-4,"never closed\n'
+    ).encode()
+
+    rows = await collect(package_io.iter_csv_rows(chunked(data, size), list_fields=["facilities"]))
+
+    assert rows == [
+        (1, {"id": "pkg-1", "name": 'Umrah "Plus"', "facilities": ["Visa", "Hotel"]}),
+        (2, {"id": "pkg-2", "name": "Two\nlines", "facilities": []}),
+        (3, "Expected 3 columns, got 2"),
+        (4, "Unterminated quoted field"),
+    ]
+
+
+async def test_csv_without_a_header_is_a_400(api, admin_headers):
+    response = await api.post("/api/packages/import?format=csv", content=b",,\n", headers=admin_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "CSV header row is missing"
+
+
+async def test_bad_rows_are_reported_and_the_rest_imported(api, db, admin_headers):
+    body = b"\n".join([
+        json.dumps(import_row(id="good-1")).encode(),
+        b"{not json",
+        json.dumps(import_row(id="bad-price", price="lots")).encode(),
+        b"[1, 2]",
+        b"",
+        json.dumps(import_row(id="good-2")).encode(),
+    ])
+
+    response = await api.post("/api/packages/import", content=body, headers=admin_headers)
+
+    report = response.json()
+    assert response.status_code == 200
+    assert (report["processed"], report["inserted"], report["updated"], report["failed"]) == (5, 2, 0, 3)
+    assert [error["row"] for error in report["errors"]] == [2, 3, 4]
+    assert report["errors"][0]["error"].startswith("Invalid JSON")
+    assert report["errors"][1]["error"] == [
+        "price: Input should be a valid integer, unable to parse string as an integer"
+    ]
+    assert report["errors"][2]["error"] == "Expected an object"
+    assert sorted(await db.packages.distinct("id")) == ["good-1", "good-2"]
+
+
+async def test_csv_import_by_content_type(api, db, admin_headers):
+    values = [*(PACKAGE[field] for field in IMPORT_FIELDS), 12]
+    values[IMPORT_FIELDS.index("facilities")] = "Visa|Hotel"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER.split(","))
+    writer.writerow(values)
+    writer.writerow([*values[:-1], "twelve"])
+
+    response = await api.post(
+        "/api/packages/import", content=buffer.getvalue().encode(),
+        headers={**admin_headers, "Content-Type": "text/csv"}
+    )
+
+    report = response.json()
+    assert (report["inserted"], report["failed"]) == (1, 1)
+    assert report["errors"][0]["row"] == 2
+    package = await db.packages.find_one({"id": PACKAGE["id"]})
+    assert package["facilities"] == ["Visa", "Hotel"] and package["availability"] == 12
+    assert package["saved_count"] == 0 and package["departure_start"] is not None
+
+
+async def test_export_round_trips_through_import(api, db, admin_headers):
+    await db.packages.insert_many([
+        {**PACKAGE, "id": f"pkg-{i}", "availability": 5, "facilities": ["Visa", "Hotel"], "itinerary": [f"Day {i}"]}
+        for i in range(3)
+    ])
+
+    exported = await api.get("/api/packages/export")
+    assert exported.headers["Content-Type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in exported.text.splitlines()]
+    assert [row["id"] for row in rows] == ["pkg-0", "pkg-1", "pkg-2"]
+    assert rows[1]["facilities"] == ["Visa", "Hotel"] and rows[1]["itinerary"] == ["Day 1"]
+
+    exported_csv = await api.get("/api/packages/export", params={"format": "csv"})
+    assert exported_csv.headers["Content-Disposition"] == 'attachment; filename="packages.csv"'
+    records = list(csv.DictReader(io.StringIO(exported_csv.text)))
+    assert [record["id"] for record in records] == ["pkg-0", "pkg-1", "pkg-2"]
+    assert records[0]["facilities"] == "Visa|Hotel"
+
+    # Either file imports back as updates to the same packages
+    for fmt, body in (("ndjson", exported.content), ("csv", exported_csv.content)):
+        response = await api.post(f"/api/packages/import?format={fmt}", content=body, headers=admin_headers)
+        assert response.json() == {
+            "processed": 3, "inserted": 0, "updated": 3, "failed": 0, "errors": [],
+        }
+    assert (await db.packages.find_one({"id": "pkg-2"}))["itinerary"] == ["Day 2"]
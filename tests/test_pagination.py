@@ -0,0 +1,115 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from pagination import InvalidCursorError, decode_cursor, encode_cursor
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+CREATED = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+@pytest.fixture
+async def catalog(db):
+    # The last four share a created_at, so the id tie-breaker decides their order
+    docs = [
+        {**PACKAGE, "id": f"pkg-{i}", "availability": 5, "created_at": CREATED + timedelta(minutes=min(i, 3))}
+        for i in range(7)
+    ]
+    await db.packages.insert_many(docs)
+    return [doc["id"] for doc in docs]
+
+
+async def walk(api, path, limit, headers=None, **params):
+    pages, cursor = [], None
+    while True:
+        response = await api.get(
+            path, params={**params, "limit": limit, **({"cursor": cursor} if cursor else {})}, headers=headers
+        )
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get(server.NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+
+
+def test_cursor_round_trips_sort_values():
+    sort = server.PACKAGE_SORT
+    cursor = encode_cursor({"created_at": CREATED, "id": "pkg-3", "name": "ignored"}, sort)
+    assert decode_cursor(cursor, sort) == [CREATED, "pkg-3"]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 at all!",
+    raw_cursor(["only one value"]),
+    raw_cursor({"created_at": 1, "id": "pkg-3"}),
+    raw_cursor([{"$date": "yesterday"}, "pkg-3"]),
+    base64.urlsafe_b64encode(b"[1, 2").decode(),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, server.PACKAGE_SORT)
+
+
+async def test_pages_cover_the_catalog_once_in_order(api, catalog):
+    pages = await walk(api, "/api/packages", limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == catalog
+    # Card rows carry only the card fields
+    cards = (await api.get("/api/packages", params={"view": "card", "limit": 1})).json()
+    assert set(cards[0]) == set(server.PackageCard.model_fields)
+
+
+async def test_tampered_cursor_is_a_400(api, catalog):
+    cursor = (await api.get("/api/packages", params={"limit": 2})).headers[server.NEXT_CURSOR_HEADER]
+
+    assert (await api.get("/api/packages", params={"cursor": cursor[:-4] + "!!!!"})).status_code == 400
+    assert (await api.get("/api/packages", params={"cursor": raw_cursor([1])})).status_code == 400
+    # A well-formed cursor with other values is just another position
+    shifted = encode_cursor({"created_at": CREATED + timedelta(minutes=3), "id": "pkg-3"}, server.PACKAGE_SORT)
+    response = await api.get("/api/packages", params={"cursor": shifted})
+    assert [row["id"] for row in response.json()] == ["pkg-4", "pkg-5", "pkg-6"]
+
+
+async def test_bookings_page_newest_first(api, db, auth_headers):
+    await db.bookings.insert_many([
+        {
+            "id": f"booking-{i}", "user_id": "tester@example.com", "package_id": PACKAGE["id"],
+            "customer_name": "Jamaah", "customer_email": "jamaah@example.com", "customer_phone": "0812",
+            "num_passengers": 1, "total_price": PACKAGE["price"], "payment_status": "pending",
+            "booking_status": "held", "created_at": CREATED + timedelta(minutes=i),
+        }
+        for i in range(5)
+    ])
+
+    pages = await walk(api, "/api/bookings", limit=2, headers=auth_headers)
+
+    assert pages == [["booking-4", "booking-3"], ["booking-2", "booking-1"], ["booking-0"]]
+    response = await api.get("/api/bookings", params={"cursor": "%%%"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+async def test_popular_pages_reach_packages_stored_without_a_count(api, db):
+    counts = {"pkg-0": 3, "pkg-1": 1, "pkg-2": 1, "pkg-3": 0, "pkg-4": None, "pkg-5": "missing"}
+    docs = []
+    for package_id, count in counts.items():
+        doc = {**PACKAGE, "id": package_id, "availability": 5}
+        if count != "missing":
+            doc["saved_count"] = count
+        docs.append(doc)
+    await db.packages.insert_many(docs)
+
+    await server.backfill_saved_counts()
+    pages = await walk(api, "/api/packages", limit=2, sort="popular")
+
+    assert pages == [["pkg-0", "pkg-1"], ["pkg-2", "pkg-3"], ["pkg-4", "pkg-5"]]
+    assert await db.packages.count_documents({"saved_count": 0}) == 3
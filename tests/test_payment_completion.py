@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+import inventory
+import payment_completion
+import reports
+
+pytestmark = pytest.mark.anyio
+
+
+async def book_and_pay(api, book, auth_headers, seats=2):
+    booking = (await book(seats)).json()
+    payment = (await api.post("/api/payments", json={
+        "booking_id": booking["id"], "payment_method": "bank_transfer"
+    }, headers=auth_headers)).json()
+    return booking, payment
+
+
+async def test_completion_confirms_booking_and_payment_together(api, db, auth_headers, package, book):
+    booking, payment = await book_and_pay(api, book, auth_headers)
+
+    response = await api.post(f"/api/payments/{payment['id']}/complete", headers=auth_headers)
+    assert response.status_code == 200
+    # A retry is a no-op rather than an error
+    response = await api.post(f"/api/payments/{payment['id']}/complete", headers=auth_headers)
+    assert response.status_code == 200
+
+    stored = await db.bookings.find_one({"id": booking["id"]})
+    assert stored["booking_status"] == inventory.CONFIRMED
+    assert stored["payment_status"] == payment_completion.COMPLETED
+    assert "hold_expires_at" not in stored
+    assert (await db.payments.find_one({"id": payment["id"]}))["payment_status"] == payment_completion.COMPLETED
+
+
+async def test_transaction_mode_completes_both_writes(api, db, auth_headers, package, book):
+    if not await payment_completion.supports_transactions(db.client):
+        pytest.skip("needs a replica set (TEST_MONGO_URL)")
+    booking, payment = await book_and_pay(api, book, auth_headers)
+
+    await payment_completion.complete_payment(db, "tester@example.com", payment["id"], mode="on")
+
+    assert (await db.bookings.find_one({"id": booking["id"]}))["booking_status"] == inventory.CONFIRMED
+    assert (await db.payments.find_one({"id": payment["id"]}))["payment_status"] == payment_completion.COMPLETED
+
+
+async def test_fallback_retries_and_finishes_a_partial_completion(api, db, auth_headers, package, book):
+    booking, payment = await book_and_pay(api, book, auth_headers)
+    # A previous attempt confirmed the booking, then lost the connection before the payment write
+    await db.bookings.update_one({"id": booking["id"]}, payment_completion._CONFIRM_BOOKING)
+    attempts = []
+
+    async def flaky(session):
+        attempts.append(session)
+        if len(attempts) == 1:
+            raise AutoReconnect("connection reset")
+        return "done"
+
+    assert await payment_completion.run_atomically(db, flaky, mode="off", backoff=0) == "done"
+    assert attempts == [None, None]
+
+    await payment_completion.complete_payment(db, "tester@example.com", payment["id"], mode="off")
+    assert (await db.payments.find_one({"id": payment["id"]}))["payment_status"] == payment_completion.COMPLETED
+
+
+async def test_batch_completion_reports_each_outcome(api, db, auth_headers, package, book):
+    _, paid = await book_and_pay(api, book, auth_headers)
+    _, already = await book_and_pay(api, book, auth_headers)
+    lapsed_booking, lapsed = await book_and_pay(api, book, auth_headers)
+    await api.post(f"/api/payments/{already['id']}/complete", headers=auth_headers)
+    await db.bookings.update_one(
+        {"id": lapsed_booking["id"]},
+        {"$set": {"hold_expires_at": datetime.now(timezone.utc) - timedelta(minutes=1)}}
+    )
+
+    response = await api.post("/api/payments/complete-batch", json={
+        "payment_ids": [paid["id"], already["id"], lapsed["id"], "missing", paid["id"]]
+    }, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "results": {
+            paid["id"]: payment_completion.COMPLETED,
+            already["id"]: payment_completion.COMPLETED,
+            lapsed["id"]: payment_completion.HOLD_EXPIRED,
+            "missing": payment_completion.NOT_FOUND,
+        },
+        "completed": 2,
+    }
+    assert (await db.payments.find_one({"id": paid["id"]}))["payment_status"] == payment_completion.COMPLETED
+    assert (await db.payments.find_one({"id": lapsed["id"]}))["payment_status"] == "pending"
+    assert (await db.bookings.find_one({"id": lapsed_booking["id"]}))["booking_status"] == inventory.HELD
+
+
+class RacingPayments:
+    """The payments collection, letting another completion run just before the batch's update_many"""
+
+    def __init__(self, collection, before_update):
+        self._collection = collection
+        self._before_update = before_update
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def update_many(self, *args, **kwargs):
+        await self._before_update()
+        return await self._collection.update_many(*args, **kwargs)
+
+
+class RacingDb:
+    def __init__(self, db, before_update):
+        self._db = db
+        self.payments = RacingPayments(db.payments, before_update)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+
+async def test_batch_racing_a_single_completion_counts_the_payment_once(api, db, auth_headers, package, book):
+    _, raced = await book_and_pay(api, book, auth_headers)
+    _, other = await book_and_pay(api, book, auth_headers)
+    notified = []
+
+    async def on_completed(completed):
+        notified.extend(payment["payment_id"] for payment in completed)
+
+    async def single_completion_wins():
+        await payment_completion.complete_payment(
+            db, "tester@example.com", raced["id"], mode="off", on_completed=on_completed
+        )
+
+    results = await payment_completion.complete_payments(
+        RacingDb(db, single_completion_wins), "tester@example.com", [raced["id"], other["id"]],
+        mode="off", on_completed=on_completed,
+    )
+
+    assert results == {raced["id"]: payment_completion.COMPLETED, other["id"]: payment_completion.COMPLETED}
+    assert sorted(notified) == sorted([raced["id"], other["id"]])
+    revenue = await db[reports.REVENUE_STATS].find_one({"payment_method": "bank_transfer"})
+    assert revenue["payments"] == 2
+    assert revenue["revenue"] == raced["amount"] + other["amount"]
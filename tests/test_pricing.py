@@ -0,0 +1,172 @@
+from datetime import date
+
+import pytest
+
+import pricing
+import server
+from tests.conftest import PACKAGE, booking_payload
+
+pytestmark = pytest.mark.anyio
+
+# Next year's Ramadan season, so every requested date is still bookable
+YEAR = date.today().year + 1
+WINDOW = {"departure_start": f"{YEAR}-01-01", "departure_end": f"{YEAR}-07-01"}
+RULES = {
+    "room_types": {"Quad": 0, "Triple": 2000000, "Double": 5000000},
+    "child_rate": 0.75,
+    "infant_rate": 0.1,
+    "seasons": [{"name": "Ramadan", "start": f"{YEAR}-02-15", "end": f"{YEAR}-03-20", "surcharge_percent": 10}],
+}
+
+
+async def test_batch_quotes_price_the_booking(api, db, auth_headers, admin_headers):
+    await db.packages.insert_one({**PACKAGE, **WINDOW, "availability": 50})
+    await db.packages.insert_one({**PACKAGE, "id": "plain-umrah", "price": 20000000, "availability": 50})
+    response = await api.put(f"/api/packages/{PACKAGE['id']}/pricing", json=RULES, headers=admin_headers)
+    assert response.status_code == 200
+    response = await api.post("/api/admin/promo-codes", json={
+        "code": "hemat10", "percent_off": 10, "max_discount": 3000000, "package_ids": [PACKAGE["id"]],
+    }, headers=admin_headers)
+    assert response.status_code == 200
+
+    items = [
+        {"package_id": PACKAGE["id"], "adults": 2, "children": 1, "infants": 1,
+         "room_type": "Double Room", "promo_code": "HEMAT10", "departure_date": f"{YEAR}-03-01"},
+        {"package_id": PACKAGE["id"], "adults": 2, "departure_date": f"{YEAR}-05-01"},
+        {"package_id": "plain-umrah", "adults": 3},
+        {"package_id": "plain-umrah", "adults": 1, "promo_code": "HEMAT10"},
+        {"package_id": PACKAGE["id"], "adults": 1, "room_type": "Suite"},
+        {"package_id": "missing", "adults": 1},
+    ]
+    response = await api.post("/api/quotes/batch", json={"items": items})
+    assert response.status_code == 200
+    quotes = response.json()["quotes"]
+
+    # Ramadan: (25M + 5M double) * 1.1 per adult, children at 75%, infants at 10% of base
+    assert quotes[0]["per_adult"] == 33000000
+    assert quotes[0]["per_child"] == 24750000
+    assert quotes[0]["per_infant"] == 2500000
+    assert quotes[0]["subtotal"] == 2 * 33000000 + 24750000 + 2500000
+    assert quotes[0]["discount"] == 3000000
+    assert quotes[0]["room_type"] == "double"
+    # Off season, cheapest room by default
+    assert quotes[1]["total"] == 2 * 25000000 and quotes[1]["room_type"] == "quad"
+    # No rules: base price per passenger
+    assert quotes[2]["total"] == 3 * 20000000
+    assert [quote.get("error") for quote in quotes[3:]] == [
+        pricing.PROMO_CODE_NOT_APPLICABLE, pricing.ROOM_TYPE_UNAVAILABLE, pricing.PACKAGE_NOT_FOUND,
+    ]
+
+    payload = {
+        **booking_payload(4), "children": 1, "infants": 1,
+        "room_type": "double", "promo_code": "hemat10", "departure_date": f"{YEAR}-03-01",
+    }
+    response = await api.post("/api/bookings", json=payload, headers=auth_headers)
+    assert response.status_code == 200
+    booking = response.json()
+    assert booking["total_price"] == quotes[0]["total"]
+    assert booking["discount"] == 3000000 and booking["promo_code"] == "HEMAT10"
+    assert booking["departure_date"] == f"{YEAR}-03-01"
+    assert (await db.bookings.find_one({"id": booking["id"]}))["departure_date"] == f"{YEAR}-03-01"
+
+    # Outside the departure window: refused, so the Ramadan surcharge cannot be dodged
+    response = await api.post(
+        "/api/bookings", json={**payload, "departure_date": f"{YEAR}-08-01"}, headers=auth_headers
+    )
+    assert response.status_code == 400
+
+    # A promo that does not apply is refused before any seat is held
+    response = await api.post(
+        "/api/bookings", json={**booking_payload(1), "package_id": "plain-umrah", "promo_code": "HEMAT10"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert (await db.packages.find_one({"id": "plain-umrah"}))["availability"] == 50
+
+
+async def test_quotes_are_memoized_per_rule_version():
+    engine = pricing.PricingEngine()
+    engine.build([{**PACKAGE, "pricing": RULES}], [], version=1)
+    requests = [
+        pricing.QuoteRequest(PACKAGE["id"], adults, children) for adults in range(1, 5) for children in range(3)
+    ]
+    today = date(2026, 1, 10)
+
+    first = engine.quote(requests, today)
+    assert engine.stats()["misses"] == len(requests)
+    assert engine.quote(requests, today) == first
+    assert engine.stats()["hits"] == len(requests)
+    # Passengers without rules or a season cost the base price each (Quad adds nothing)
+    assert first[0]["total"] == PACKAGE["price"]
+    assert first[-1]["total"] == 4 * PACKAGE["price"] + 2 * int(PACKAGE["price"] * 0.75)
+
+    engine.build([{**PACKAGE, "price": 30000000}], [], version=2)
+    assert engine.quote(requests[:1], today)[0]["total"] == 30000000
+    assert engine.stats()["misses"] == len(requests) + 1
+
+
+async def test_pricing_rules_require_an_admin(api, db, auth_headers):
+    await db.packages.insert_one({**PACKAGE, "availability": 50})
+    promo = {"code": "hemat10", "percent_off": 10}
+
+    for headers, status in [({}, 401), (auth_headers, 403)]:
+        response = await api.put(f"/api/packages/{PACKAGE['id']}/pricing", json=RULES, headers=headers)
+        assert response.status_code == status
+        response = await api.post("/api/admin/promo-codes", json=promo, headers=headers)
+        assert response.status_code == status
+    assert await db.promo_codes.count_documents({}) == 0
+
+
+@pytest.mark.parametrize("requested, error", [
+    (None, None),
+    (date(2026, 4, 1), None),
+    (date(2026, 3, 10), None),
+    (date(2026, 3, 9), pricing.DEPARTURE_UNAVAILABLE),  # past
+    (date(2026, 7, 1), pricing.DEPARTURE_UNAVAILABLE),  # window end is exclusive
+    (date(2025, 12, 31), pricing.DEPARTURE_UNAVAILABLE),
+])
+def test_departure_date_must_be_upcoming_and_in_window(requested, error):
+    engine = pricing.PricingEngine()
+    engine.build([{**PACKAGE, "departure_start": "2026-01-01", "departure_end": "2026-07-01"}], [], version=1)
+
+    quote = engine.quote([pricing.QuoteRequest(PACKAGE["id"], 1, departure_date=requested)], date(2026, 3, 10))[0]
+
+    assert quote.get("error") == error
+
+
+async def test_booking_without_a_date_is_refused_once_the_window_ended(api, db, book):
+    ended = {"departure_start": f"{YEAR - 2}-01-01", "departure_end": f"{YEAR - 2}-07-01"}
+    await db.packages.insert_one({**PACKAGE, **ended, "availability": 10})
+
+    quote = (await api.post("/api/quotes/batch", json={"items": [{"package_id": PACKAGE["id"], "adults": 1}]})).json()
+    assert quote["quotes"][0]["error"] == pricing.DEPARTURE_UNAVAILABLE
+    response = await book(2)
+    assert response.status_code == 400
+    assert (await db.packages.find_one({"id": PACKAGE["id"]}))["availability"] == 10
+
+
+async def test_pricing_writes_leave_cached_catalog_pages_alone(api, db, admin_headers, monkeypatch):
+    monkeypatch.setattr(server.catalog_cache, "check_interval", 0)
+    monkeypatch.setattr(server.pricing_version, "check_interval", 0)
+    await db.packages.insert_one({**PACKAGE, **WINDOW, "availability": 50})
+    etag = (await api.get("/api/packages")).headers["ETag"]
+    item = {"package_id": PACKAGE["id"], "adults": 1, "room_type": "double", "departure_date": f"{YEAR}-05-01"}
+    assert (await api.post("/api/quotes/batch", json={"items": [item]})).json()["quotes"][0]["error"] == (
+        pricing.ROOM_TYPE_UNAVAILABLE
+    )
+
+    await api.put(f"/api/packages/{PACKAGE['id']}/pricing", json=RULES, headers=admin_headers)
+    await api.post("/api/admin/promo-codes", json={"code": "hemat10", "amount_off": 1000000}, headers=admin_headers)
+
+    assert (await api.get("/api/packages", headers={"If-None-Match": etag})).status_code == 304
+    quote = (await api.post("/api/quotes/batch", json={"items": [{**item, "promo_code": "hemat10"}]})).json()
+    assert quote["quotes"][0]["total"] == PACKAGE["price"] + 5000000 - 1000000
+    assert quote["version"] == [server.catalog_cache.version, 2]
+
+
+async def test_pricing_engine_stats_require_an_admin(api, db, auth_headers, admin_headers):
+    assert (await api.get("/api/admin/pricing-engine")).status_code == 401
+    assert (await api.get("/api/admin/pricing-engine", headers=auth_headers)).status_code == 403
+    response = await api.get("/api/admin/pricing-engine", headers=admin_headers)
+    assert response.status_code == 200
+    assert {"packages", "hits", "misses"} <= response.json().keys()
@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+import pytest
+
+from load_shedding import LoadSheddingMiddleware
+from rate_limit import Limit, MemoryBackend, MongoBackend, RateLimitMiddleware, Rule
+
+pytestmark = pytest.mark.anyio
+
+RULES = [Rule("POST", "/api/bookings", Limit(3, 60))]
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def client_for(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+SESSIONS = {"a": "user-a", "b": "user-b"}
+
+
+async def identify(token):
+    return SESSIONS.get(token)
+
+
+async def test_route_budget_is_enforced_per_user():
+    app = RateLimitMiddleware(ok_app, rules=RULES, default=Limit(100, 60), identify=identify)
+    async with client_for(app) as api:
+        statuses = [(await api.post("/api/bookings", headers=bearer("a"))).status_code for _ in range(4)]
+        assert statuses == [200, 200, 200, 429]
+
+        refused = await api.post("/api/bookings", headers=bearer("a"))
+        assert refused.status_code == 429
+        assert int(refused.headers["Retry-After"]) >= 1
+
+        # Other users and other routes have their own buckets
+        assert (await api.post("/api/bookings", headers=bearer("b"))).status_code == 200
+        assert (await api.get("/api/packages", headers=bearer("a"))).status_code == 200
+
+
+async def test_unverified_tokens_share_the_client_ip_bucket():
+    rules = [*RULES, Rule("POST", "/api/seed", Limit(2, 60), by_ip=True)]
+    app = RateLimitMiddleware(ok_app, rules=rules, identify=identify)
+    async with client_for(app) as api:
+        # A made-up token per request does not mint a fresh bucket
+        statuses = [(await api.post("/api/bookings", headers=bearer(f"fake-{i}"))).status_code for i in range(5)]
+        assert statuses == [200, 200, 200, 429, 429]
+        assert (await api.post("/api/bookings", headers=bearer("a"))).status_code == 200
+
+        # Routes usable without login are budgeted per IP even for live sessions
+        statuses = [(await api.post("/api/seed", headers=bearer(token))).status_code for token in ("a", "b", "x")]
+        assert statuses == [200, 200, 429]
+
+
+async def test_bucket_refills_over_time():
+    app = RateLimitMiddleware(ok_app, rules=[Rule("POST", "/api/seed", Limit(1, 0.2))])
+    async with client_for(app) as api:
+        assert (await api.post("/api/seed")).status_code == 200
+        assert (await api.post("/api/seed")).status_code == 429
+        await asyncio.sleep(0.25)
+        assert (await api.post("/api/seed")).status_code == 200
+
+
+async def test_mongo_backend_shares_budget_between_workers(db):
+    backend = MongoBackend(db)
+    workers = [RateLimitMiddleware(ok_app, rules=RULES, backend=backend) for _ in range(2)]
+    statuses = []
+    for i in range(4):
+        async with client_for(workers[i % 2]) as api:
+            statuses.append((await api.post("/api/bookings", headers=bearer("shared"))).status_code)
+    assert statuses == [200, 200, 200, 429]
+
+
+async def test_memory_backend_evicts_least_recent_keys():
+    backend = MemoryBackend(maxsize=2)
+    for key in ("a", "b", "c"):
+        await backend.take(key, Limit(1, 60))
+    assert list(backend._buckets) == ["b", "c"]
+
+
+async def test_load_is_shed_when_in_flight_limit_is_reached():
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await ok_app(scope, receive, send)
+
+    app = LoadSheddingMiddleware(slow_app, max_in_flight=2)
+    async with client_for(app) as api:
+        admitted = [asyncio.create_task(api.get("/api/packages")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        shed = await api.get("/api/packages")
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "1"
+        release.set()
+        assert [r.status_code for r in await asyncio.gather(*admitted)] == [200, 200]
+        assert (await api.get("/api/packages")).status_code == 200
+
+
+async def test_load_is_shed_when_mongo_pool_queue_is_long():
+    waiters = {"count": 0}
+    app = LoadSheddingMiddleware(ok_app, max_pool_waiters=5, pool_waiters=lambda: waiters["count"])
+    async with client_for(app) as api:
+        assert (await api.get("/api/packages")).status_code == 200
+        waiters["count"] = 6
+        assert (await api.get("/api/packages")).status_code == 503
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import inventory
+import reports
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+REPORT_ROUTES = [
+    ("GET", "/api/admin/reports/packages"),
+    ("GET", "/api/admin/reports/revenue"),
+    ("POST", "/api/admin/reports/rebuild"),
+    ("GET", "/api/admin/reports/bookings.csv"),
+]
+
+
+@pytest.mark.parametrize("method, path", REPORT_ROUTES)
+async def test_reports_require_an_admin(api, auth_headers, admin_headers, method, path):
+    assert (await api.request(method, path)).status_code == 401
+    assert (await api.request(method, path, headers=auth_headers)).status_code == 403
+    assert (await api.request(method, path, headers=admin_headers)).status_code == 200
+
+
+async def test_booking_export_streams_customer_rows_to_admins(api, package, book, admin_headers):
+    await book(2)
+
+    response = await api.get("/api/admin/reports/bookings.csv", headers=admin_headers)
+
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert len(lines) == 2
+    assert "jamaah@example.com" in lines[1]
+
+
+async def rollups(db):
+    return (
+        await db[reports.PACKAGE_STATS].find().sort("_id", 1).to_list(None),
+        await db[reports.REVENUE_STATS].find().sort("_id", 1).to_list(None),
+    )
+
+
+async def test_incremental_rollups_match_a_rebuild(api, db, auth_headers, package, book):
+    await db.packages.insert_one({**PACKAGE, "id": "second-umrah", "availability": 10})
+    paid_by_card = (await book(2)).json()
+    paid_in_batch = (await book(3, package_id="second-umrah")).json()
+    lapsed = (await book(4)).json()
+    payments = []
+    for booking, method in ((paid_by_card, "credit_card"), (paid_in_batch, "bank_transfer")):
+        payments.append((await api.post("/api/payments", json={
+            "booking_id": booking["id"], "payment_method": method
+        }, headers=auth_headers)).json())
+    await api.post(f"/api/payments/{payments[0]['id']}/complete", headers=auth_headers)
+    await api.post("/api/payments/complete-batch", json={"payment_ids": [payments[1]["id"]]}, headers=auth_headers)
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+    assert await inventory.release_expired_holds(db, now=tomorrow) == {"bookings": 1, "seats": 4}
+
+    incremental = await rollups(db)
+
+    today, price = reports.day_key(), PACKAGE["price"]
+    assert [{k: v for k, v in doc.items() if k != "_id"} for doc in incremental[0]] == [
+        {"day": today, "package_id": PACKAGE["id"], "bookings": 2, "seats_booked": 6, "booked_value": 6 * price,
+         "seats_confirmed": 2, "confirmed_value": 2 * price},
+        {"day": today, "package_id": "second-umrah", "bookings": 1, "seats_booked": 3, "booked_value": 3 * price,
+         "seats_confirmed": 3, "confirmed_value": 3 * price},
+        {"day": reports.day_key(tomorrow), "package_id": PACKAGE["id"], "seats_released": 4},
+    ]
+    assert [(doc["payment_method"], doc["payments"], doc["revenue"]) for doc in incremental[1]] == [
+        ("bank_transfer", 1, 3 * price), ("credit_card", 1, 2 * price),
+    ]
+
+    assert await reports.rebuild_rollups(db) == {"package_days": 3, "revenue_days": 2}
+    # A rebuild writes every counter; the live path only those it has incremented
+    rebuilt = await rollups(db)
+    assert rebuilt[1] == incremental[1]
+    assert rebuilt[0] == [{**dict.fromkeys(reports.PACKAGE_COUNTERS, 0), **doc} for doc in incremental[0]]
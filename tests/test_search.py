@@ -0,0 +1,95 @@
+import pytest
+
+import server
+from search_index import SearchIndex
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+CATALOG = [
+    {"id": "umrah-jkt", "name": "Umrah Reguler", "package_type": "umrah", "departure_city": "Jakarta",
+     "airline": "Saudia Airlines", "hotel": "Hotel Bintang 4", "hotel_rating": 4, "price": 25000000,
+     "description": "Umrah 9 hari", "facilities": ["Visa", "Makan 3x"]},
+    {"id": "umrah-sby", "name": "Umrah Plus Turki", "package_type": "umrah", "departure_city": "Surabaya",
+     "airline": "Turkish Airlines", "hotel": "Hotel Bintang 5", "hotel_rating": 5, "price": 35000000,
+     "description": "Umrah dan wisata Istanbul", "facilities": ["Visa"]},
+    {"id": "haji-jkt", "name": "Haji Plus", "package_type": "haji", "departure_city": "Jakarta",
+     "airline": "Garuda Indonesia", "hotel": "Hotel Bintang 5", "hotel_rating": 5, "price": 150000000,
+     "description": "Haji khusus, dekat Masjidil Haram", "facilities": ["Visa", "Umrah sunnah"]},
+    {"id": "tour-jkt", "name": "Wisata Halal Jepang", "package_type": "tour", "departure_city": "Jakarta",
+     "airline": "Garuda Indonesia", "hotel": "Hotel Bintang 3", "hotel_rating": 3, "price": 4000000,
+     "description": "Tokyo dan Osaka", "facilities": []},
+]
+
+
+@pytest.fixture
+def index():
+    search_index = SearchIndex()
+    search_index.build(CATALOG, version=1)
+    return search_index
+
+
+def facet(found, field):
+    return {row["value"]: row["count"] for row in found["facets"][field]}
+
+
+def test_name_matches_outrank_description_matches(index):
+    found = index.search("umrah")
+    # Name and type hits beat a single facility mention
+    assert set(found["ids"][:2]) == {"umrah-jkt", "umrah-sby"}
+    assert found["ids"][-1] == "haji-jkt"
+    assert found["scores"]["umrah-jkt"] > found["scores"]["haji-jkt"]
+
+
+def test_every_term_must_match_by_prefix(index):
+    assert index.search("umr turk")["ids"] == ["umrah-sby"]
+    assert index.search("bint 5")["total"] == 2
+    assert index.search("umrah jepang")["total"] == 0
+    # Accents and stopwords are ignored
+    assert index.search("Wisatá dan Jepang")["ids"] == ["tour-jkt"]
+
+
+def test_facets_count_the_matches_not_the_page(index):
+    found = index.search("", limit=1)
+    assert found["total"] == 4 and len(found["ids"]) == 1
+    assert facet(found, "departure_city") == {"Jakarta": 3, "Surabaya": 1}
+    assert facet(found, "price") == {"< 5 jt": 1, "15 - 30 jt": 1, ">= 30 jt": 2}
+
+    found = index.search("hotel", filters={"departure_city": "Jakarta"})
+    assert found["total"] == 3
+    assert facet(found, "package_type") == {"haji": 1, "tour": 1, "umrah": 1}
+    assert facet(found, "hotel_rating") == {3: 1, 4: 1, 5: 1}
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"package_type": "umrah"}, {"umrah-jkt", "umrah-sby"}),
+    ({"package_type": "umrah", "departure_city": "Jakarta"}, {"umrah-jkt"}),
+    ({"airline": "Garuda Indonesia", "hotel_rating": 5}, {"haji-jkt"}),
+    ({"min_price": 5000000, "max_price": 35000000}, {"umrah-jkt", "umrah-sby"}),
+    ({"departure_city": "Jakarta", "max_price": 30000000}, {"umrah-jkt", "tour-jkt"}),
+    ({"package_type": "haji", "max_price": 100000000}, set()),
+])
+def test_filter_combinations(index, filters, expected):
+    found = index.search("", filters=filters)
+    assert set(found["ids"]) == expected
+    assert found["total"] == len(expected)
+
+
+def test_added_package_updates_results_and_facets(index):
+    index.add({**CATALOG[0], "id": "umrah-mdn", "departure_city": "Medan"}, version=2)
+    found = index.search("umrah reguler")
+    assert set(found["ids"]) == {"umrah-jkt", "umrah-mdn"}
+    assert facet(index.search(""), "departure_city")["Medan"] == 1
+
+
+async def test_search_endpoint_returns_ranked_cards(api, db):
+    await db.packages.insert_many([{**PACKAGE, **package, "availability": 5} for package in CATALOG])
+    await server.catalog_cache.bump(db)
+
+    response = await api.get("/api/packages/search", params={"q": "umrah", "departure_city": "Jakarta"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [card["id"] for card in body["results"]] == ["umrah-jkt", "haji-jkt"]
+    assert body["total"] == 2
+    assert {row["value"]: row["count"] for row in body["facets"]["package_type"]} == {"haji": 1, "umrah": 1}
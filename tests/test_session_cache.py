@@ -0,0 +1,86 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from session_cache import SessionCache
+
+pytestmark = pytest.mark.anyio
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = SessionCache(maxsize=2, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", "user-a")
+    cache.set("b", "user-b")
+    assert cache.get("a") == "user-a"
+    # "b" is now least recently used
+    cache.set("c", "user-c")
+    assert cache.get("b") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (1, 2, 1, 2)
+
+
+def test_entries_expire_with_the_ttl_or_the_session():
+    cache = SessionCache(ttl=0.05)
+    cache.set("short", "user")
+    assert cache.get("short") == "user"
+
+    # A session that has already ended is never cached; a naive expiry is read as UTC
+    cache.set("ended", "user", datetime.now(timezone.utc) - timedelta(seconds=1))
+    cache.set("naive", "user", datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=1))
+    assert cache.get("ended") is None
+    assert cache.get("naive") == "user"
+
+    cache.ttl = 60
+    cache.set("session-bound", "user", datetime.now(timezone.utc) + timedelta(seconds=0.05))
+    time.sleep(0.06)
+    assert cache.get("short") is None
+    assert cache.get("session-bound") is None
+
+
+def test_invalidated_token_cannot_be_cached_again_until_its_tombstone_lapses():
+    cache = SessionCache(ttl=60, tombstone_ttl=0.05)
+    cache.set("token", "user")
+    cache.invalidate("token")
+    assert cache.get("token") is None
+
+    # A lookup that read the session before the logout finishes afterwards
+    cache.set("token", "user")
+    assert cache.get("token") is None
+
+    time.sleep(0.06)
+    cache.set("token", "user")
+    assert cache.get("token") == "user"
+
+
+async def test_repeat_lookups_are_served_from_the_cache(api, auth_headers):
+    assert (await api.get("/api/auth/me", headers=auth_headers)).status_code == 200
+    before = server.session_cache.stats()
+    assert (await api.get("/api/auth/me", headers=auth_headers)).json()["email"] == "tester@example.com"
+    after = server.session_cache.stats()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+
+
+async def test_logout_revokes_a_cached_session(api, db, auth_headers):
+    assert (await api.get("/api/auth/me", headers=auth_headers)).status_code == 200
+    user = server.session_cache.get("test-session")
+    assert user is not None
+
+    assert (await api.post("/api/auth/logout", headers=auth_headers)).status_code == 200
+    assert await db.user_sessions.count_documents({"session_token": "test-session"}) == 0
+    # A lookup that read the session before the delete finishes after the logout
+    server.session_cache.set("test-session", user)
+
+    assert (await api.get("/api/auth/me", headers=auth_headers)).status_code == 401
+
+
+async def test_cache_stats_require_an_admin(api, auth_headers, admin_headers):
+    assert (await api.get("/api/auth/cache-stats")).status_code == 401
+    assert (await api.get("/api/auth/cache-stats", headers=auth_headers)).status_code == 403
+    response = await api.get("/api/auth/cache-stats", headers=admin_headers)
+    assert response.status_code == 200
+    assert {"hits", "misses", "size"} <= response.json().keys()
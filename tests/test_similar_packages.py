@@ -0,0 +1,49 @@
+import random
+
+from similar_packages import SimilarityIndex
+
+
+def catalog(count, seed=7):
+    # Few distinct feature combinations, so many packages tie on score
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"pkg-{rng.randrange(10 ** 6):06d}-{i}",
+            "package_type": rng.choice(["umrah", "haji", "tour"]),
+            "departure_city": rng.choice(["Jakarta", "Surabaya"]),
+            "airline": rng.choice(["Saudia Airlines", "Garuda Indonesia"]),
+            "price": rng.choice([20, 25, 35]) * 1_000_000,
+            "hotel_rating": rng.choice([4, 5]),
+            "duration": rng.choice(["9 Hari", "12 Hari"]),
+            "facilities": rng.sample(["Visa", "Makan 3x", "Ziarah", "Handling"], 2),
+        }
+        for i in range(count)
+    ]
+
+
+def test_incremental_adds_match_a_full_rebuild():
+    docs = catalog(300)
+    incremental = SimilarityIndex(neighbours=8)
+    incremental.build(docs[:150], version=1)
+    for version, doc in enumerate(docs[150:], start=2):
+        incremental.add(doc, version)
+
+    rebuilt = SimilarityIndex(neighbours=8)
+    rebuilt.build(list(reversed(docs)), version=incremental.version)
+
+    assert len(incremental) == len(rebuilt) == 300
+    for doc in docs:
+        assert incremental.similar(doc["id"]) == rebuilt.similar(doc["id"]), doc["id"]
+
+
+def test_neighbours_rank_by_score_then_id():
+    docs = catalog(120, seed=3)
+    index = SimilarityIndex(neighbours=10)
+    index.build(docs)
+    for doc in docs:
+        similar = index.similar(doc["id"])
+        assert len(similar) == 10
+        assert doc["id"] not in [package_id for package_id, _ in similar]
+        assert similar == sorted(similar, key=lambda item: (-item[1], item[0]))
+    assert index.similar("missing") is None
+    assert len(index.similar(docs[0]["id"], limit=3)) == 3
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+import wishlist
+from tests.conftest import PACKAGE
+
+pytestmark = pytest.mark.anyio
+
+PACKAGE_IDS = ["pkg-a", "pkg-b", "pkg-c"]
+
+
+@pytest.fixture
+async def packages(db):
+    await db.packages.insert_many([
+        {**PACKAGE, "id": package_id, wishlist.SAVED_COUNT: 0, "availability": 10} for package_id in PACKAGE_IDS
+    ])
+
+
+async def saved_counts(db):
+    return {
+        doc["id"]: doc[wishlist.SAVED_COUNT]
+        async for doc in db.packages.find({}, {"_id": 0, "id": 1, wishlist.SAVED_COUNT: 1})
+    }
+
+
+async def test_concurrent_adds_store_one_entry_and_count_once(api, db, auth_headers, packages):
+    responses = await asyncio.gather(*[
+        api.post("/api/wishlist", params={"package_id": "pkg-a"}, headers=auth_headers) for _ in range(20)
+    ])
+
+    assert sorted(r.status_code for r in responses) == [200] + [400] * 19
+    assert await db.wishlist.count_documents({"package_id": "pkg-a"}) == 1
+    assert (await saved_counts(db))["pkg-a"] == 1
+    assert (await api.get("/api/wishlist", headers=auth_headers)).json() == ["pkg-a"]
+
+
+async def test_concurrent_adds_and_removes_do_not_drift(api, db, auth_headers, packages):
+    calls = []
+    for i in range(30):
+        calls.append(api.post("/api/wishlist", params={"package_id": "pkg-b"}, headers=auth_headers))
+        if i % 3 == 0:
+            calls.append(api.delete("/api/wishlist/pkg-b", headers=auth_headers))
+    await asyncio.gather(*calls)
+
+    stored = await db.wishlist.count_documents({"package_id": "pkg-b"})
+    assert stored in (0, 1)
+    assert (await saved_counts(db))["pkg-b"] == stored
+
+
+async def test_bulk_update_adjusts_counters_for_actual_changes(api, db, auth_headers, packages):
+    await api.post("/api/wishlist", params={"package_id": "pkg-a"}, headers=auth_headers)
+    await wishlist.add(db, "someone-else", "pkg-a")
+
+    response = await api.post("/api/wishlist/bulk", json={
+        "add": ["pkg-a", "pkg-b", "pkg-c", "pkg-b"], "remove": []
+    }, headers=auth_headers)
+    assert response.json() == {"added": ["pkg-b", "pkg-c"], "removed": []}
+    assert await saved_counts(db) == {"pkg-a": 2, "pkg-b": 1, "pkg-c": 1}
+
+    response = await api.post("/api/wishlist/bulk", json={
+        "add": [], "remove": ["pkg-a", "pkg-c", "missing"]
+    }, headers=auth_headers)
+    assert response.json() == {"added": [], "removed": ["pkg-a", "pkg-c"]}
+    assert await saved_counts(db) == {"pkg-a": 1, "pkg-b": 1, "pkg-c": 0}
+
+    # The incremental counters agree with a full recount
+    await wishlist.recount(db)
+    assert await saved_counts(db) == {"pkg-a": 1, "pkg-b": 1, "pkg-c": 0}
+
+
+async def test_recount_requires_an_admin(api, db, auth_headers, admin_headers, packages):
+    await wishlist.add(db, "someone-else", "pkg-b")
+    await db.packages.update_one({"id": "pkg-b"}, {"$set": {wishlist.SAVED_COUNT: 5}})
+    assert (await api.post("/api/admin/recount-saved")).status_code == 401
+    assert (await api.post("/api/admin/recount-saved", headers=auth_headers)).status_code == 403
+
+    response = await api.post("/api/admin/recount-saved", headers=admin_headers)
+
+    assert response.json() == {"packages_with_saves": 1}
+    assert await saved_counts(db) == {"pkg-a": 0, "pkg-b": 1, "pkg-c": 0}